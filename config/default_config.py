@@ -11,7 +11,7 @@ BASE_URL = "https://example.com"
 NEWS_COUNT = 20
 
 # 系統設定 (固定不變)
-MAX_ATTEMPTS = 50
+MAX_ATTEMPTS = 50               # 每個網站最多嘗試的文章數
 PAGE_LOAD_TIMEOUT = 15
 WAIT_TIME = 3
 REPLACE_IMAGE_FOLDER = "replace_image"
@@ -43,7 +43,7 @@ IMAGE_USAGE_COUNT = {
 }
 
 # 進階設定
-MAX_CONSECUTIVE_FAILURES = 10
+MAX_CONSECUTIVE_FAILURES = 10   # 連續多少篇文章沒有截圖時停止此網站
 CLOSE_BUTTON_SIZE = {"width": 15, "height": 15}
 INFO_BUTTON_SIZE = {"width": 15, "height": 15}
 INFO_BUTTON_COLOR = "#00aecd"
@@ -58,10 +58,92 @@ BROWSER_WINDOW_SIZE = {"width": 1920, "height": 1080}
 SCROLL_PAUSE_TIME = 2
 ELEMENT_WAIT_TIME = 10
 
+# 伺服器端執行：無頭模式或虛擬螢幕 (Xvfb)，使用 BROWSER_WINDOW_SIZE 固定視窗大小
+HEADLESS_MODE = False
+VIRTUAL_DISPLAY = False
+
+# 頁面載入設定
+PAGE_LOAD_STRATEGY = "eager"  # normal / eager / none
+BLOCK_HEAVY_RESOURCES = True  # 封鎖分析與社群外掛等非廣告網域的資源
+
+# 持久化 Chrome 設定檔與 HTTP 快取
+PERSISTENT_PROFILE = False
+PROFILE_DIR = "data/chrome_profile"
+PROFILE_CACHE_SIZE_MB = 300   # Chrome 磁碟快取上限
+PROFILE_MAX_SIZE_MB = 1024    # 設定檔超過此大小時清除快取
+PROFILE_STALE_HOURS = 24      # 殘留的實例副本保留時間
+
+# 附加到常駐瀏覽器 (python src/browser_daemon.py start)
+USE_BROWSER_DAEMON = False
+DEBUGGER_ADDRESS = ""         # 直接指定要附加的 Chrome，例如 "127.0.0.1:9222"
+WEBDRIVER_URL = ""            # 直接指定 ChromeDriver 伺服器，例如 "http://127.0.0.1:9515"
+
+# 定期重啟瀏覽器以限制記憶體用量 (0 表示停用)
+RECYCLE_AFTER_PAGES = 30
+RECYCLE_MEMORY_MB = 0  # 目前分頁的 JS heap 超過此值 (MB) 時重啟，預設停用
+
+# 在頁面載入前注入全螢幕廣告抑制腳本
+OVERLAY_SUPPRESSOR = True
+
+# 平行處理：同時執行的瀏覽器工作者數量 (1 表示依序處理)
+WORKER_COUNT = 1
+
+# 分頁預載：在背景分頁預先載入接下來的文章數量 (0 表示停用)
+PREFETCH_TABS = 0
+
+# 執行引擎："selenium" 或 "cdp"（非同步 CDP 引擎，需要 pip install websockets）
+ENGINE = "selenium"
+CDP_TABS = 3                    # CDP 引擎同時處理的分頁數量
+
+# 網域速率限制（所有工作者共用）：每秒載入頁面數、連續載入上限、同時載入上限 (速率 0 表示停用)
+DOMAIN_RATE_LIMIT = 0.5
+DOMAIN_BURST = 2
+DOMAIN_CONCURRENCY = 2
+
+# 依歷史產出排序文章：優先處理截圖較多的網站區塊，保留部分比例隨機探索
+YIELD_PLANNER = True
+YIELD_EXPLORATION = 0.2
+YIELD_HISTORY_FILE = "data/yield_history.json"
+
+# 處理幾篇文章後不再掃描從未出現過的廣告尺寸 (0 表示停用)
+SKIP_UNSEEN_SIZES_AFTER = 3
+
+# 文章連結探索："auto" 先以 HTTP 抓取 sitemap/RSS/首頁 HTML，不足時再用瀏覽器；"http" 或 "browser" 只用其中一種
+LINK_DISCOVERY = "auto"
+
+# 首頁文章連結不足時，爬取同網域分類頁補足 (頁數 0 表示停用)
+CRAWL_MAX_DEPTH = 2
+CRAWL_MAX_PAGES = 20
+
+# 跨執行的文章紀錄：優先處理沒看過的文章，紀錄保留天數後過期
+URL_HISTORY = True
+URL_HISTORY_TTL_DAYS = 7
+
+# 截圖範圍："screen" 截取整個螢幕；"element" 只截取替換的廣告位置加上周圍邊距
+SCREENSHOT_MODE = "screen"
+SCREENSHOT_MARGIN = 200
+
+# 背景截圖寫入：圖片編碼與存檔的執行緒數量 (0 表示同步寫入) 與等待寫入的截圖上限
+SCREENSHOT_WRITERS = 2
+SCREENSHOT_WRITE_QUEUE = 8
+
+# 截圖格式："png"、"jpeg"、"webp" (有損) 或 "webp-lossless"；有損格式的品質使用 IMAGE_QUALITY
+SCREENSHOT_FORMAT = "png"
+PNG_COMPRESS_LEVEL = 6  # 0-9，越高檔案越小、編碼越慢
+
+# 重複截圖偵測："off"、"drop" (捨棄且不計入截圖數量) 或 "flag" (保留並在截圖清單中標記)，需要 Pillow
+SCREENSHOT_DEDUP = "off"
+SCREENSHOT_DEDUP_DISTANCE = 6  # 感知雜湊的漢明距離門檻 (0-64)
+SCREENSHOT_DEDUP_FILE = "data/screenshot_hashes.tsv"
+SCREENSHOT_DEDUP_TTL_DAYS = 14  # 雜湊紀錄保留天數，過期後不再比對
+
+# Linux 螢幕截圖："mss" 以常駐的 X11 連線在行程內擷取 (需要 pip install mss pillow)；"import" 每次執行 ImageMagick import
+LINUX_CAPTURE_BACKEND = "mss"
+
 # 圖片處理設定
 SUPPORTED_IMAGE_FORMATS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
-IMAGE_QUALITY = 85
+IMAGE_QUALITY = 85  # 截圖為 jpeg / webp 時的品質 (1-100)
 
 # 日誌設定
 LOG_LEVEL = "INFO"
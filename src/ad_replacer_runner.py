@@ -9,10 +9,34 @@ import os
 import sys
 import argparse
 import json
+import time
 from datetime import datetime
 
-def create_config_file(config_data):
-    """創建配置檔案"""
+def to_bool(value):
+    """將設定值轉為布林值（設定管理器可能儲存 'y'/'是' 等字串）"""
+    if isinstance(value, str):
+        return value in ['是', 'y', 'Y', 'true', 'True', 'yes', 'Yes', '1']
+    return bool(value)
+
+DEFAULT_TARGET_AD_SIZES = [
+    {"width": 970, "height": 90},
+    {"width": 986, "height": 106},
+    {"width": 728, "height": 90},
+    {"width": 300, "height": 250},
+    {"width": 336, "height": 280},
+    {"width": 320, "height": 50},
+    {"width": 160, "height": 600},
+    {"width": 300, "height": 600},
+    {"width": 120, "height": 600},
+    {"width": 240, "height": 400},
+    {"width": 250, "height": 250},
+    {"width": 300, "height": 50},
+    {"width": 320, "height": 100},
+    {"width": 980, "height": 120}
+]
+
+def create_config_file(config_data, config_dir='.'):
+    """創建配置檔案（批次工作會寫入各自的工作資料夾）"""
     # 從設定檔或預設值取得參數
     target_url = config_data.get('url', '')
     screenshot_count = config_data.get('screenshots', 30)
@@ -24,6 +48,40 @@ def create_config_file(config_data):
     max_failures = config_data.get('max_failures', 3)
     fullscreen = config_data.get('fullscreen', True)
     debug_mode = config_data.get('debug_mode', True)
+    page_load_strategy = config_data.get('page_load_strategy', 'eager')
+    block_resources = to_bool(config_data.get('block_resources', True))
+    persistent_profile = to_bool(config_data.get('persistent_profile', False))
+    profile_cache_size = config_data.get('profile_cache_size', 300)
+    use_browser_daemon = to_bool(config_data.get('use_browser_daemon', False))
+    debugger_address = config_data.get('debugger_address', '')
+    worker_count = config_data.get('workers', 1)
+    headless = to_bool(config_data.get('headless', False))
+    virtual_display = to_bool(config_data.get('virtual_display', False))
+    prefetch_tabs = config_data.get('prefetch_tabs', 0)
+    engine = config_data.get('engine', 'selenium')
+    cdp_tabs = config_data.get('cdp_tabs', 3)
+    screenshot_folder = config_data.get('screenshot_folder', 'data/screenshots')
+    checkpoint_file = config_data.get('checkpoint_file', 'data/checkpoint.json')
+    resume = to_bool(config_data.get('resume', False))
+    rate_limit = config_data.get('rate_limit', 0.5)
+    domain_concurrency = config_data.get('domain_concurrency', 2)
+    yield_planner = to_bool(config_data.get('yield_planner', True))
+    yield_exploration = config_data.get('yield_exploration', 0.2)
+    link_discovery = config_data.get('link_discovery', 'auto')
+    crawl_max_pages = config_data.get('crawl_max_pages', 20)
+    url_history_days = config_data.get('url_history_days', 7)
+    screenshot_mode = config_data.get('screenshot_mode', 'screen')
+    screenshot_margin = config_data.get('screenshot_margin', 200)
+    screenshot_writers = config_data.get('screenshot_writers', 2)
+    screenshot_format = config_data.get('screenshot_format', 'png')
+    image_quality = config_data.get('image_quality', 85)
+    screenshot_dedup = config_data.get('screenshot_dedup', 'off')
+    dedup_distance = config_data.get('dedup_distance', 6)
+    target_ad_sizes = ",\n".join(
+        f'    {{"width": {size["width"]}, "height": {size["height"]}}}'
+        for size in config_data.get('target_ad_sizes') or DEFAULT_TARGET_AD_SIZES
+    )
+    link_selectors = json.dumps(config_data.get('link_selectors') or [], ensure_ascii=False)
     
     config_content = f'''#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
@@ -45,21 +103,9 @@ BASE_URL = "{target_url}"
 # 進階設定
 NEWS_COUNT = {news_count}
 TARGET_AD_SIZES = [
-    {{"width": 970, "height": 90}}, 
-    {{"width": 986, "height": 106}},
-    {{"width": 728, "height": 90}},
-    {{"width": 300, "height": 250}},
-    {{"width": 336, "height": 280}},
-    {{"width": 320, "height": 50}},
-    {{"width": 160, "height": 600}},
-    {{"width": 300, "height": 600}},
-    {{"width": 120, "height": 600}},
-    {{"width": 240, "height": 400}},
-    {{"width": 250, "height": 250}},
-    {{"width": 300, "height": 50}},
-    {{"width": 320, "height": 100}},
-    {{"width": 980, "height": 120}}
+{target_ad_sizes}
 ]
+CUSTOM_LINK_SELECTORS = {link_selectors}
 
 IMAGE_USAGE_COUNT = {{
     "data/replace_image/img_120x600.jpg": 5,
@@ -84,11 +130,84 @@ INFO_BUTTON_COLOR = "#00aecd"
 INFO_BUTTON_OFFSET = 16
 FULLSCREEN_MODE = {fullscreen}
 DEBUG_MODE = {debug_mode}
-SCREENSHOT_FOLDER = "data/screenshots"
+SCREENSHOT_FOLDER = "{screenshot_folder}"
 BUTTON_STYLE = "{button_style}"
+
+# 頁面載入設定
+PAGE_LOAD_STRATEGY = "{page_load_strategy}"
+BLOCK_HEAVY_RESOURCES = {block_resources}
+
+# 持久化 Chrome 設定檔與 HTTP 快取
+PERSISTENT_PROFILE = {persistent_profile}
+PROFILE_DIR = "data/chrome_profile"
+PROFILE_CACHE_SIZE_MB = {profile_cache_size}
+
+# 附加到常駐瀏覽器
+USE_BROWSER_DAEMON = {use_browser_daemon}
+DEBUGGER_ADDRESS = "{debugger_address}"
+
+# 平行處理
+WORKER_COUNT = {worker_count}
+
+# 伺服器端執行
+HEADLESS_MODE = {headless}
+VIRTUAL_DISPLAY = {virtual_display}
+BROWSER_WINDOW_SIZE = {{"width": 1920, "height": 1080}}
+
+# 分頁預載
+PREFETCH_TABS = {prefetch_tabs}
+
+# 執行引擎
+ENGINE = "{engine}"
+CDP_TABS = {cdp_tabs}
+
+# 執行進度檢查點
+CHECKPOINT_FILE = "{checkpoint_file}"
+RESUME = {resume}
+
+# 網域速率限制 (所有工作者共用)
+DOMAIN_RATE_LIMIT = {rate_limit}
+DOMAIN_BURST = 2
+DOMAIN_CONCURRENCY = {domain_concurrency}
+
+# 依歷史產出排序文章
+YIELD_PLANNER = {yield_planner}
+YIELD_EXPLORATION = {yield_exploration}
+YIELD_HISTORY_FILE = "data/yield_history.json"
+
+# 文章連結探索
+LINK_DISCOVERY = "{link_discovery}"
+CRAWL_MAX_DEPTH = 2
+CRAWL_MAX_PAGES = {crawl_max_pages}
+
+# 跨執行的文章紀錄 (天數 0 表示停用)
+URL_HISTORY = {bool(url_history_days)}
+URL_HISTORY_TTL_DAYS = {url_history_days}
+
+# 截圖範圍 ("screen" 或 "element")
+SCREENSHOT_MODE = "{screenshot_mode}"
+SCREENSHOT_MARGIN = {screenshot_margin}
+
+# 背景截圖寫入 (執行緒數量 0 表示同步寫入)
+SCREENSHOT_WRITERS = {screenshot_writers}
+SCREENSHOT_WRITE_QUEUE = 8
+
+# 截圖格式 ("png"、"jpeg"、"webp"、"webp-lossless") 與有損格式的品質
+SCREENSHOT_FORMAT = "{screenshot_format}"
+IMAGE_QUALITY = {image_quality}
+PNG_COMPRESS_LEVEL = 6
+
+# 重複截圖偵測 ("off"、"drop"、"flag")
+SCREENSHOT_DEDUP = "{screenshot_dedup}"
+SCREENSHOT_DEDUP_DISTANCE = {dedup_distance}
+SCREENSHOT_DEDUP_FILE = "data/screenshot_hashes.tsv"
+SCREENSHOT_DEDUP_TTL_DAYS = 14
+
+# Linux 螢幕截圖 ("mss" 行程內擷取或 "import")
+LINUX_CAPTURE_BACKEND = "mss"
 '''
     
-    with open('config.py', 'w', encoding='utf-8') as f:
+    with open(os.path.join(config_dir, 'config.py'), 'w', encoding='utf-8') as f:
         f.write(config_content)
     
     print(f"✅ 配置檔案已創建")
@@ -192,11 +311,41 @@ def main():
     parser.add_argument('--articles', type=int, help='掃描文章數量 (預設: 20)')
 
     parser.add_argument('--screen', type=int, help='使用的螢幕編號 (預設: 1)')
+    parser.add_argument('--daemon', action='store_true', help='附加到瀏覽器常駐服務 (python src/browser_daemon.py start)')
+    parser.add_argument('--attach', help='附加到指定偵錯位址的 Chrome，例如 127.0.0.1:9222')
+    parser.add_argument('--workers', type=int, help='同時執行的瀏覽器工作者數量 (預設: 1)')
+    parser.add_argument('--headless', action='store_true', help='無頭模式執行 (不需要螢幕)')
+    parser.add_argument('--virtual-display', action='store_true', help='在虛擬螢幕 (Xvfb) 上執行，僅限 Linux')
+    parser.add_argument('--prefetch', type=int, help='在背景分頁預載的文章數量 (預設: 0)')
+    parser.add_argument('--engine', choices=['selenium', 'cdp'], help='執行引擎 (預設: selenium)')
+    parser.add_argument('--cdp-tabs', type=int, help='CDP 引擎同時處理的分頁數量 (預設: 3)')
+    parser.add_argument('--rate-limit', type=float, help='每個網域每秒載入的頁面數，0 表示不限制 (預設: 0.5)')
+    parser.add_argument('--domain-concurrency', type=int, help='同一網域同時載入的頁面數上限 (預設: 2)')
+    parser.add_argument('--discovery', choices=['auto', 'http', 'browser'], help='文章連結探索方式 (預設: auto)')
+    parser.add_argument('--crawl-pages', type=int, help='首頁連結不足時最多爬取的分類頁數，0 表示停用 (預設: 20)')
+    parser.add_argument('--history-days', type=int, help='幾天內處理過的文章不再優先處理，0 表示停用 (預設: 7)')
+    parser.add_argument('--screenshot-mode', choices=['screen', 'element'], help='截圖範圍：整個螢幕或只截取廣告位置 (預設: screen)')
+    parser.add_argument('--screenshot-margin', type=int, help='element 模式下廣告周圍保留的範圍 px (預設: 200)')
+    parser.add_argument('--screenshot-writers', type=int, help='背景編碼與寫入截圖的執行緒數量，0 表示同步寫入 (預設: 2)')
+    parser.add_argument('--format', choices=['png', 'jpeg', 'webp', 'webp-lossless'], help='截圖格式 (預設: png)')
+    parser.add_argument('--quality', type=int, help='jpeg / webp 截圖品質 1-100 (預設: 85)')
+    parser.add_argument('--dedup', choices=['off', 'drop', 'flag'], help='重複截圖偵測：捨棄或標記外觀幾乎相同的截圖 (預設: off)')
+    parser.add_argument('--dedup-distance', type=int, help='視為重複的感知雜湊距離 0-64 (預設: 6)')
+    parser.add_argument('--random-order', action='store_true', help='隨機選擇文章，不依歷史產出排序')
+    parser.add_argument('--exploration', type=float, help='依產出排序時隨機探索的比例 (預設: 0.2)')
+    parser.add_argument('--resume', action='store_true', help='從上次中斷的檢查點繼續執行 (僅支援單一瀏覽器的 Selenium 引擎)')
+    parser.add_argument('--job', help='批次工作的網站設定檔 (由 batch_scheduler.py 產生)')
     
     args = parser.parse_args()
     
-    # 載入設定檔（如果存在）
-    config = load_config_if_exists()
+    # 載入設定檔（批次工作使用各自的網站設定檔）
+    config_dir = '.'
+    if args.job:
+        with open(args.job, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config_dir = os.path.dirname(os.path.abspath(args.job))
+    else:
+        config = load_config_if_exists()
     
     # 如果沒有提供 --url 參數且沒有設定檔，則提示使用設定管理器
     if not args.url and not config:
@@ -254,9 +403,40 @@ def main():
         'page_timeout': config.get('page_timeout', 15) if config else 15,
         'wait_time': config.get('wait_time', 3) if config else 3,
         'max_failures': config.get('max_failures', 3) if config else 3,
-        'fullscreen': fullscreen
+        'fullscreen': fullscreen,
+        'page_load_strategy': config.get('page_load_strategy', 'eager') if config else 'eager',
+        'block_resources': config.get('block_resources', True) if config else True,
+        'persistent_profile': config.get('persistent_profile', False) if config else False,
+        'profile_cache_size': config.get('profile_cache_size', 300) if config else 300,
+        'use_browser_daemon': args.daemon or (config.get('use_browser_daemon', False) if config else False),
+        'debugger_address': args.attach or '',
+        'workers': args.workers if args.workers is not None else (config.get('workers', 1) if config else 1),
+        'headless': args.headless or (config.get('headless', False) if config else False),
+        'virtual_display': args.virtual_display,
+        'prefetch_tabs': args.prefetch if args.prefetch is not None else (config.get('prefetch_tabs', 0) if config else 0),
+        'engine': args.engine or (config.get('engine', 'selenium') if config else 'selenium'),
+        'cdp_tabs': args.cdp_tabs if args.cdp_tabs is not None else (config.get('cdp_tabs', 3) if config else 3),
+        'screenshot_folder': config.get('screenshot_folder', 'data/screenshots') if config else 'data/screenshots',
+        'target_ad_sizes': config.get('target_ad_sizes') if config else None,
+        'link_selectors': config.get('link_selectors') if config else None,
+        'checkpoint_file': config.get('checkpoint_file', 'data/checkpoint.json') if config else 'data/checkpoint.json',
+        'resume': args.resume or (config.get('resume', False) if config else False),
+        'rate_limit': args.rate_limit if args.rate_limit is not None else (config.get('rate_limit', 0.5) if config else 0.5),
+        'domain_concurrency': args.domain_concurrency if args.domain_concurrency is not None else (config.get('domain_concurrency', 2) if config else 2),
+        'yield_planner': not args.random_order and (config.get('yield_planner', True) if config else True),
+        'link_discovery': args.discovery or (config.get('link_discovery', 'auto') if config else 'auto'),
+        'crawl_max_pages': args.crawl_pages if args.crawl_pages is not None else (config.get('crawl_max_pages', 20) if config else 20),
+        'url_history_days': args.history_days if args.history_days is not None else (config.get('url_history_days', 7) if config else 7),
+        'screenshot_mode': args.screenshot_mode or (config.get('screenshot_mode', 'screen') if config else 'screen'),
+        'screenshot_margin': args.screenshot_margin if args.screenshot_margin is not None else (config.get('screenshot_margin', 200) if config else 200),
+        'screenshot_writers': args.screenshot_writers if args.screenshot_writers is not None else (config.get('screenshot_writers', 2) if config else 2),
+        'screenshot_format': args.format or (config.get('screenshot_format', 'png') if config else 'png'),
+        'image_quality': args.quality if args.quality is not None else (config.get('image_quality', 85) if config else 85),
+        'screenshot_dedup': args.dedup or (config.get('screenshot_dedup', 'off') if config else 'off'),
+        'dedup_distance': args.dedup_distance if args.dedup_distance is not None else (config.get('dedup_distance', 6) if config else 6),
+        'yield_exploration': args.exploration if args.exploration is not None else (config.get('yield_exploration', 0.2) if config else 0.2)
     }
-    create_config_file(config_data)
+    create_config_file(config_data, config_dir)
     
     print("\n🚀 開始執行廣告替換...")
     print("=" * 70)
@@ -265,28 +445,32 @@ def main():
         # 導入並執行廣告替換系統
         import sys
         sys.path.append('src')
+        # 讓核心模組載入剛產生的 config.py
+        sys.path.insert(0, os.path.abspath(config_dir))
         from website_template_complete import main as run_ad_replacement
+        from screenshot_manifest import read_manifest
         
         # 執行廣告替換
+        run_started_at = time.time()
         run_ad_replacement()
         
         print("\n" + "=" * 70)
         print("✅ 廣告替換執行完成！")
         
-        # 顯示結果
-        screenshots_folder = 'data/screenshots'
-        if os.path.exists(screenshots_folder):
-            screenshot_files = [f for f in os.listdir(screenshots_folder) 
-                              if f.endswith(('.png', '.jpg', '.jpeg'))]
-            if screenshot_files:
-                print(f"📸 產生了 {len(screenshot_files)} 張截圖:")
-                for screenshot in sorted(screenshot_files)[-5:]:  # 顯示最新的5張
-                    print(f"   • {screenshot}")
-                if len(screenshot_files) > 5:
-                    print(f"   ... 還有 {len(screenshot_files) - 5} 張截圖")
-                print(f"📁 截圖位置: {os.path.abspath(screenshots_folder)}")
-            else:
-                print("⚠️ 沒有產生截圖")
+        # 顯示結果（讀取截圖清單中本次執行的記錄）
+        screenshots_folder = config_data['screenshot_folder']
+        screenshot_records = read_manifest(screenshots_folder, since=run_started_at)
+        if screenshot_records:
+            print(f"📸 產生了 {len(screenshot_records)} 張截圖:")
+            for record in screenshot_records[-5:]:  # 顯示最新的5張
+                print(f"   • {os.path.relpath(record['path'], screenshots_folder)} "
+                      f"({record['width']}x{record['height']}, {record['creative']})")
+            if len(screenshot_records) > 5:
+                print(f"   ... 還有 {len(screenshot_records) - 5} 張截圖")
+            print(f"📁 截圖位置: {os.path.abspath(screenshots_folder)}")
+            print(f"📋 截圖清單: {os.path.abspath(os.path.join(screenshots_folder, 'manifest.jsonl'))}")
+        else:
+            print("⚠️ 沒有產生截圖")
         
         print("=" * 70)
         
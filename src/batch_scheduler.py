@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多網站批次排程器
+依照批次工作檔同時處理多個網站，每個網站在獨立行程中執行 ad_replacer_runner.py
+
+批次工作檔 (ad_replacer_batch.json) 範例：
+{
+    "max_browsers": 4,              # 全域瀏覽器數量上限
+    "per_domain_limit": 1,          # 同一網域同時執行的網站數量上限
+    "defaults": {"screenshots": 10, "headless": true},
+    "sites": [
+        {"url": "https://news.example.com", "screenshots": 20},
+        {"url": "https://blog.example.com", "articles": 30,
+         "target_ad_sizes": [{"width": 300, "height": 250}],
+         "link_selectors": ["a.post-title"]}
+    ]
+}
+
+每個網站的設定依序合併：設定管理器的設定 → defaults → 網站自己的覆寫值
+
+使用方式：
+    python src/batch_scheduler.py [批次工作檔] [--max-browsers N] [--per-domain N]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from urllib.parse import urlparse
+
+from screenshot_manifest import read_manifest, RUN_ID_ENV
+from ad_replacer_runner import to_bool
+
+BATCH_FILE = 'ad_replacer_batch.json'
+CONFIG_FILE = 'ad_replacer_config.json'
+BATCH_DIR = 'data/batch'
+POLL_INTERVAL = 2
+
+
+def load_batch_file(batch_file):
+    """讀取批次工作檔並合併每個網站的設定"""
+    with open(batch_file, 'r', encoding='utf-8') as f:
+        batch = json.load(f)
+
+    base_config = {}
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                base_config = json.load(f)
+        except Exception:
+            print(f"⚠️ {CONFIG_FILE} 格式錯誤，忽略")
+
+    sites = []
+    for site in batch.get('sites', []):
+        if not site.get('url'):
+            print(f"⚠️ 略過沒有網址的網站設定: {site}")
+            continue
+        merged = dict(base_config)
+        merged.update(batch.get('defaults', {}))
+        merged.update(site)
+        sites.append(merged)
+    return batch, sites
+
+
+def get_browser_cost(site):
+    """網站執行時佔用的瀏覽器數量（CDP 引擎的所有分頁共用一個瀏覽器）"""
+    if site.get('engine') == 'cdp':
+        return 1
+    return max(1, int(site.get('workers', 1)))
+
+
+def uses_browser_capture(site):
+    """網站是否以瀏覽器截圖（不依賴螢幕上的視窗位置）"""
+    return (site.get('engine') == 'cdp' or to_bool(site.get('headless', False))
+            or to_bool(site.get('virtual_display', False)))
+
+
+def count_screenshots(folder, since, run_id):
+    """以截圖清單計算網站工作產生的截圖數量；同一資料夾可能有其他工作同時寫入，以執行編號區分"""
+    return len(read_manifest(folder, since, run_id))
+
+
+class BatchScheduler:
+    """在全域瀏覽器上限與單一網域並行上限內同時執行多個網站"""
+
+    def __init__(self, sites, max_browsers=2, per_domain_limit=1):
+        self.sites = sites
+        self.max_browsers = max_browsers
+        self.per_domain_limit = per_domain_limit
+        self.batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.batch_dir = os.path.join(BATCH_DIR, self.batch_id)
+        self.running = []
+        self.results = []
+
+    def prepare_job(self, index, site):
+        """建立網站的工作資料夾並寫入網站設定檔"""
+        domain = urlparse(site['url']).netloc
+        safe_domain = re.sub(r'[^\w.-]', '_', domain)
+        job_dir = os.path.join(self.batch_dir, f"{index:02d}_{safe_domain}")
+        os.makedirs(job_dir, exist_ok=True)
+        # 每個網站的截圖分開存放，方便統計與交付（網域可能含有連接埠的冒號，Windows 路徑不允許）
+        site.setdefault('screenshot_folder', f"data/screenshots/{safe_domain}")
+        if self.max_browsers > 1 and not uses_browser_capture(site):
+            # 同時執行多個網站時，螢幕截圖會拍到其他網站的視窗，改用無頭模式以瀏覽器截圖
+            print(f"⚠️ {site['url']}: 同時執行多個網站，改用無頭模式")
+            site['headless'] = True
+        site.setdefault('checkpoint_file', f"data/checkpoints/{safe_domain}.json")
+        job_file = os.path.join(job_dir, 'job.json')
+        with open(job_file, 'w', encoding='utf-8') as f:
+            json.dump(site, f, ensure_ascii=False, indent=2)
+        return domain, job_dir, job_file
+
+    def browsers_in_use(self):
+        return sum(job['cost'] for job in self.running)
+
+    def domain_in_use(self, domain):
+        return sum(1 for job in self.running if job['domain'] == domain)
+
+    def can_start(self, job):
+        # 單一網站需要的瀏覽器超過上限時，等到沒有其他網站執行時再啟動
+        if self.running and self.browsers_in_use() + job['cost'] > self.max_browsers:
+            return False
+        return self.domain_in_use(job['domain']) < self.per_domain_limit
+
+    def start_job(self, job):
+        log = open(os.path.join(job['job_dir'], 'run.log'), 'w', encoding='utf-8')
+        command = [sys.executable, 'src/ad_replacer_runner.py', '--job', job['job_file']]
+        # 指定執行編號，截圖清單中的記錄可以對應回此網站工作
+        env = dict(os.environ, **{RUN_ID_ENV: job['run_id']})
+        # stdin 不是終端機時核心程式不會詢問螢幕
+        job['process'] = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log,
+                                          stderr=subprocess.STDOUT, env=env)
+        job['log'] = log
+        job['started_at'] = time.time()
+        self.running.append(job)
+        print(f"▶️ 開始: {job['url']} (瀏覽器 {self.browsers_in_use()}/{self.max_browsers})")
+
+    def finish_job(self, job):
+        job['log'].close()
+        duration = time.time() - job['started_at']
+        result = {
+            'url': job['url'],
+            'exit_code': job['process'].returncode,
+            'duration': round(duration, 1),
+            'screenshots': count_screenshots(job['screenshot_folder'], job['started_at'], job['run_id']),
+            'target': job['target'],
+            'log': os.path.join(job['job_dir'], 'run.log'),
+        }
+        self.results.append(result)
+        self.running.remove(job)
+        status = '✅' if result['exit_code'] == 0 else '❌'
+        print(f"{status} 完成: {job['url']} - {result['screenshots']} 張截圖，耗時 {duration:.0f} 秒")
+
+    def run(self):
+        pending = []
+        for index, site in enumerate(self.sites, 1):
+            domain, job_dir, job_file = self.prepare_job(index, site)
+            pending.append({
+                'url': site['url'],
+                'domain': domain,
+                'job_dir': job_dir,
+                'job_file': job_file,
+                'run_id': f"{self.batch_id}_{index:02d}",
+                'cost': get_browser_cost(site),
+                'target': site.get('screenshots', 10),
+                'screenshot_folder': site['screenshot_folder'],
+            })
+
+        print(f"📋 批次工作 {self.batch_id}: {len(pending)} 個網站，"
+              f"瀏覽器上限 {self.max_browsers}，單一網域上限 {self.per_domain_limit}")
+        start_time = time.time()
+
+        try:
+            while pending or self.running:
+                for job in list(pending):
+                    if self.can_start(job):
+                        pending.remove(job)
+                        self.start_job(job)
+                time.sleep(POLL_INTERVAL)
+                for job in list(self.running):
+                    if job['process'].poll() is not None:
+                        self.finish_job(job)
+        except KeyboardInterrupt:
+            print("\n⚠️ 使用者中斷，停止所有網站")
+            for job in list(self.running):
+                job['process'].terminate()
+                job['process'].wait()
+                self.finish_job(job)
+
+        self.print_summary(time.time() - start_time)
+        return self.results
+
+    def print_summary(self, elapsed):
+        summary_file = os.path.join(self.batch_dir, 'summary.json')
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump({'batch_id': self.batch_id, 'elapsed': round(elapsed, 1), 'sites': self.results},
+                      f, ensure_ascii=False, indent=2)
+
+        print(f"\n{'='*70}")
+        print(f"📊 批次工作摘要 ({self.batch_id})")
+        print(f"{'='*70}")
+        for result in self.results:
+            status = '✅' if result['exit_code'] == 0 else '❌'
+            print(f"{status} {result['url']}")
+            print(f"   截圖 {result['screenshots']}/{result['target']}，耗時 {result['duration']:.0f} 秒，記錄: {result['log']}")
+        succeeded = sum(1 for result in self.results if result['exit_code'] == 0)
+        total_screenshots = sum(result['screenshots'] for result in self.results)
+        print(f"{'='*70}")
+        print(f"成功 {succeeded}/{len(self.results)} 個網站，共 {total_screenshots} 張截圖，總耗時 {elapsed:.0f} 秒")
+        print(f"📁 摘要檔案: {summary_file}")
+        print(f"{'='*70}")
+
+
+def run_batch(batch_file=BATCH_FILE, max_browsers=None, per_domain_limit=None):
+    """讀取批次工作檔並執行所有網站"""
+    if not os.path.exists(batch_file):
+        print(f"❌ 找不到批次工作檔: {batch_file}")
+        return []
+    batch, sites = load_batch_file(batch_file)
+    if not sites:
+        print("❌ 批次工作檔沒有任何網站")
+        return []
+    scheduler = BatchScheduler(
+        sites,
+        max_browsers=max_browsers or batch.get('max_browsers', 2),
+        per_domain_limit=per_domain_limit or batch.get('per_domain_limit', 1)
+    )
+    return scheduler.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多網站批次排程器')
+    parser.add_argument('batch_file', nargs='?', default=BATCH_FILE, help=f'批次工作檔 (預設: {BATCH_FILE})')
+    parser.add_argument('--max-browsers', type=int, help='全域瀏覽器數量上限 (預設: 2)')
+    parser.add_argument('--per-domain', type=int, help='同一網域同時執行的網站數量上限 (預設: 1)')
+    args = parser.parse_args()
+
+    results = run_batch(args.batch_file, args.max_browsers, args.per_domain)
+    return 0 if results and all(result['exit_code'] == 0 for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+瀏覽器常駐服務
+在背景維持數個已暖機的 Chrome（開啟遠端偵錯埠）以及一個 ChromeDriver 伺服器，
+讓 ad_replacer_runner.py 每次執行時直接附加上去，省去啟動 Chrome 與 ChromeDriver 的時間
+
+使用方式：
+    python src/browser_daemon.py start --browsers 2     # 啟動常駐服務（前景執行，Ctrl+C 結束）
+    python src/browser_daemon.py status                 # 查看服務狀態
+    python src/browser_daemon.py stop                   # 停止服務
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import platform
+import argparse
+import subprocess
+import urllib.request
+
+DAEMON_DIR = 'data/browser_daemon'
+STATE_FILE = os.path.join(DAEMON_DIR, 'state.json')
+LEASE_DIR = os.path.join(DAEMON_DIR, 'leases')
+DEFAULT_BASE_PORT = 9222
+DEFAULT_DRIVER_PORT = 9515
+HEALTH_CHECK_INTERVAL = 10
+LEASE_STALE_SECONDS = 30    # 沒有租用者資訊的租約超過此秒數視為遺留
+
+CHROME_CANDIDATES = {
+    'Windows': [
+        r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+        r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+    ],
+    'Darwin': [
+        '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    ],
+    'Linux': [],
+}
+
+
+def find_chrome_binary():
+    """尋找 Chrome 執行檔"""
+    for name in ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']:
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in CHROME_CANDIDATES.get(platform.system(), []):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def is_browser_alive(debugger_address, timeout=2):
+    """檢查遠端偵錯埠是否可連線"""
+    try:
+        with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+def is_process_alive(pid):
+    """檢查行程是否仍在執行"""
+    if platform.system() == "Windows":
+        # Windows 上 os.kill(pid, 0) 會終止行程，改用 tasklist 查詢
+        result = subprocess.run(['tasklist', '/FI', f'PID eq {pid}'], capture_output=True, text=True)
+        return str(pid) in result.stdout
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def load_state():
+    """讀取常駐服務狀態，服務未執行時回傳 None"""
+    if not os.path.exists(STATE_FILE):
+        return None
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except Exception:
+        return None
+    if not is_process_alive(state.get('pid', -1)):
+        return None
+    return state
+
+
+def write_holder(lease_path):
+    """以暫存檔加改名的方式寫入租用者資訊，其他行程不會讀到寫到一半的檔案"""
+    holder_file = os.path.join(lease_path, 'holder.json')
+    temp_file = f"{holder_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({'pid': os.getpid(), 'since': time.time()}, f)
+    os.replace(temp_file, holder_file)
+
+
+def is_lease_abandoned(lease_path):
+    """租用者已結束但沒有歸還時回傳 True"""
+    try:
+        with open(os.path.join(lease_path, 'holder.json'), 'r', encoding='utf-8') as f:
+            holder = json.load(f)
+        return not is_process_alive(holder['pid'])
+    except (OSError, ValueError, KeyError):
+        pass
+    # 沒有或無法讀取租用者資訊：可能是剛建立租約、尚未寫入，只有放置過久才視為遺留
+    try:
+        return time.time() - os.path.getmtime(lease_path) > LEASE_STALE_SECONDS
+    except OSError:
+        return False
+
+
+def try_lease(lease_path):
+    """嘗試取得租約，成功時回傳 True"""
+    try:
+        os.mkdir(lease_path)
+        write_holder(lease_path)
+        return True
+    except FileExistsError:
+        pass
+
+    try:
+        stale_inode = os.stat(lease_path).st_ino
+    except OSError:
+        return False
+    if not is_lease_abandoned(lease_path):
+        return False
+
+    # 先將遺留的租約改名移走（只有一個行程能成功），再重新建立
+    stale_path = f"{lease_path}.stale.{os.getpid()}"
+    try:
+        os.rename(lease_path, stale_path)
+    except OSError:
+        return False
+    if os.stat(stale_path).st_ino != stale_inode:
+        # 移走的是其他行程剛回收後建立的租約，歸還給對方
+        try:
+            os.rename(stale_path, lease_path)
+        except OSError:
+            pass
+        return False
+    shutil.rmtree(stale_path, ignore_errors=True)
+    print(f"回收未歸還的瀏覽器租約: {lease_path}")
+
+    try:
+        os.mkdir(lease_path)
+    except FileExistsError:
+        return False
+    write_holder(lease_path)
+    return True
+
+
+def acquire_session():
+    """向常駐服務租用一個閒置的瀏覽器，回傳 session 資訊；沒有可用瀏覽器時回傳 None"""
+    state = load_state()
+    if not state:
+        return None
+
+    os.makedirs(LEASE_DIR, exist_ok=True)
+    for session in state['sessions']:
+        lease_path = os.path.join(LEASE_DIR, f"{session['port']}.lock")
+        if not try_lease(lease_path):
+            continue
+
+        # 取得租約後才進行較慢的連線檢查
+        if not is_browser_alive(session['debugger_address']):
+            shutil.rmtree(lease_path, ignore_errors=True)
+            continue
+
+        return {
+            'debugger_address': session['debugger_address'],
+            'driver_url': state.get('driver_url'),
+            'port': session['port']
+        }
+
+    return None
+
+
+def release_session(session):
+    """歸還租用的瀏覽器"""
+    if session:
+        shutil.rmtree(os.path.join(LEASE_DIR, f"{session['port']}.lock"), ignore_errors=True)
+
+
+class BrowserDaemon:
+    """啟動並看守常駐的 Chrome 與 ChromeDriver"""
+
+    def __init__(self, browsers=1, base_port=DEFAULT_BASE_PORT, driver_port=DEFAULT_DRIVER_PORT, headless=False):
+        self.browsers = browsers
+        self.base_port = base_port
+        self.driver_port = driver_port
+        self.headless = headless
+        self.chrome_binary = find_chrome_binary()
+        self.chrome_processes = {}
+        self.driver_process = None
+        self.running = False
+
+    def start_chrome(self, port):
+        profile_dir = os.path.abspath(os.path.join(DAEMON_DIR, f'profile_{port}'))
+        command = [
+            self.chrome_binary,
+            f'--remote-debugging-port={port}',
+            f'--user-data-dir={profile_dir}',
+            '--no-first-run',
+            '--no-default-browser-check',
+            '--disable-dev-shm-usage',
+            'about:blank'
+        ]
+        if self.headless:
+            command.insert(1, '--headless=new')
+        self.chrome_processes[port] = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        print(f"✅ 啟動 Chrome (偵錯埠 {port})")
+
+    def start_driver_server(self):
+        chromedriver = shutil.which('chromedriver')
+        if not chromedriver:
+            print("⚠️ 找不到 chromedriver，執行器將自行啟動 ChromeDriver 並附加到常駐的 Chrome")
+            return None
+        self.driver_process = subprocess.Popen(
+            [chromedriver, f'--port={self.driver_port}'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        print(f"✅ 啟動 ChromeDriver 伺服器 (埠 {self.driver_port})")
+        return f"http://127.0.0.1:{self.driver_port}"
+
+    def write_state(self, driver_url):
+        state = {
+            'pid': os.getpid(),
+            'driver_url': driver_url,
+            'started_at': time.time(),
+            'sessions': [
+                {'port': port, 'debugger_address': f"127.0.0.1:{port}"}
+                for port in self.chrome_processes
+            ]
+        }
+        with open(STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+
+    def run(self):
+        if not self.chrome_binary:
+            print("❌ 找不到 Chrome 執行檔")
+            return 1
+        if load_state():
+            print("⚠️ 常駐服務已在執行中")
+            return 1
+
+        # 清除上一次服務殘留的租約
+        shutil.rmtree(LEASE_DIR, ignore_errors=True)
+        os.makedirs(LEASE_DIR, exist_ok=True)
+
+        for i in range(self.browsers):
+            self.start_chrome(self.base_port + i)
+        driver_url = self.start_driver_server()
+        self.write_state(driver_url)
+
+        self.running = True
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, 'running', False))
+        print(f"🚀 瀏覽器常駐服務已啟動，共 {self.browsers} 個 Chrome，按 Ctrl+C 停止")
+
+        try:
+            while self.running:
+                time.sleep(HEALTH_CHECK_INTERVAL)
+                # 重新啟動已崩潰的 Chrome
+                for port, process in list(self.chrome_processes.items()):
+                    if process.poll() is not None:
+                        print(f"⚠️ Chrome (偵錯埠 {port}) 已結束，重新啟動")
+                        shutil.rmtree(os.path.join(LEASE_DIR, f"{port}.lock"), ignore_errors=True)
+                        self.start_chrome(port)
+                if self.driver_process and self.driver_process.poll() is not None:
+                    print("⚠️ ChromeDriver 伺服器已結束，重新啟動")
+                    self.start_driver_server()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+        return 0
+
+    def shutdown(self):
+        print("\n正在關閉瀏覽器常駐服務...")
+        for process in self.chrome_processes.values():
+            process.terminate()
+        if self.driver_process:
+            self.driver_process.terminate()
+        for process in list(self.chrome_processes.values()) + [self.driver_process]:
+            if process:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        if os.path.exists(STATE_FILE):
+            os.remove(STATE_FILE)
+        shutil.rmtree(LEASE_DIR, ignore_errors=True)
+        print("✅ 瀏覽器常駐服務已關閉")
+
+
+def show_status():
+    state = load_state()
+    if not state:
+        print("瀏覽器常駐服務未執行")
+        return 1
+    print(f"瀏覽器常駐服務執行中 (PID {state['pid']})")
+    print(f"ChromeDriver 伺服器: {state.get('driver_url') or '(無)'}")
+    for session in state['sessions']:
+        leased = os.path.exists(os.path.join(LEASE_DIR, f"{session['port']}.lock"))
+        alive = is_browser_alive(session['debugger_address'])
+        status = '使用中' if leased else '閒置'
+        print(f"  • {session['debugger_address']} - {'正常' if alive else '無回應'}，{status}")
+    return 0
+
+
+def stop_daemon():
+    state = load_state()
+    if not state:
+        print("瀏覽器常駐服務未執行")
+        return 1
+    os.kill(state['pid'], signal.SIGTERM)
+    print(f"✅ 已通知常駐服務停止 (PID {state['pid']})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='瀏覽器常駐服務')
+    parser.add_argument('action', choices=['start', 'status', 'stop'], help='操作')
+    parser.add_argument('--browsers', type=int, default=1, help='常駐的 Chrome 數量 (預設: 1)')
+    parser.add_argument('--base-port', type=int, default=DEFAULT_BASE_PORT, help=f'第一個偵錯埠 (預設: {DEFAULT_BASE_PORT})')
+    parser.add_argument('--driver-port', type=int, default=DEFAULT_DRIVER_PORT, help=f'ChromeDriver 伺服器埠 (預設: {DEFAULT_DRIVER_PORT})')
+    parser.add_argument('--headless', action='store_true', help='以無頭模式啟動 Chrome')
+    args = parser.parse_args()
+
+    os.makedirs(DAEMON_DIR, exist_ok=True)
+
+    if args.action == 'start':
+        daemon = BrowserDaemon(args.browsers, args.base_port, args.driver_port, args.headless)
+        return daemon.run()
+    elif args.action == 'status':
+        return show_status()
+    else:
+        return stop_daemon()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同步 CDP 引擎 - 與 Selenium 版 WebsiteAdReplacer 並存的替代引擎
+直接透過 websocket 與 Chrome DevTools Protocol 溝通，不經過 WebDriver：
+    • 每個指令以 future 追蹤回應，可同時送出多個指令（pipelining）
+    • 一個事件迴圈可同時驅動多個分頁，各分頁的等待時間互相重疊
+
+提供與 WebsiteAdReplacer 相同的操作：load / scan / replace / restore / screenshot
+
+需要額外安裝：pip install websockets
+使用方式：在設定中將 ENGINE 設為 "cdp"（CDP_TABS 設定同時處理的分頁數），
+或執行 python src/ad_replacer_runner.py --engine cdp
+"""
+
+import os
+import json
+import time
+import random
+import shutil
+import asyncio
+import tempfile
+import subprocess
+import urllib.request
+from urllib.parse import urlparse
+
+import browser_daemon
+import website_template_complete as engine
+from rate_limiter import DomainRateLimiter
+from yield_planner import YieldPlanner
+from link_discovery import discover_article_urls
+from crawl_frontier import crawl_article_urls
+from url_history import UrlHistory
+from screenshot_writer import ScreenshotWriter
+from screenshot_manifest import ScreenshotManifest
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+# 單次掃描所有可見元素，找出符合尺寸的廣告並標記 data-ad-replacer-slot，
+# 之後的替換、復原與捲動都以標記找回元素，不需要傳遞元素參照
+SCAN_ADS_SCRIPT = """
+(function(targetWidth, targetHeight) {
+    window.__adReplacerSlotSeq = window.__adReplacerSlotSeq || 0;
+    var results = [];
+    var adKeywords = ['ad', 'advertisement', 'banner', 'google', 'ads', 'ad-', '-ad'];
+    var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT, {
+        acceptNode: function(node) {
+            var style = window.getComputedStyle(node);
+            if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') {
+                return NodeFilter.FILTER_REJECT;
+            }
+            return NodeFilter.FILTER_ACCEPT;
+        }
+    });
+    var node;
+    while (node = walker.nextNode()) {
+        var rect = node.getBoundingClientRect();
+        if (Math.round(rect.width) !== targetWidth || Math.round(rect.height) !== targetHeight) continue;
+        var tagName = node.tagName.toLowerCase();
+        var className = (typeof node.className === 'string' ? node.className : '').toLowerCase();
+        var id = (node.id || '').toLowerCase();
+        var src = (node.src || '').toLowerCase();
+        var hasAdKeyword = adKeywords.some(function(keyword) {
+            return className.includes(keyword) || id.includes(keyword) || src.includes(keyword);
+        });
+        var isImageElement = tagName === 'img' || tagName === 'iframe' || tagName === 'div';
+        var background = window.getComputedStyle(node).backgroundImage;
+        var hasBackgroundImage = background && background !== 'none';
+        if (!(hasAdKeyword || isImageElement || hasBackgroundImage)) continue;
+        var slot = node.getAttribute('data-ad-replacer-slot');
+        if (!slot) {
+            slot = String(++window.__adReplacerSlotSeq);
+            node.setAttribute('data-ad-replacer-slot', slot);
+        }
+        results.push({
+            slot: slot,
+            width: Math.round(rect.width),
+            height: Math.round(rect.height),
+            top: rect.top + window.pageYOffset,
+            left: rect.left + window.pageXOffset
+        });
+    }
+    return results;
+})(%d, %d)
+"""
+
+
+class CDPError(Exception):
+    """CDP 指令回傳錯誤"""
+
+
+# 單一 CDP 指令等待回應的秒數上限，瀏覽器卡住時不會讓分頁永遠等待
+CDP_COMMAND_TIMEOUT = 30
+
+
+class CDPTab:
+    """單一分頁的 CDP 連線，負責送出指令與分派事件"""
+
+    def __init__(self, target_id, websocket_url):
+        self.target_id = target_id
+        self.websocket_url = websocket_url
+        self.connection = None
+        self.next_id = 0
+        self.pending = {}
+        self.event_waiters = {}
+        self.reader_task = None
+
+    async def connect(self):
+        # 截圖的 base64 資料可能超過預設的訊息大小上限
+        self.connection = await websockets.connect(self.websocket_url, max_size=None)
+        self.reader_task = asyncio.ensure_future(self.read_loop())
+
+    async def read_loop(self):
+        try:
+            async for raw in self.connection:
+                message = json.loads(raw)
+                if 'id' in message:
+                    future = self.pending.pop(message['id'], None)
+                    if future and not future.done():
+                        if 'error' in message:
+                            future.set_exception(CDPError(message['error'].get('message', '')))
+                        else:
+                            future.set_result(message.get('result', {}))
+                else:
+                    for future in self.event_waiters.pop(message.get('method'), []):
+                        if not future.done():
+                            future.set_result(message.get('params', {}))
+        except Exception:
+            pass
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(CDPError("分頁連線已關閉"))
+            self.pending = {}
+
+    def send(self, method, params=None, timeout=CDP_COMMAND_TIMEOUT):
+        """送出 CDP 指令並回傳可等待的回應，呼叫端可以先送出多個指令再一起等待"""
+        self.next_id += 1
+        message_id = self.next_id
+        future = asyncio.get_event_loop().create_future()
+        self.pending[message_id] = future
+        asyncio.ensure_future(self.connection.send(json.dumps({
+            'id': message_id, 'method': method, 'params': params or {}
+        })))
+        return self.wait_response(message_id, future, method, timeout)
+
+    async def wait_response(self, message_id, future, method, timeout):
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(message_id, None)
+            raise CDPError(f"{method} 超過 {timeout} 秒沒有回應")
+
+    def wait_for_event(self, method):
+        future = asyncio.get_event_loop().create_future()
+        self.event_waiters.setdefault(method, []).append(future)
+        return future
+
+    async def evaluate(self, expression):
+        result = await self.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': True
+        })
+        if 'exceptionDetails' in result:
+            raise CDPError(result['exceptionDetails'].get('text', '腳本執行失敗'))
+        return result.get('result', {}).get('value')
+
+    async def close(self):
+        if self.connection:
+            await self.connection.close()
+        if self.reader_task:
+            await self.reader_task
+
+
+class AsyncCDPAdReplacer:
+    """非同步 CDP 版本的廣告替換引擎"""
+
+    def __init__(self, debugger_address=None, tabs=2, headless=True):
+        if websockets is None:
+            raise ImportError("CDP 引擎需要 websockets 套件，請執行: pip install websockets")
+        self.debugger_address = debugger_address
+        self.tab_count = tabs
+        self.headless = headless
+        self.chrome_process = None
+        self.profile_dir = None
+        self.daemon_session = None
+        self.replace_images = []
+        self.image_cache = {}
+        self.screenshot_count = 0
+        self.pages_scanned = {}    # 各網域已掃描廣告的文章數
+        self.seen_sizes = {}       # 各網域出現過的廣告尺寸
+        # 失敗預算：所有分頁共用，連續多篇文章沒有截圖或嘗試的文章數達到上限時停止此網站
+        self.consecutive_failures = 0
+        self.attempts = 0
+        self.stop_reason = None
+        self.run_stats = {'page_loads': [], 'screenshots': 0}
+        self.yield_planner = None
+        if engine.YIELD_PLANNER:
+            self.yield_planner = YieldPlanner(engine.YIELD_HISTORY_FILE, engine.YIELD_EXPLORATION)
+        self.url_history = UrlHistory(ttl_days=engine.URL_HISTORY_TTL_DAYS) if engine.URL_HISTORY else None
+        self.screenshot_writer = ScreenshotWriter(engine.SCREENSHOT_WRITERS, engine.SCREENSHOT_WRITE_QUEUE,
+                                                  engine.SCREENSHOT_FORMAT, engine.IMAGE_QUALITY,
+                                                  engine.PNG_COMPRESS_LEVEL)
+        self.manifest = ScreenshotManifest(engine.SCREENSHOT_FOLDER)
+        self.screenshot_writer.on_written = self.manifest.complete
+        self.deduplicator = engine.WebsiteAdReplacer.create_deduplicator()
+        if self.deduplicator:
+            self.screenshot_writer.duplicate_filter = self.filter_duplicate
+        self.rate_limiter = None
+        if engine.DOMAIN_RATE_LIMIT:
+            self.rate_limiter = DomainRateLimiter(
+                engine.DOMAIN_RATE_LIMIT, engine.DOMAIN_BURST, engine.DOMAIN_CONCURRENCY
+            )
+
+    # ---------- 瀏覽器與分頁 ----------
+
+    def start_browser(self):
+        """附加到指定位址或常駐服務的 Chrome，否則自行啟動一個"""
+        if not self.debugger_address and engine.USE_BROWSER_DAEMON:
+            self.daemon_session = browser_daemon.acquire_session()
+            if self.daemon_session:
+                self.debugger_address = self.daemon_session['debugger_address']
+
+        if self.debugger_address:
+            print(f"✅ CDP 引擎附加到 Chrome: {self.debugger_address}")
+            return
+
+        chrome_binary = browser_daemon.find_chrome_binary()
+        if not chrome_binary:
+            raise RuntimeError("找不到 Chrome 執行檔")
+        # 每次執行使用獨立的暫存設定檔，偵錯埠由 Chrome 自行選擇空閒的埠 (0)，
+        # 同時執行的多個網站不會附加到彼此的瀏覽器
+        profile_root = os.path.abspath(os.path.join('data', 'cdp_profile'))
+        os.makedirs(profile_root, exist_ok=True)
+        self.profile_dir = tempfile.mkdtemp(prefix=f"{os.getpid()}_", dir=profile_root)
+        window_size = engine.BROWSER_WINDOW_SIZE
+        command = [
+            chrome_binary,
+            '--remote-debugging-port=0',
+            f'--user-data-dir={self.profile_dir}',
+            f"--window-size={window_size['width']},{window_size['height']}",
+            '--no-first-run',
+            '--no-default-browser-check',
+            '--disable-background-timer-throttling',
+            '--disable-renderer-backgrounding',
+            '--disable-backgrounding-occluded-windows',
+            'about:blank'
+        ]
+        if self.headless:
+            command.insert(1, '--headless=new')
+        self.chrome_process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chrome 啟動後將實際的偵錯埠寫入設定檔中的 DevToolsActivePort
+        port_file = os.path.join(self.profile_dir, 'DevToolsActivePort')
+        deadline = time.time() + 30
+        while not self.debugger_address or not browser_daemon.is_browser_alive(self.debugger_address):
+            if time.time() > deadline:
+                raise RuntimeError("Chrome 啟動逾時")
+            if self.chrome_process.poll() is not None:
+                raise RuntimeError(f"Chrome 啟動失敗 (結束代碼 {self.chrome_process.returncode})")
+            if not self.debugger_address:
+                try:
+                    with open(port_file, 'r', encoding='utf-8') as f:
+                        port = f.readline().strip()
+                    if port:
+                        self.debugger_address = f"127.0.0.1:{port}"
+                except OSError:
+                    pass
+            time.sleep(0.2)
+        print(f"✅ CDP 引擎已啟動 Chrome: {self.debugger_address}")
+
+    def stop_browser(self):
+        if self.chrome_process:
+            self.chrome_process.terminate()
+            try:
+                self.chrome_process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.chrome_process.kill()
+                self.chrome_process.wait()
+            self.chrome_process = None
+        if self.profile_dir:
+            # 暫存設定檔不會重複使用，結束時刪除
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+        browser_daemon.release_session(self.daemon_session)
+        self.daemon_session = None
+
+    def http_request(self, path, method='GET'):
+        request = urllib.request.Request(f"http://{self.debugger_address}{path}", method=method)
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read().decode('utf-8') or 'null')
+
+    async def open_tab(self):
+        """開新分頁並套用載入設定與全螢幕廣告抑制腳本"""
+        loop = asyncio.get_event_loop()
+        target = await loop.run_in_executor(None, self.http_request, '/json/new?about:blank', 'PUT')
+        tab = CDPTab(target['id'], target['webSocketDebuggerUrl'])
+        await tab.connect()
+
+        window_size = engine.BROWSER_WINDOW_SIZE
+        commands = [
+            tab.send('Page.enable'),
+            tab.send('Runtime.enable'),
+            tab.send('Emulation.setDeviceMetricsOverride', {
+                'width': window_size['width'], 'height': window_size['height'],
+                'deviceScaleFactor': 1, 'mobile': False
+            }),
+        ]
+        if engine.BLOCK_HEAVY_RESOURCES:
+            commands.append(tab.send('Network.enable'))
+            commands.append(tab.send('Network.setBlockedURLs', {'urls': self.get_blocked_url_patterns()}))
+        if engine.OVERLAY_SUPPRESSOR:
+            script = engine.OVERLAY_SUPPRESSOR_SCRIPT % (
+                json.dumps(engine.FULLSCREEN_AD_SELECTORS),
+                json.dumps(engine.OVERLAY_CSS_SELECTORS)
+            )
+            commands.append(tab.send('Page.addScriptToEvaluateOnNewDocument', {'source': script}))
+        # 同時送出所有設定指令，只等待一次往返
+        await asyncio.gather(*commands)
+        return tab
+
+    async def close_tab(self, tab):
+        await tab.close()
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self.http_request, f'/json/close/{tab.target_id}')
+        except Exception:
+            pass
+
+    def get_blocked_url_patterns(self):
+        return engine.WebsiteAdReplacer.get_blocked_url_patterns(self)
+
+    # ---------- 與 WebsiteAdReplacer 對應的操作 ----------
+
+    def load_replace_images(self):
+        """沿用 Selenium 引擎的圖片載入規則"""
+        engine.WebsiteAdReplacer.load_replace_images(self)
+
+    def load_image_base64(self, image_path):
+        return engine.WebsiteAdReplacer.load_image_base64(self, image_path)
+
+    def should_skip_size(self, domain, size_key):
+        return engine.WebsiteAdReplacer.should_skip_size(self, domain, size_key)
+
+    def filter_duplicate(self, filepath, load_image):
+        return engine.WebsiteAdReplacer.filter_duplicate(self, filepath, load_image)
+
+    async def load(self, tab, url):
+        """載入網頁，依頁面載入策略等待 DOMContentLoaded 或 load 事件"""
+        event = 'Page.loadEventFired' if engine.PAGE_LOAD_STRATEGY == 'normal' else 'Page.domContentEventFired'
+        domain = urlparse(url).netloc
+        slot = None
+        if self.rate_limiter:
+            # 速率限制會阻塞等待，放到執行緒中避免卡住其他分頁
+            slot = await asyncio.get_event_loop().run_in_executor(None, self.rate_limiter.acquire, domain)
+        start_time = time.time()
+        try:
+            loaded = tab.wait_for_event(event)
+            await tab.send('Page.navigate', {'url': url})
+            try:
+                await asyncio.wait_for(loaded, timeout=engine.PAGE_LOAD_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"頁面載入逾時，繼續處理: {url}")
+        finally:
+            self.run_stats['page_loads'].append(time.time() - start_time)
+            if self.rate_limiter:
+                self.rate_limiter.release(domain, slot)
+
+    async def scan(self, tab, target_width, target_height):
+        """單次腳本掃描符合尺寸的廣告元素"""
+        return await tab.evaluate(SCAN_ADS_SCRIPT % (target_width, target_height)) or []
+
+    def script_call(self, script, *args):
+        """組合執行 Selenium 風格 (arguments[N]) 腳本的運算式"""
+        encoded_args = ', '.join(json.dumps(arg) for arg in args)
+        return f"(function() {{ {script} }}).apply(null, [{encoded_args}])"
+    
+    def slot_call(self, script, slot, *args):
+        """同 script_call，第一個參數為以 slot 標記找回的元素"""
+        encoded_args = ''.join(', ' + json.dumps(arg) for arg in args)
+        return (f"(function() {{ {script} }}).apply(null, "
+                f"[document.querySelector('[data-ad-replacer-slot=\"{slot}\"]'){encoded_args}])")
+
+    async def replace(self, tab, ad, image_data, target_width, target_height):
+        button_style = engine.BUTTON_STYLES.get(engine.BUTTON_STYLE, engine.BUTTON_STYLES['dots'])
+        return bool(await tab.evaluate(self.slot_call(
+            engine.REPLACE_AD_SCRIPT, ad['slot'], image_data, target_width, target_height,
+            button_style['close_button']['html'], button_style['close_button']['style'],
+            button_style['info_button']['html'], button_style['info_button']['style'], False
+        )))
+
+    async def restore(self, tab, ad):
+        await tab.evaluate(self.slot_call(engine.RESTORE_AD_SCRIPT, ad['slot']))
+
+    async def screenshot(self, tab, url, image_info, ad=None):
+        """以 Page.captureScreenshot 擷取分頁畫面；element 模式只擷取廣告位置與周圍邊距"""
+        filepath = self.manifest.build_path(url, image_info['width'], image_info['height'],
+                                            self.screenshot_writer.extension)
+        # Chrome 可直接輸出 JPEG / 有損 WebP，省去重新編碼
+        capture_format = self.screenshot_writer.format if self.screenshot_writer.format in ('jpeg', 'webp') else 'png'
+        params = {'format': capture_format}
+        if capture_format != 'png':
+            params['quality'] = engine.IMAGE_QUALITY
+        if engine.SCREENSHOT_MODE == "element" and ad is not None:
+            clip = await tab.evaluate(self.slot_call(engine.ELEMENT_CLIP_SCRIPT, ad['slot'], engine.SCREENSHOT_MARGIN))
+            if clip:
+                params.update({'clip': clip, 'captureBeyondViewport': True})
+        self.manifest.register(filepath, url, image_info['width'], image_info['height'], image_info['filename'])
+        try:
+            if self.deduplicator and ad is not None:
+                # 重複截圖偵測只雜湊廣告版位所在的區域
+                geometry = await tab.evaluate(self.slot_call(engine.SLOT_GEOMETRY_SCRIPT, ad['slot']))
+                if geometry:
+                    region = engine.WebsiteAdReplacer.get_slot_region(
+                        geometry, 'clip' if 'clip' in params else 'viewport', params.get('clip'))
+                    self.manifest.annotate(filepath, slot_region=region)
+            result = await tab.send('Page.captureScreenshot', params)
+        except Exception:
+            self.manifest.discard(filepath)
+            raise
+        # 重複截圖比對與等待寫入佇列空位都可能阻塞，交給執行緒處理，事件迴圈繼續驅動其他分頁
+        saved_path = await asyncio.get_event_loop().run_in_executor(
+            None, self.screenshot_writer.write_base64, filepath, result['data'], capture_format
+        )
+        if saved_path is None:
+            # 重複的截圖已捨棄，不加入清單
+            self.manifest.discard(filepath)
+        return saved_path
+
+    # ---------- 流程 ----------
+
+    async def harvest_links(self, base_url, count):
+        base_domain = urlparse(base_url).netloc
+        domains = [base_domain, base_domain.replace('www.', '')]
+        selectors = engine.CUSTOM_LINK_SELECTORS or engine.LINK_SELECTORS
+
+        # 先以 HTTP 探索，連結足夠時不必開分頁載入首頁
+        links = []
+        loop = asyncio.get_event_loop()
+        if engine.LINK_DISCOVERY != "browser":
+            links = await loop.run_in_executor(None, discover_article_urls, base_url, selectors, domains,
+                                               count, self.rate_limiter)
+        if engine.LINK_DISCOVERY != "http" and len(links) < count:
+            tab = await self.open_tab()
+            try:
+                await self.load(tab, base_url)
+                await asyncio.sleep(engine.WAIT_TIME)
+                results = await tab.evaluate(
+                    self.script_call(engine.HARVEST_LINKS_SCRIPT, selectors, domains)
+                ) or {}
+            finally:
+                await self.close_tab(tab)
+            seen_urls = set(links) | {base_url.split('#')[0]}
+            for selector in selectors:
+                for href in results.get(selector, {}).get('hrefs', []):
+                    if href not in seen_urls:
+                        seen_urls.add(href)
+                        links.append(href)
+        if len(links) < count and engine.CRAWL_MAX_PAGES:
+            links += await loop.run_in_executor(
+                None, crawl_article_urls, base_url, selectors, domains, links, count * 2,
+                engine.CRAWL_MAX_DEPTH, engine.CRAWL_MAX_PAGES, self.rate_limiter
+            )
+        print(f"總共找到 {len(links)} 個有效連結")
+        if self.url_history:
+            links = self.url_history.prefer_unseen(links, count)
+        if self.yield_planner:
+            return self.yield_planner.plan(links, count)
+        return random.sample(links, count) if len(links) > count else links
+
+    async def settle_screenshots(self, paths):
+        """等待截圖寫入磁碟，寫入失敗的截圖歸還名額，回傳寫入成功的路徑"""
+        written = await asyncio.get_event_loop().run_in_executor(None, self.screenshot_writer.wait_written, paths)
+        for path in set(paths) - set(written):
+            print(f"❌ 截圖寫入失敗，不計入截圖數量: {path}")
+        self.screenshot_count -= len(paths) - len(written)
+        return written
+
+    async def process_article(self, tab, tab_index, url):
+        """處理單篇文章，截圖確實寫入磁碟後才回傳並計入成果"""
+        screenshot_paths = []
+        try:
+            await self.capture_article(tab, tab_index, url, screenshot_paths)
+        finally:
+            written = await self.settle_screenshots(screenshot_paths)
+        return written
+
+    async def capture_article(self, tab, tab_index, url, screenshot_paths):
+        """處理單篇文章，流程與 WebsiteAdReplacer.process_website 相同；截圖路徑加入 screenshot_paths"""
+        print(f"[分頁 {tab_index}] 開始處理: {url}")
+        await self.load(tab, url)
+        # 各分頁的等待互相重疊，不會阻塞其他分頁
+        await asyncio.sleep(engine.WAIT_TIME + 5)
+        await tab.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        await asyncio.sleep(2)
+        await tab.evaluate("window.scrollTo(0, 0)")
+        await asyncio.sleep(2)
+
+        # 已掃描多篇文章都沒出現過的尺寸，此網站大概沒有這個版位
+        domain = urlparse(url).netloc
+        self.pages_scanned[domain] = self.pages_scanned.get(domain, 0) + 1
+        images = []
+        for image in self.replace_images:
+            size_key = f"{image['width']}x{image['height']}"
+            if self.should_skip_size(domain, size_key):
+                print(f"[分頁 {tab_index}] 略過此網站未出現過的尺寸: {size_key}")
+            else:
+                images.append(image)
+
+        # 同時送出所有尺寸的掃描，一次等待所有結果
+        scans = await asyncio.gather(*[
+            self.scan(tab, image['width'], image['height']) for image in images
+        ], return_exceptions=True)
+
+        for image_info, matches in zip(images, scans):
+            if isinstance(matches, Exception) or not matches:
+                continue
+            self.seen_sizes.setdefault(domain, set()).add(f"{image_info['width']}x{image_info['height']}")
+            image_data = self.load_image_base64(image_info['path'])
+            for ad in matches:
+                # 在第一個 await 之前預留名額，其他分頁檢查時就會看到，不會超過截圖數量
+                if self.screenshot_count >= engine.SCREENSHOT_COUNT:
+                    return
+                self.screenshot_count += 1
+                screenshot_path = None
+                replaced = False
+                try:
+                    replaced = await self.replace(tab, ad, image_data, image_info['width'], image_info['height'])
+                    if not replaced:
+                        continue
+                    viewport_height = await tab.evaluate("window.innerHeight")
+                    await tab.evaluate(f"window.scrollTo(0, {ad['top'] - viewport_height * 0.3})")
+                    await asyncio.sleep(2)
+                    screenshot_path = await self.screenshot(tab, url, image_info, ad)
+                    if screenshot_path:
+                        screenshot_paths.append(screenshot_path)
+                        print(f"[分頁 {tab_index}] ✅ 截圖擷取完成: {screenshot_path}")
+                finally:
+                    if not screenshot_path:
+                        # 替換失敗、擷取失敗或重複的截圖，釋放預留的名額
+                        self.screenshot_count -= 1
+                    if replaced:
+                        await self.restore(tab, ad)
+
+    async def tab_worker(self, tab_index, url_queue, results):
+        tab = await self.open_tab()
+        try:
+            while self.screenshot_count < engine.SCREENSHOT_COUNT and not self.stop_reason:
+                if self.attempts >= engine.MAX_ATTEMPTS:
+                    self.stop_reason = f"已嘗試 {self.attempts} 篇文章，達到 MAX_ATTEMPTS 上限"
+                    break
+                try:
+                    url = url_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                self.attempts += 1
+                paths = []
+                try:
+                    paths = await self.process_article(tab, tab_index, url)
+                    results.extend(paths)
+                    if self.yield_planner:
+                        self.yield_planner.record(url, len(paths))
+                    if self.url_history:
+                        self.url_history.record(url, len(paths))
+                except Exception as e:
+                    print(f"[分頁 {tab_index}] ❌ 處理網站失敗: {e}")
+                self.consecutive_failures = 0 if paths else self.consecutive_failures + 1
+                if self.consecutive_failures >= engine.MAX_CONSECUTIVE_FAILURES and not self.stop_reason:
+                    self.stop_reason = (f"連續 {self.consecutive_failures} 篇文章沒有產生截圖，"
+                                        f"此網站可能沒有符合尺寸的版位")
+                    print(f"[分頁 {tab_index}] ⛔ {self.stop_reason}，停止此網站")
+        finally:
+            await self.close_tab(tab)
+
+    async def run(self, base_url):
+        self.load_replace_images()
+        news_urls = await self.harvest_links(base_url, engine.NEWS_COUNT)
+
+        url_queue = asyncio.Queue()
+        for url in news_urls:
+            url_queue.put_nowait(url)
+
+        results = []
+        await asyncio.gather(*[
+            self.tab_worker(i, url_queue, results) for i in range(min(self.tab_count, len(news_urls)))
+        ])
+        self.run_stats['screenshots'] = len(results)
+        if not self.stop_reason:
+            self.stop_reason = (f"已達到目標截圖數量 {engine.SCREENSHOT_COUNT}"
+                                if self.screenshot_count >= engine.SCREENSHOT_COUNT else "所有文章都已處理")
+        return results
+
+
+def run_cdp_engine(base_url, tabs=2):
+    """以 CDP 引擎處理網站，回傳所有截圖路徑"""
+    print(f"目標網站: {base_url}")
+    print(f"🚀 使用非同步 CDP 引擎，同時處理 {tabs} 個分頁")
+    # 有畫面的 Chrome 不會繪製背景分頁，自行啟動時一律使用無頭模式
+    replacer = AsyncCDPAdReplacer(debugger_address=engine.DEBUGGER_ADDRESS or None, tabs=tabs)
+    start_time = time.time()
+    try:
+        # 啟動失敗時同樣需要關閉 Chrome 並刪除暫存設定檔
+        replacer.start_browser()
+        screenshots = asyncio.run(replacer.run(base_url))
+    finally:
+        replacer.screenshot_writer.close()
+        replacer.stop_browser()
+
+    page_loads = replacer.run_stats['page_loads']
+    print(f"\n{'='*50}")
+    print(f"所有網站處理完成！總共產生 {len(screenshots)} 張截圖，耗時 {time.time() - start_time:.0f} 秒")
+    print(f"停止原因: {replacer.stop_reason}")
+    if page_loads:
+        print(f"頁面載入: {len(page_loads)} 次，平均 {sum(page_loads) / len(page_loads):.2f} 秒")
+    if replacer.rate_limiter:
+        print(f"網域速率限制: 等待 {replacer.rate_limiter.throttled_seconds:.1f} 秒")
+    if replacer.deduplicator:
+        print(f"重複截圖: {replacer.deduplicator.duplicates} 張")
+    writer_summary = replacer.screenshot_writer.get_summary()
+    if writer_summary:
+        print(writer_summary)
+    print(f"{'='*50}")
+    return screenshots
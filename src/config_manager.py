@@ -12,6 +12,7 @@ import sys
 from datetime import datetime
 
 CONFIG_FILE = 'ad_replacer_config.json'
+BATCH_FILE = 'ad_replacer_batch.json'
 
 def load_config():
     """載入現有設定"""
@@ -36,6 +37,16 @@ def load_config():
         'max_failures': 3,
         'fullscreen': True,
         'debug_mode': True,
+        'page_load_strategy': 'eager',
+        'block_resources': True,
+        'persistent_profile': False,
+        'profile_cache_size': 300,
+        'use_browser_daemon': False,
+        'workers': 1,
+        'headless': False,
+        'prefetch_tabs': 0,
+        'engine': 'selenium',
+        'cdp_tabs': 3,
         'last_updated': ''
     }
 
@@ -100,6 +111,14 @@ def show_current_config(config):
     print(f"⏳ 等待時間: {config.get('wait_time', 3)} 秒")
     print(f"❌ 失敗限制: {config.get('max_failures', 3)}")
     print(f"🔍 偵測調試: {'是' if config.get('debug_mode', False) else '否'}")
+    print(f"🚦 載入策略: {config.get('page_load_strategy', 'eager')}")
+    print(f"🚫 封鎖重資源: {'是' if config.get('block_resources', True) else '否'}")
+    print(f"💾 持久化快取: {'是' if config.get('persistent_profile', False) else '否'} (上限 {config.get('profile_cache_size', 300)}MB)")
+    print(f"🔌 常駐瀏覽器: {'是' if config.get('use_browser_daemon', False) else '否'}")
+    print(f"👷 平行工作者: {config.get('workers', 1)}")
+    print(f"👻 無頭模式: {'是' if config.get('headless', False) else '否'}")
+    print(f"📑 預載分頁: {config.get('prefetch_tabs', 0)}")
+    print(f"⚙️ 執行引擎: {config.get('engine', 'selenium')} (CDP 分頁 {config.get('cdp_tabs', 3)})")
     if config['last_updated']:
         print(f"⏰ 最後更新: {config['last_updated'][:19].replace('T', ' ')}")
     print("="*60)
@@ -183,6 +202,41 @@ def interactive_config():
     print("   偵測調試模式: 顯示詳細的廣告偵測過程資訊")
     config['debug_mode'] = get_user_input("🔍 偵測調試模式 (y/n)", 'y' if config.get('debug_mode', False) else 'n', bool)
     
+    print("   頁面載入策略: eager 不等待字型、影片等資源即開始處理 (normal / eager / none)")
+    load_strategies = ['normal', 'eager', 'none']
+    while True:
+        strategy = get_user_input("🚦 頁面載入策略", config.get('page_load_strategy', 'eager'))
+        if strategy in load_strategies:
+            config['page_load_strategy'] = strategy
+            break
+        else:
+            print(f"❌ 請輸入有效的策略: {', '.join(load_strategies)}")
+    
+    print("   封鎖重資源: 封鎖分析與社群外掛等非廣告網域的資源")
+    config['block_resources'] = get_user_input("🚫 封鎖重資源 (y/n)", 'y' if config.get('block_resources', True) else 'n', bool)
+    
+    print("   持久化快取: 保留 Chrome 設定檔與快取，同網站後續執行可暖啟動")
+    config['persistent_profile'] = get_user_input("💾 持久化快取 (y/n)", 'y' if config.get('persistent_profile', False) else 'n', bool)
+    config['profile_cache_size'] = get_user_input("💾 快取上限(MB)", config.get('profile_cache_size', 300), int)
+    
+    print("   常駐瀏覽器: 附加到 browser_daemon.py 維持的 Chrome，省去每次啟動瀏覽器的時間")
+    config['use_browser_daemon'] = get_user_input("🔌 使用常駐瀏覽器 (y/n)", 'y' if config.get('use_browser_daemon', False) else 'n', bool)
+    
+    print("   平行工作者: 同時開啟多個瀏覽器處理文章 (1 表示依序處理)")
+    config['workers'] = get_user_input("👷 平行工作者數量", config.get('workers', 1), int)
+    
+    print("   無頭模式: 不開啟瀏覽器視窗，適合沒有螢幕的伺服器 (以瀏覽器截圖)")
+    config['headless'] = get_user_input("👻 無頭模式 (y/n)", 'y' if config.get('headless', False) else 'n', bool)
+    
+    print("   預載分頁: 處理目前文章時在背景分頁預先載入接下來的文章 (0 表示停用)")
+    config['prefetch_tabs'] = get_user_input("📑 預載分頁數量", config.get('prefetch_tabs', 0), int)
+    
+    print("   執行引擎: selenium 為預設引擎；cdp 以單一事件迴圈同時處理多個分頁 (需要 pip install websockets)")
+    engine = get_user_input("⚙️ 執行引擎 (selenium/cdp)", config.get('engine', 'selenium'))
+    config['engine'] = engine if engine in ('selenium', 'cdp') else 'selenium'
+    if config['engine'] == 'cdp':
+        config['cdp_tabs'] = get_user_input("📑 CDP 同時處理分頁數量", config.get('cdp_tabs', 3), int)
+    
     return config
 
 def build_command(config):
@@ -217,9 +271,10 @@ def main():
         print("2️⃣ 修改設定")
         print("3️⃣ 執行廣告替換")
         print("4️⃣ 修改設定並立即執行")
-        print("5️⃣ 離開")
+        print("5️⃣ 執行批次工作 (多個網站)")
+        print("6️⃣ 離開")
         
-        choice = input("\n請輸入選項 (1-5): ").strip()
+        choice = input("\n請輸入選項 (1-6): ").strip()
         
         if choice == '1':
             # 查看設定
@@ -269,6 +324,21 @@ def main():
                 print("\n⏹️ 使用者中斷執行")
             
         elif choice == '5':
+            # 批次執行多個網站，各網站沿用目前設定並套用批次工作檔中的覆寫值
+            if not os.path.exists(BATCH_FILE):
+                print(f"\n❌ 找不到批次工作檔 {BATCH_FILE}，格式請參考 src/batch_scheduler.py")
+                continue
+            
+            cmd = ['python', 'src/batch_scheduler.py', BATCH_FILE]
+            print(f"\n🚀 執行命令: {' '.join(cmd)}")
+            print("="*50)
+            
+            try:
+                subprocess.run(cmd)
+            except KeyboardInterrupt:
+                print("\n⏹️ 使用者中斷執行")
+            
+        elif choice == '6':
             print("\n👋 再見!")
             break
             
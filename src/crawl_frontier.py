@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多層爬取佇列
+首頁的文章連結不足 NEWS_COUNT 時，以廣度優先方式爬取同網域的分類頁（不使用瀏覽器），
+從更大的候選池中收集文章連結，不必手動調整選擇器
+
+    • 網址正規化：去除追蹤參數 (utm_*、fbclid 等) 與 #錨點，主機名稱轉小寫
+    • 以 64 位元雜湊集合記錄看過的網址，數十萬個網址也只佔少量記憶體
+    • 以深度與頁數上限控制爬取成本 (CRAWL_MAX_DEPTH / CRAWL_MAX_PAGES)
+"""
+
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+
+import link_discovery
+
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|dclid|msclkid|yclid|mc_cid|mc_eid|_ga|ref|ref_src|spm|from)$', re.I)
+SKIPPED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.pdf', '.zip', '.mp4', '.mp3', '.xml', '.css', '.js')
+MAX_SECTION_DEPTH = 2       # 分類頁路徑最多幾層，例如 /news/sports
+
+
+def normalize_url(url):
+    """正規化網址：去除追蹤參數與錨點，主機名稱轉小寫並移除預設埠號"""
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if (parsed.scheme == 'http' and netloc.endswith(':80')) or (parsed.scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = urlencode([(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                       if not TRACKING_PARAMS.match(key)])
+    return urlunparse((parsed.scheme.lower(), netloc, parsed.path or '/', parsed.params, query, ''))
+
+
+def url_hash(url):
+    """網址的 64 位元雜湊值"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class SeenUrls:
+    """以雜湊值記錄看過的網址（碰撞機率可忽略）"""
+
+    def __init__(self):
+        self.hashes = set()
+
+    def add(self, url):
+        """加入網址，已存在時回傳 False"""
+        key = url_hash(url)
+        if key in self.hashes:
+            return False
+        self.hashes.add(key)
+        return True
+
+    def __contains__(self, url):
+        return url_hash(url) in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+class CrawlFrontier:
+    """同網域分類頁的廣度優先爬取"""
+
+    def __init__(self, base_url, selectors, domains, max_depth=2, max_pages=20, rate_limiter=None):
+        self.base_url = base_url
+        self.selectors = selectors
+        self.domains = domains
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        # 分類頁與 HTTP 探索使用相同的抓取方式，同樣經過網域速率限制
+        self.discovery = link_discovery.LinkDiscovery(base_url, selectors, domains, rate_limiter)
+        self.seen = SeenUrls()
+
+    def is_section_page(self, url):
+        """分類頁：同網域、路徑不深、不是文章或檔案"""
+        path = urlparse(url).path.lower()
+        if path.endswith(SKIPPED_EXTENSIONS):
+            return False
+        if any(pattern in url for pattern in self.discovery.href_patterns):
+            return False
+        segments = [segment for segment in path.split('/') if segment]
+        return 0 < len(segments) <= MAX_SECTION_DEPTH
+
+    def parse_page(self, html, page_url):
+        """回傳 (文章連結, 分類頁連結)"""
+        soup = link_discovery.BeautifulSoup(html, 'html.parser')
+        articles = []
+        for selector in self.selectors:
+            try:
+                anchors = soup.select(selector)
+            except Exception:
+                continue
+            articles.extend(urljoin(page_url, anchor['href']) for anchor in anchors if anchor.get('href'))
+        sections = [
+            urljoin(page_url, anchor['href']) for anchor in soup.find_all('a', href=True)
+        ]
+        return articles, sections
+
+    def crawl(self, known_urls, target):
+        """從首頁開始逐層爬取，收集到 target 個文章連結或用完預算時停止；回傳新找到的文章"""
+        for url in known_urls:
+            self.seen.add(normalize_url(url))
+
+        found = []
+        level = [normalize_url(self.base_url)]
+        self.seen.add(level[0])
+        pages_fetched = 0
+
+        with ThreadPoolExecutor(max_workers=self.discovery.max_workers) as executor:
+            for depth in range(self.max_depth + 1):
+                level = level[:self.max_pages - pages_fetched]
+                if not level:
+                    break
+                pages = list(executor.map(self.discovery.fetch, level))
+                pages_fetched += len(level)
+
+                next_level = []
+                for page_url, html in zip(level, pages):
+                    if not html:
+                        continue
+                    articles, sections = self.parse_page(html, page_url)
+                    for url in articles:
+                        url = normalize_url(url)
+                        if self.discovery.is_same_site(url) and self.seen.add(url):
+                            found.append(url)
+                    for url in sections:
+                        url = normalize_url(url)
+                        if (url.startswith(('http://', 'https://')) and self.discovery.is_same_site(url)
+                                and self.is_section_page(url) and self.seen.add(url)):
+                            next_level.append(url)
+
+                print(f"🕸️ 爬取第 {depth} 層: {len(level)} 頁，累計 {len(found)} 個新文章連結")
+                if len(known_urls) + len(found) >= target:
+                    break
+                level = next_level
+
+        return found
+
+    def close(self):
+        self.discovery.close()
+
+
+def crawl_article_urls(base_url, selectors, domains, known_urls, target, max_depth=2, max_pages=20,
+                       rate_limiter=None):
+    """爬取分類頁補足文章連結；缺少套件或失敗時回傳空列表"""
+    if not link_discovery.is_available():
+        print("⚠️ 多層爬取需要 requests 與 beautifulsoup4，略過")
+        return []
+    frontier = CrawlFrontier(base_url, selectors, domains, max_depth, max_pages, rate_limiter)
+    try:
+        return frontier.crawl(known_urls, target)
+    except Exception as e:
+        print(f"多層爬取失敗: {e}")
+        return []
+    finally:
+        frontier.close()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化工作佇列 - 多機器執行
+以 SQLite 資料庫存放網站與文章工作，多台共用檔案系統的機器可同時執行任意數量的工作者：
+    • 工作者以租約 (lease) 領取工作，處理期間定期送出心跳延長租約
+    • 租約過期（工作者崩潰、機器斷線）的工作會被重新排入佇列，超過重試次數則標記失敗
+    • 每張截圖先在資料庫預留額度、存檔後確認，確保每個網站的截圖數量剛好達到目標
+
+資料庫不使用 WAL 模式（WAL 不支援網路檔案系統），寫入以 BEGIN IMMEDIATE 交易序列化
+
+使用方式：
+    python src/job_queue.py add --url https://example.com --screenshots 20   # 加入網站
+    python src/job_queue.py work                                             # 啟動工作者（可在多台機器同時執行）
+    python src/job_queue.py status                                           # 查看佇列狀態
+"""
+
+import os
+import sys
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+QUEUE_DB = 'data/job_queue.db'
+LEASE_SECONDS = 120
+MAX_TASK_ATTEMPTS = 3
+POLL_INTERVAL = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    target INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,                 -- harvest: 收集文章連結, article: 處理文章
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (site_id, kind, url)
+);
+CREATE TABLE IF NOT EXISTS screenshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id INTEGER NOT NULL,
+    task_id INTEGER NOT NULL,
+    status TEXT NOT NULL,               -- reserved: 已預留額度, saved: 已存檔
+    path TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, kind);
+CREATE INDEX IF NOT EXISTS idx_screenshots_site ON screenshots (site_id, status);
+"""
+
+
+def get_worker_name():
+    """以主機名稱與行程編號識別工作者"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """SQLite 工作佇列，每個操作使用獨立連線以便跨執行緒使用"""
+
+    def __init__(self, db_path=QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_TASK_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        # 關閉連線時未提交的交易會自動回滾
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def transaction(self, conn):
+        """以 BEGIN IMMEDIATE 取得寫入鎖，避免多個工作者同時領取同一個工作"""
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    # ---------- 加入工作 ----------
+
+    def add_site(self, url, target):
+        """加入網站，並建立收集文章連結的工作"""
+        now = time.time()
+        with self.connect() as conn:
+            self.transaction(conn)
+            site_id = conn.execute(
+                "INSERT INTO sites (url, target, created_at) VALUES (?, ?, ?)", (url, target, now)
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO tasks (site_id, kind, url, updated_at) VALUES (?, 'harvest', ?, ?)",
+                (site_id, url, now)
+            )
+            conn.execute("COMMIT")
+        return site_id
+
+    def add_articles(self, site_id, urls):
+        """加入文章工作，重複的網址會被忽略"""
+        now = time.time()
+        with self.connect() as conn:
+            self.transaction(conn)
+            for url in urls:
+                conn.execute(
+                    "INSERT OR IGNORE INTO tasks (site_id, kind, url, updated_at) VALUES (?, 'article', ?, ?)",
+                    (site_id, url, now)
+                )
+            conn.execute("COMMIT")
+
+    # ---------- 租約 ----------
+
+    def requeue_expired(self, conn, now):
+        """將租約過期的工作重新排入佇列，並釋放其預留但未存檔的截圖額度"""
+        expired = conn.execute(
+            "SELECT id, attempts FROM tasks WHERE status = 'leased' AND lease_expires < ?", (now,)
+        ).fetchall()
+        for task in expired:
+            status = 'pending' if task['attempts'] < self.max_attempts else 'failed'
+            conn.execute(
+                "UPDATE tasks SET status = ?, owner = NULL, last_error = '租約過期', updated_at = ? WHERE id = ?",
+                (status, now, task['id'])
+            )
+            conn.execute("DELETE FROM screenshots WHERE task_id = ? AND status = 'reserved'", (task['id'],))
+            print(f"⚠️ 工作 {task['id']} 租約過期，{'重新排入佇列' if status == 'pending' else '超過重試次數'}")
+
+    def claim(self, owner):
+        """領取一個工作，收集連結的工作優先；已達截圖目標的網站不再派發文章"""
+        now = time.time()
+        with self.connect() as conn:
+            self.transaction(conn)
+            self.requeue_expired(conn, now)
+            task = conn.execute("""
+                SELECT tasks.* FROM tasks JOIN sites ON sites.id = tasks.site_id
+                WHERE tasks.status = 'pending'
+                  AND (SELECT COUNT(*) FROM screenshots WHERE screenshots.site_id = sites.id) < sites.target
+                ORDER BY tasks.kind = 'harvest' DESC, tasks.id
+                LIMIT 1
+            """).fetchone()
+            if task:
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (owner, now + self.lease_seconds, now, task['id'])
+                )
+            conn.execute("COMMIT")
+        return dict(task) if task else None
+
+    def heartbeat(self, task_id, owner):
+        """延長租約，租約已被收回時回傳 False"""
+        now = time.time()
+        with self.connect() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, task_id, owner)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, task_id, owner):
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'done', updated_at = ? WHERE id = ? AND owner = ?",
+                (time.time(), task_id, owner)
+            )
+
+    def fail(self, task_id, owner, error):
+        """工作失敗，未超過重試次數時重新排入佇列"""
+        with self.connect() as conn:
+            self.transaction(conn)
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "owner = NULL, last_error = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                (self.max_attempts, str(error)[:500], time.time(), task_id, owner)
+            )
+            conn.execute("DELETE FROM screenshots WHERE task_id = ? AND status = 'reserved'", (task_id,))
+            conn.execute("COMMIT")
+
+    # ---------- 截圖額度 ----------
+
+    def reserve_screenshot(self, site_id, task_id, owner):
+        """預留一張截圖額度，租約已失效或網站已達目標時回傳 None"""
+        with self.connect() as conn:
+            self.transaction(conn)
+            leased = conn.execute(
+                "SELECT 1 FROM tasks WHERE id = ? AND owner = ? AND status = 'leased'", (task_id, owner)
+            ).fetchone()
+            used = conn.execute("SELECT COUNT(*) FROM screenshots WHERE site_id = ?", (site_id,)).fetchone()[0]
+            target = conn.execute("SELECT target FROM sites WHERE id = ?", (site_id,)).fetchone()[0]
+            reservation_id = None
+            if leased and used < target:
+                reservation_id = conn.execute(
+                    "INSERT INTO screenshots (site_id, task_id, status, created_at) VALUES (?, ?, 'reserved', ?)",
+                    (site_id, task_id, time.time())
+                ).lastrowid
+            conn.execute("COMMIT")
+        return reservation_id
+
+    def confirm_screenshot(self, reservation_id, path):
+        with self.connect() as conn:
+            conn.execute("UPDATE screenshots SET status = 'saved', path = ? WHERE id = ?", (path, reservation_id))
+
+    def release_screenshot(self, reservation_id):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM screenshots WHERE id = ? AND status = 'reserved'", (reservation_id,))
+
+    def is_site_complete(self, site_id):
+        with self.connect() as conn:
+            row = conn.execute("""
+                SELECT sites.target, COUNT(screenshots.id) AS used FROM sites
+                LEFT JOIN screenshots ON screenshots.site_id = sites.id
+                WHERE sites.id = ? GROUP BY sites.id
+            """, (site_id,)).fetchone()
+        return row is None or row['used'] >= row['target']
+
+    # ---------- 狀態 ----------
+
+    def has_open_tasks(self):
+        """是否還有可派發或處理中的工作"""
+        with self.connect() as conn:
+            count = conn.execute("""
+                SELECT COUNT(*) FROM tasks JOIN sites ON sites.id = tasks.site_id
+                WHERE tasks.status IN ('pending', 'leased')
+                  AND (SELECT COUNT(*) FROM screenshots WHERE screenshots.site_id = sites.id) < sites.target
+            """).fetchone()[0]
+        return count > 0
+
+    def get_status(self):
+        with self.connect() as conn:
+            sites = conn.execute("""
+                SELECT sites.id, sites.url, sites.target,
+                    (SELECT COUNT(*) FROM screenshots WHERE site_id = sites.id AND status = 'saved') AS saved,
+                    (SELECT COUNT(*) FROM screenshots WHERE site_id = sites.id AND status = 'reserved') AS reserved,
+                    (SELECT COUNT(*) FROM tasks WHERE site_id = sites.id AND status = 'pending') AS pending,
+                    (SELECT COUNT(*) FROM tasks WHERE site_id = sites.id AND status = 'leased') AS leased,
+                    (SELECT COUNT(*) FROM tasks WHERE site_id = sites.id AND status = 'done') AS done,
+                    (SELECT COUNT(*) FROM tasks WHERE site_id = sites.id AND status = 'failed') AS failed
+                FROM sites ORDER BY sites.id
+            """).fetchall()
+        return [dict(site) for site in sites]
+
+
+class QueueScreenshotQuota:
+    """以工作佇列計算的截圖額度，介面與 worker_pool.SharedScreenshotQuota 相同"""
+
+    def __init__(self, job_queue, task, owner):
+        self.job_queue = job_queue
+        self.site_id = task['site_id']
+        self.task_id = task['id']
+        self.owner = owner
+
+    def is_reached(self):
+        return self.job_queue.is_site_complete(self.site_id)
+
+    def reserve(self):
+        """回傳預留的額度編號；截圖寫入前可能同時有多筆預留"""
+        return self.job_queue.reserve_screenshot(self.site_id, self.task_id, self.owner)
+
+    def release(self, reservation):
+        self.job_queue.release_screenshot(reservation)
+
+    def confirm(self, reservation, screenshot_path):
+        self.job_queue.confirm_screenshot(reservation, screenshot_path)
+
+
+class LeaseHeartbeat:
+    """處理工作期間在背景執行緒定期延長租約"""
+
+    def __init__(self, job_queue, task_id, owner):
+        self.job_queue = job_queue
+        self.task_id = task_id
+        self.owner = owner
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.job_queue.lease_seconds / 3):
+            try:
+                if not self.job_queue.heartbeat(self.task_id, self.owner):
+                    print(f"⚠️ 工作 {self.task_id} 的租約已被收回")
+                    return
+            except sqlite3.Error as e:
+                print(f"送出心跳失敗: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def run_queue_worker(job_queue, exit_when_idle=True):
+    """從佇列領取工作並處理，佇列清空時結束"""
+    from website_template_complete import WebsiteAdReplacer, NEWS_COUNT
+
+    owner = get_worker_name()
+    print(f"👷 佇列工作者 {owner} 啟動，資料庫: {job_queue.db_path}")
+    bot = None
+    processed = 0
+    try:
+        while True:
+            task = job_queue.claim(owner)
+            if not task:
+                if exit_when_idle and not job_queue.has_open_tasks():
+                    print("佇列已無工作，工作者結束")
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            if bot is None:
+                bot = WebsiteAdReplacer(screen_id=1, worker_id=os.getpid())
+                bot.use_browser_screenshot = True
+
+            print(f"[{owner}] 領取工作 {task['id']} ({task['kind']}): {task['url']}")
+            with LeaseHeartbeat(job_queue, task['id'], owner):
+                try:
+                    if task['kind'] == 'harvest':
+                        news_urls = bot.get_random_news_urls(task['url'], NEWS_COUNT)
+                        if not news_urls:
+                            raise RuntimeError("沒有找到任何文章連結")
+                        job_queue.add_articles(task['site_id'], news_urls)
+                        print(f"加入 {len(news_urls)} 個文章工作")
+                    else:
+                        bot.screenshot_quota = QueueScreenshotQuota(job_queue, task, owner)
+                        # 頁面載入或瀏覽器失敗時拋出例外，由下方 fail 排入重試
+                        bot.process_website(task['url'])
+                    job_queue.complete(task['id'], owner)
+                    processed += 1
+                except Exception as e:
+                    print(f"❌ 工作 {task['id']} 失敗: {e}")
+                    job_queue.fail(task['id'], owner, e)
+            bot.maybe_recycle_browser()
+    except KeyboardInterrupt:
+        print("\n⚠️ 使用者中斷，未完成的工作將在租約過期後重新派發")
+    finally:
+        if bot:
+            bot.print_run_stats()
+            bot.close()
+    print(f"✅ 工作者 {owner} 共完成 {processed} 個工作")
+
+
+def show_status(job_queue):
+    sites = job_queue.get_status()
+    if not sites:
+        print("佇列中沒有網站")
+        return
+    for site in sites:
+        print(f"[{site['id']}] {site['url']}")
+        print(f"   截圖 {site['saved']}/{site['target']} (預留 {site['reserved']})，"
+              f"工作: 等待 {site['pending']}、處理中 {site['leased']}、完成 {site['done']}、失敗 {site['failed']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='持久化工作佇列')
+    parser.add_argument('action', choices=['add', 'work', 'status'], help='操作')
+    parser.add_argument('--db', default=QUEUE_DB, help=f'佇列資料庫路徑，多台機器需指向共用檔案系統 (預設: {QUEUE_DB})')
+    parser.add_argument('--url', action='append', help='要加入的網站網址，可重複指定')
+    parser.add_argument('--screenshots', type=int, default=10, help='每個網站的目標截圖數量 (預設: 10)')
+    parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help=f'工作租約秒數 (預設: {LEASE_SECONDS})')
+    parser.add_argument('--keep-alive', action='store_true', help='佇列清空後繼續等待新工作')
+    args = parser.parse_args()
+
+    job_queue = JobQueue(args.db, lease_seconds=args.lease)
+
+    if args.action == 'add':
+        if not args.url:
+            print("❌ 請使用 --url 指定網站")
+            return 1
+        for url in args.url:
+            site_id = job_queue.add_site(url, args.screenshots)
+            print(f"✅ 加入網站 [{site_id}] {url}，目標 {args.screenshots} 張截圖")
+    elif args.action == 'work':
+        run_queue_worker(job_queue, exit_when_idle=not args.keep_alive)
+    else:
+        show_status(job_queue)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+不需瀏覽器的文章連結探索
+以一般 HTTP 請求（共用連線池）依序抓取以下來源，找到足夠的連結就停止，只有真正要截圖的文章才交給瀏覽器載入：
+    1. 首頁原始 HTML（以與瀏覽器相同的 LINK_SELECTORS 選取連結）
+    2. RSS / Atom 訂閱（首頁宣告的 feed；首頁沒有宣告時才嘗試常見路徑）
+    3. robots.txt 中列出的 sitemap（含 sitemap index），只在前兩者不足時補足數量，並優先使用最新的文章
+
+每個請求都經過網域速率限制 (DomainRateLimiter)，與瀏覽器的頁面載入共用同一個網域限制，
+不會同時對網站發出大量請求
+
+sitemap 與 feed 中的網址沒有 HTML 結構可套用選擇器，改以選擇器中的 href 片段
+（例如 a[href*='/news/'] 的 /news/）過濾；選擇器沒有 href 片段時接受所有同網域網址
+
+需要 requests 與 beautifulsoup4 (pip install requests beautifulsoup4)
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+from xml.etree import ElementTree
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from bs4 import BeautifulSoup
+except ImportError:
+    requests = None
+
+REQUEST_TIMEOUT = 10
+MAX_FETCH_WORKERS = 8
+MAX_CHILD_SITEMAPS = 5
+MAX_SITEMAP_URLS = 5000
+COMMON_FEED_PATHS = ['/feed', '/rss', '/rss.xml', '/feed.xml', '/atom.xml', '/index.xml']
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+
+def is_available():
+    return requests is not None
+
+
+def get_href_patterns(selectors):
+    """從 CSS 選擇器中取出 href 片段，例如 a[href*='/news/'] → /news/"""
+    patterns = []
+    for selector in selectors:
+        patterns.extend(re.findall(r"href\*=['\"]([^'\"]+)['\"]", selector))
+    return patterns
+
+
+def strip_namespace(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class LinkDiscovery:
+    """以 HTTP 請求探索網站的文章連結"""
+
+    def __init__(self, base_url, selectors, domains, rate_limiter=None):
+        self.base_url = base_url
+        self.selectors = selectors
+        self.domains = domains
+        self.rate_limiter = rate_limiter
+        # 同時抓取的數量不超過網域的並行上限，多開的執行緒只會等待載入名額
+        self.max_workers = min(MAX_FETCH_WORKERS, rate_limiter.concurrency) if rate_limiter else MAX_FETCH_WORKERS
+        self.href_patterns = get_href_patterns(selectors)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+    def fetch(self, url):
+        """取得網址內容（經過網域速率限制），失敗時回傳 None"""
+        if self.rate_limiter:
+            with self.rate_limiter.limit(url):
+                return self.get(url)
+        return self.get(url)
+
+    def get(self, url):
+        try:
+            response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return response.text
+        except requests.RequestException:
+            pass
+        return None
+
+    def is_same_site(self, url):
+        host = urlparse(url).netloc
+        return any(domain in host for domain in self.domains)
+
+    def matches_patterns(self, url):
+        return not self.href_patterns or any(pattern in url for pattern in self.href_patterns)
+
+    def parse_homepage(self, html):
+        """以 LINK_SELECTORS 選取首頁連結，並找出首頁宣告的 feed"""
+        soup = BeautifulSoup(html, 'html.parser')
+        links = []
+        for selector in self.selectors:
+            try:
+                anchors = soup.select(selector)
+            except Exception:
+                continue
+            for anchor in anchors:
+                href = anchor.get('href')
+                if href:
+                    links.append(urljoin(self.base_url, href))
+        feeds = [
+            urljoin(self.base_url, link['href'])
+            for link in soup.find_all('link', href=True, type=re.compile(r'(rss|atom)\+xml'))
+        ]
+        return links, feeds
+
+    def parse_feed(self, xml_text):
+        """解析 RSS (<item><link>) 與 Atom (<entry><link href>)"""
+        try:
+            root = ElementTree.fromstring(xml_text.encode('utf-8'))
+        except ElementTree.ParseError:
+            return []
+        links = []
+        for element in root.iter():
+            tag = strip_namespace(element.tag)
+            if tag == 'item':
+                for child in element:
+                    if strip_namespace(child.tag) == 'link' and child.text:
+                        links.append(child.text.strip())
+            elif tag == 'entry':
+                for child in element:
+                    if strip_namespace(child.tag) == 'link' and child.get('href'):
+                        links.append(child.get('href'))
+        return links
+
+    def parse_sitemap(self, xml_text):
+        """解析 sitemap，回傳 (文章網址, 子 sitemap)；兩者都依 lastmod 由新到舊排序"""
+        try:
+            root = ElementTree.fromstring(xml_text.encode('utf-8'))
+        except ElementTree.ParseError:
+            return [], []
+        urls, children = [], []
+        for entry in root:
+            fields = {strip_namespace(child.tag): (child.text or '').strip() for child in entry}
+            if not fields.get('loc'):
+                continue
+            if strip_namespace(entry.tag) == 'sitemap':
+                children.append((fields.get('lastmod', ''), fields['loc']))
+            else:
+                urls.append((fields.get('lastmod', ''), fields['loc']))
+        # 沒有 lastmod 的項目排在最後，同時間的項目維持原本順序
+        urls.sort(key=lambda item: item[0], reverse=True)
+        children.sort(key=lambda item: item[0], reverse=True)
+        return [loc for _, loc in urls], [loc for _, loc in children]
+
+    def get_sitemap_urls(self, robots_text):
+        sitemaps = re.findall(r'(?im)^\s*sitemap:\s*(\S+)', robots_text or '')
+        return sitemaps or [urljoin(self.base_url, '/sitemap.xml')]
+
+    def add_links(self, urls, seen_urls, candidates, limit=None):
+        """加入同網域、未出現過的網址，limit 指定時加到 urls 達到該數量為止"""
+        for url in candidates:
+            if limit is not None and len(urls) >= limit:
+                break
+            url = url.split('#')[0]
+            if url in seen_urls or not url.startswith(('http://', 'https://')) or not self.is_same_site(url):
+                continue
+            seen_urls.add(url)
+            urls.append(url)
+
+    def discover(self, count):
+        """依序抓取首頁、feed、sitemap，找到 count 個連結後不再抓取之後的來源；sitemap 只補足不足的數量"""
+        root_url = f"{urlparse(self.base_url).scheme}://{urlparse(self.base_url).netloc}"
+        urls = []
+        seen_urls = {self.base_url.split('#')[0]}
+        homepage_count = feed_count = sitemap_count = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            declared_feeds = []
+            homepage_html = self.fetch(self.base_url)
+            if homepage_html:
+                homepage_links, declared_feeds = self.parse_homepage(homepage_html)
+                self.add_links(urls, seen_urls, homepage_links)
+                homepage_count = len(urls)
+
+            if len(urls) < count:
+                # 首頁沒有宣告 feed 時才嘗試常見路徑，避免多餘的請求
+                feeds = declared_feeds or [urljoin(root_url, path) for path in COMMON_FEED_PATHS]
+                feed_links = [
+                    link for text in executor.map(self.fetch, feeds) if text for link in self.parse_feed(text)
+                ]
+                self.add_links(urls, seen_urls, [url for url in feed_links if self.matches_patterns(url)])
+                feed_count = len(urls) - homepage_count
+
+            if len(urls) < count:
+                # sitemap 多為舊文章，只用來補足數量，且優先使用 lastmod 最新的項目
+                sitemap_urls = self.get_sitemap_urls(self.fetch(urljoin(root_url, '/robots.txt')))
+                child_sitemaps = []
+                for text in executor.map(self.fetch, sitemap_urls):
+                    if text:
+                        links, children = self.parse_sitemap(text)
+                        self.add_links(urls, seen_urls, [url for url in links[:MAX_SITEMAP_URLS]
+                                                         if self.matches_patterns(url)], count)
+                        child_sitemaps.extend(children)
+                for child in child_sitemaps[:MAX_CHILD_SITEMAPS]:
+                    if len(urls) >= count:
+                        break
+                    text = self.fetch(child)
+                    if text:
+                        links = self.parse_sitemap(text)[0][:MAX_SITEMAP_URLS]
+                        self.add_links(urls, seen_urls, [url for url in links if self.matches_patterns(url)], count)
+                sitemap_count = len(urls) - homepage_count - feed_count
+
+        print(f"🌐 HTTP 探索: 首頁 {homepage_count} 個、feed {feed_count} 個、sitemap {sitemap_count} 個連結")
+        return urls
+
+    def close(self):
+        self.session.close()
+
+
+def discover_article_urls(base_url, selectors, domains, count, rate_limiter=None):
+    """不使用瀏覽器探索至少 count 個文章連結（首頁連結較多時全部回傳）；缺少套件或失敗時回傳空列表"""
+    if not is_available():
+        print("⚠️ HTTP 連結探索需要 requests 與 beautifulsoup4，改用瀏覽器")
+        return []
+    discovery = LinkDiscovery(base_url, selectors, domains, rate_limiter)
+    try:
+        return discovery.discover(count)
+    except Exception as e:
+        print(f"HTTP 連結探索失敗: {e}")
+        return []
+    finally:
+        discovery.close()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chrome 持久化設定檔管理器
+保留 Chrome 的使用者資料夾與磁碟快取，讓同一網站的後續執行不必重新下載所有資源
+
+資料夾結構：
+    <profile_dir>/template/             暖快取範本（所有執行共用）
+    <profile_dir>/instances/<名稱>/     每個瀏覽器實例各自的副本
+"""
+
+import os
+import shutil
+import time
+
+# 不可複製的 Chrome 鎖定檔（複製後會讓新實例誤以為設定檔正被使用）
+LOCK_FILES = ('SingletonLock', 'SingletonCookie', 'SingletonSocket', 'lockfile', 'LOCK')
+
+# 超過大小上限時清除的快取資料夾
+CACHE_FOLDERS = (
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    'ShaderCache',
+    'GrShaderCache',
+)
+
+
+def get_folder_size(path):
+    """計算資料夾大小 (bytes)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                continue
+    return total
+
+
+class ProfileManager:
+    """管理範本設定檔與各瀏覽器實例的設定檔副本"""
+
+    def __init__(self, profile_dir, cache_size_mb=300, max_size_mb=1024, stale_hours=24):
+        self.profile_dir = os.path.abspath(profile_dir)
+        self.template_dir = os.path.join(self.profile_dir, 'template')
+        self.instances_dir = os.path.join(self.profile_dir, 'instances')
+        self.lock_dir = os.path.join(self.profile_dir, 'template.lock')
+        self.cache_size_mb = cache_size_mb
+        self.max_size_mb = max_size_mb
+        self.stale_hours = stale_hours
+        os.makedirs(self.instances_dir, exist_ok=True)
+
+    def acquire_lock(self, timeout=60):
+        """以建立資料夾的原子操作取得範本鎖定（跨行程、跨平台）"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                os.mkdir(self.lock_dir)
+                return True
+            except FileExistsError:
+                # 鎖定超過逾時時間視為殘留，直接移除
+                try:
+                    if time.time() - os.path.getmtime(self.lock_dir) > timeout:
+                        os.rmdir(self.lock_dir)
+                        continue
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    return False
+                time.sleep(0.2)
+
+    def release_lock(self):
+        try:
+            os.rmdir(self.lock_dir)
+        except OSError:
+            pass
+
+    def cleanup_stale_instances(self):
+        """清除超過保留時間的實例資料夾（例如程式崩潰後殘留的副本）"""
+        now = time.time()
+        for name in os.listdir(self.instances_dir):
+            path = os.path.join(self.instances_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.stale_hours * 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+                    print(f"清除過期的設定檔副本: {name}")
+            except OSError:
+                continue
+
+    def trim_cache(self, path):
+        """設定檔超過大小上限時清除快取資料夾"""
+        size_mb = get_folder_size(path) / (1024 * 1024)
+        if size_mb <= self.max_size_mb:
+            return
+        print(f"⚠️ 設定檔大小 {size_mb:.0f}MB 超過上限 {self.max_size_mb}MB，清除快取")
+        for folder in CACHE_FOLDERS:
+            shutil.rmtree(os.path.join(path, folder), ignore_errors=True)
+
+    def create_instance(self, name):
+        """從暖快取範本複製出一份實例專用的設定檔，回傳其路徑"""
+        self.cleanup_stale_instances()
+        instance_dir = os.path.join(self.instances_dir, name)
+        shutil.rmtree(instance_dir, ignore_errors=True)
+
+        if os.path.exists(self.template_dir) and self.acquire_lock():
+            try:
+                shutil.copytree(self.template_dir, instance_dir,
+                                ignore=shutil.ignore_patterns(*LOCK_FILES))
+                print(f"✅ 使用暖快取設定檔: {instance_dir}")
+            except Exception as e:
+                print(f"複製設定檔範本失敗: {e}，使用空白設定檔")
+                shutil.rmtree(instance_dir, ignore_errors=True)
+                os.makedirs(instance_dir, exist_ok=True)
+            finally:
+                self.release_lock()
+        else:
+            os.makedirs(instance_dir, exist_ok=True)
+            print(f"建立新的設定檔: {instance_dir}")
+
+        return instance_dir
+
+    def get_chrome_arguments(self, instance_dir):
+        """回傳使用此設定檔所需的 Chrome 參數"""
+        return [
+            f'--user-data-dir={instance_dir}',
+            f'--disk-cache-size={self.cache_size_mb * 1024 * 1024}',
+        ]
+
+    def release_instance(self, instance_dir, save_as_template=True):
+        """瀏覽器關閉後，將實例設定檔寫回範本並移除副本"""
+        if save_as_template and os.path.exists(instance_dir):
+            self.trim_cache(instance_dir)
+            staging_dir = f"{self.template_dir}.new_{os.getpid()}"
+            old_dir = f"{self.template_dir}.old_{os.getpid()}"
+            try:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                shutil.copytree(instance_dir, staging_dir,
+                                ignore=shutil.ignore_patterns(*LOCK_FILES))
+                if self.acquire_lock():
+                    try:
+                        if os.path.exists(self.template_dir):
+                            os.rename(self.template_dir, old_dir)
+                        os.rename(staging_dir, self.template_dir)
+                    finally:
+                        self.release_lock()
+                    print("✅ 已更新暖快取設定檔範本")
+            except Exception as e:
+                print(f"更新設定檔範本失敗: {e}")
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                shutil.rmtree(old_dir, ignore_errors=True)
+
+        shutil.rmtree(instance_dir, ignore_errors=True)
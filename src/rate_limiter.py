@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+網域請求速率限制
+平行處理時避免同時對同一個網站發出大量頁面載入（可能被網站限流，或改變投放的廣告）
+
+每個網域一個權杖桶 (token bucket)，狀態存放在共用的資料夾中，
+以建立資料夾的原子操作作為鎖定，因此同一台機器上的多個執行緒與行程共用同一個限制：
+    • rate: 每秒補充的權杖數量（每次頁面載入消耗一個權杖）
+    • burst: 權杖桶容量，允許短時間內連續載入的頁面數量
+    • concurrency: 同一網域同時進行中的頁面載入數量上限
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+RATE_LIMIT_DIR = 'data/rate_limit'
+LOCK_TIMEOUT = 10
+SLOT_TTL = 120          # 持有者崩潰時，載入名額在此秒數後自動釋放
+MAX_SLEEP = 0.5
+
+
+class DomainRateLimiter:
+    """跨執行緒、跨行程共用的網域權杖桶"""
+
+    def __init__(self, rate=0.5, burst=2, concurrency=2, state_dir=RATE_LIMIT_DIR):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.concurrency = max(1, concurrency)
+        self.state_dir = state_dir
+        self.throttled_seconds = 0.0
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def get_paths(self, domain):
+        safe_domain = re.sub(r'[^\w.-]', '_', domain)
+        base = os.path.join(self.state_dir, safe_domain)
+        return f"{base}.json", f"{base}.lock"
+
+    def acquire_lock(self, lock_path):
+        deadline = time.time() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.mkdir(lock_path)
+                return
+            except FileExistsError:
+                # 持有者崩潰留下的鎖定
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                        os.rmdir(lock_path)
+                        continue
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    raise TimeoutError(f"無法取得速率限制鎖定: {lock_path}")
+                time.sleep(0.01)
+
+    def update_state(self, domain, update):
+        """在鎖定下讀取、修改並寫回網域狀態，回傳 update 的結果"""
+        state_path, lock_path = self.get_paths(domain)
+        self.acquire_lock(lock_path)
+        try:
+            now = time.time()
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {'tokens': self.burst, 'updated': now, 'active': {}}
+
+            # 補充權杖並清除過期的載入名額
+            state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * self.rate)
+            state['updated'] = now
+            state['active'] = {slot: expires for slot, expires in state['active'].items() if expires > now}
+
+            result = update(state, now)
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            return result
+        finally:
+            try:
+                os.rmdir(lock_path)
+            except OSError:
+                pass
+
+    def try_acquire(self, domain, hold):
+        """嘗試取得權杖（與載入名額），成功時回傳 (名額, 0)，否則回傳 (None, 建議等待秒數)"""
+        def update(state, now):
+            if len(state['active']) >= self.concurrency:
+                return None, MAX_SLEEP
+            if state['tokens'] < 1:
+                return None, (1 - state['tokens']) / self.rate
+            state['tokens'] -= 1
+            if not hold:
+                return '', 0
+            slot = uuid.uuid4().hex
+            state['active'][slot] = now + SLOT_TTL
+            return slot, 0
+        return self.update_state(domain, update)
+
+    def acquire(self, domain, hold=True):
+        """等待直到可以對網域發出請求，回傳載入名額（hold=False 時只消耗權杖）"""
+        start_time = time.time()
+        while True:
+            slot, wait = self.try_acquire(domain, hold)
+            if slot is not None:
+                break
+            time.sleep(min(wait, MAX_SLEEP))
+        waited = time.time() - start_time
+        if waited > 0.05:
+            self.throttled_seconds += waited
+        return slot
+
+    def release(self, domain, slot):
+        if not slot:
+            return
+
+        def update(state, now):
+            state['active'].pop(slot, None)
+        self.update_state(domain, update)
+
+    @contextmanager
+    def limit(self, url):
+        """頁面載入期間持有網域的載入名額"""
+        domain = urlparse(url).netloc
+        if not domain:
+            yield
+            return
+        slot = self.acquire(domain)
+        try:
+            yield
+        finally:
+            self.release(domain, slot)
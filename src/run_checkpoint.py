@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+執行進度檢查點
+每處理完一篇文章就記錄本次執行的狀態，執行中斷（Chrome 崩潰、Ctrl+C、記憶體不足）後
+可使用 --resume 從中斷處繼續，不會重新抽選文章或重複處理已完成的頁面
+
+記錄內容：
+    • 抽選的文章網址與已處理的網址
+    • 已產生的截圖與各尺寸的截圖數量
+    • 各替換圖片的使用次數
+"""
+
+import os
+import json
+import time
+
+
+class RunCheckpoint:
+    """以 JSON 檔案保存執行進度，寫入時先寫暫存檔再取代，避免中斷時留下損壞的檔案"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+
+    def load(self, base_url):
+        """讀取同一目標網站的檢查點，不存在或網站不同時回傳 None"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 讀取檢查點失敗: {e}")
+            return None
+        if state.get('base_url') != base_url:
+            print(f"⚠️ 檢查點屬於其他網站 ({state.get('base_url')})，重新開始")
+            return None
+        self.state = state
+        return state
+
+    def start(self, base_url, news_urls):
+        """開始新的執行"""
+        self.state = {
+            'base_url': base_url,
+            'news_urls': news_urls,
+            'processed_urls': [],
+            'screenshot_paths': [],
+            'screenshots_by_size': {},
+            'image_usage': {},
+            'started_at': time.time(),
+        }
+        self.save()
+
+    def record_article(self, url, screenshot_paths, screenshots_by_size, image_usage):
+        """記錄一篇已處理完成的文章"""
+        self.state['processed_urls'].append(url)
+        self.state['screenshot_paths'].extend(screenshot_paths)
+        self.state['screenshots_by_size'] = dict(screenshots_by_size)
+        self.state['image_usage'] = dict(image_usage)
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.state['updated_at'] = time.time()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """執行完成後移除檢查點"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.state = None
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重複截圖偵測
+同一網站的許多文章版面相同，替換同一個版位後常產生幾乎一樣的截圖。
+擷取後以差異雜湊 (dHash) 比對已產生的截圖，漢明距離在 SCREENSHOT_DEDUP_DISTANCE 以內視為重複：
+    • drop: 捨棄重複的截圖，不計入 SCREENSHOT_COUNT
+    • flag: 仍保留截圖，在截圖清單中標記 duplicate_of
+
+只雜湊廣告版位所在的區域（完整畫面時廣告只佔一小塊，不同素材的雜湊幾乎相同），
+並且只與相同網域、廣告尺寸與替換圖片的截圖比對
+
+雜湊索引採用多重索引：64 位元雜湊切成 (距離 + 1) 段，依鴿籠原理，
+距離在門檻內的兩個雜湊至少有一段完全相同，只需比對同段相同的候選，數萬筆雜湊仍可快速查詢。
+雜湊紀錄保存在 SCREENSHOT_DEDUP_FILE，跨執行持續比對；超過 SCREENSHOT_DEDUP_TTL_DAYS 的紀錄在載入時清除。
+多個工作者行程共用同一個紀錄檔：每次比對前在鎖定下讀取其他工作者新附加的紀錄，
+比對與附加在同一個鎖定內完成，同一次執行中不同工作者產生的相似截圖也能偵測
+
+需要 Pillow (pip install pillow)
+"""
+
+import os
+import time
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_SIZE = 8
+LOCK_TIMEOUT = 10
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+
+def is_available():
+    return Image is not None
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """差異雜湊：縮成 (hash_size + 1) x hash_size 灰階圖，比較相鄰像素的明暗"""
+    gray = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def crop_region(image, region):
+    """裁切出廣告版位所在的區域 (x, y, 寬, 高，以截圖寬高的比例表示)；區域無效時回傳完整圖片"""
+    if not region:
+        return image
+    x, y, width, height = region
+    left, top = max(0, int(x * image.width)), max(0, int(y * image.height))
+    right = min(image.width, int((x + width) * image.width))
+    bottom = min(image.height, int((y + height) * image.height))
+    if right - left < HASH_SIZE or bottom - top < HASH_SIZE:
+        return image
+    return image.crop((left, top, right, bottom))
+
+
+def make_key(domain, width, height, creative):
+    """比對範圍：相同網域、廣告尺寸與替換圖片"""
+    size = f"{width}x{height}" if width and height else 'screen'
+    return f"{domain or ''}|{size}|{creative or ''}"
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class HashIndex:
+    """漢明距離查詢的多重索引"""
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        band_count = min(max_distance + 1, HASH_BITS)
+        # 各段的 (位移, 遮罩)，位元數盡量平均
+        self.bands = []
+        for i in range(band_count):
+            start = HASH_BITS * i // band_count
+            end = HASH_BITS * (i + 1) // band_count
+            self.bands.append((start, (1 << (end - start)) - 1))
+        self.buckets = [{} for _ in self.bands]
+        self.paths = {}  # 雜湊值 -> 第一張截圖的路徑
+
+    def __len__(self):
+        return len(self.paths)
+
+    def find(self, value):
+        """回傳距離在門檻內的已知雜湊，沒有時回傳 None"""
+        if value in self.paths:
+            return value
+        for bucket, (shift, mask) in zip(self.buckets, self.bands):
+            for candidate in bucket.get((value >> shift) & mask, ()):
+                if hamming_distance(candidate, value) <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, value, path):
+        if value in self.paths:
+            return
+        self.paths[value] = path
+        for bucket, (shift, mask) in zip(self.buckets, self.bands):
+            bucket.setdefault((value >> shift) & mask, []).append(value)
+
+
+class ScreenshotDeduplicator:
+    """比對截圖與已產生的截圖，並保存雜湊紀錄（每行：雜湊值、建立時間、比對範圍、截圖路徑）"""
+
+    def __init__(self, index_file, max_distance=6, ttl_days=14):
+        self.index_file = index_file
+        self.lock_dir = f"{index_file}.lock"
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_days * 86400
+        self.indexes = {}  # 比對範圍 -> HashIndex
+        self.duplicates = 0
+        self.offset = 0    # 紀錄檔已讀取的位置
+        self.inode = None  # 紀錄檔被重寫時 inode 會改變，需要從頭讀取
+        self.lock = threading.Lock()  # CDP 引擎的多個分頁在執行緒中同時比對
+        os.makedirs(os.path.dirname(os.path.abspath(index_file)), exist_ok=True)
+        self.load()
+
+    def get_index(self, key):
+        if key not in self.indexes:
+            self.indexes[key] = HashIndex(self.max_distance)
+        return self.indexes[key]
+
+    def acquire_lock(self, timeout=LOCK_TIMEOUT):
+        """以建立資料夾的原子操作取得紀錄檔鎖定（跨行程）"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                os.mkdir(self.lock_dir)
+                return True
+            except FileExistsError:
+                # 持有者崩潰留下的鎖定
+                try:
+                    if time.time() - os.path.getmtime(self.lock_dir) > timeout:
+                        os.rmdir(self.lock_dir)
+                        continue
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    return False
+                time.sleep(0.01)
+
+    def release_lock(self):
+        try:
+            os.rmdir(self.lock_dir)
+        except OSError:
+            pass
+
+    def parse_line(self, line, expires_before):
+        """加入一行紀錄，回傳是否為有效且未過期的紀錄"""
+        fields = line.rstrip('\n').split('\t', 3)
+        try:
+            value, created, key, path = int(fields[0], 16), float(fields[1]), fields[2], fields[3]
+        except (ValueError, IndexError):
+            return False  # 舊格式（沒有時間與比對範圍）或寫入中斷的紀錄
+        if created < expires_before:
+            return False
+        self.get_index(key).add(value, path)
+        return True
+
+    def load(self):
+        """在鎖定下載入未過期的雜湊紀錄；有過期或舊格式的紀錄時重寫紀錄檔"""
+        if not os.path.exists(self.index_file):
+            return
+        locked = self.acquire_lock()
+        try:
+            expires_before = time.time() - self.ttl_seconds
+            kept = []
+            evicted = 0
+            consumed = 0  # 已讀取的完整行位元組數
+            with open(self.index_file, 'r', encoding='utf-8', newline='') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # 其他工作者寫入中的最後一行，之後再讀取
+                    consumed += len(line.encode('utf-8'))
+                    if self.parse_line(line, expires_before):
+                        kept.append(line)
+                    else:
+                        evicted += 1
+            # 沒有取得鎖定時不重寫，避免覆蓋其他工作者同時附加的紀錄
+            if evicted and locked and self.rewrite(kept):
+                print(f"清除 {evicted} 筆過期的截圖雜湊")
+                consumed = sum(len(line.encode('utf-8')) for line in kept)
+            self.inode = os.stat(self.index_file).st_ino
+            self.offset = consumed
+        finally:
+            if locked:
+                self.release_lock()
+        print(f"🔍 載入 {sum(len(index) for index in self.indexes.values())} 筆截圖雜湊")
+
+    def rewrite(self, lines):
+        temp_path = f"{self.index_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(temp_path, self.index_file)
+            return True
+        except OSError as e:
+            print(f"⚠️ 重寫截圖雜湊紀錄失敗: {e}")
+            return False
+
+    def read_appended(self):
+        """讀取其他工作者在上次讀取後附加的紀錄；紀錄檔被重寫時從頭讀取（已知的雜湊不會重複加入）"""
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.offset = 0
+        if stat.st_size == self.offset:
+            return
+        with open(self.index_file, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1  # 只處理完整的行
+        self.offset += end
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            self.parse_line(line, 0)
+
+    def check(self, path, image, key='', region=None):
+        """回傳重複的原始截圖路徑；不重複時加入索引並回傳 None
+
+        key 為比對範圍 (make_key)，region 為廣告版位在截圖中的區域，只雜湊該區域
+        """
+        value = dhash(crop_region(image, region))
+        with self.lock:
+            locked = self.acquire_lock()
+            if not locked:
+                print("⚠️ 無法取得截圖雜湊紀錄鎖定，只與本行程的紀錄比對")
+            try:
+                if locked:
+                    self.read_appended()
+                index = self.get_index(key)
+                match = index.find(value)
+                if match is not None:
+                    self.duplicates += 1
+                    return index.paths[match]
+                index.add(value, path)
+
+                line = f"{value:016x}\t{time.time():.0f}\t{key}\t{path}\n".encode('utf-8')
+                # O_APPEND 單次寫入一整行，沒有取得鎖定時附加也不會與其他工作者交錯
+                fd = os.open(self.index_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+                if locked:
+                    # 持有鎖定時已讀到檔案結尾，自己附加的紀錄不需要再讀一次
+                    self.inode = os.stat(self.index_file).st_ino
+                    self.offset += len(line)
+                return None
+            finally:
+                if locked:
+                    self.release_lock()
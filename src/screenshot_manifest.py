@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截圖存放與清單
+截圖依日期與網站分資料夾存放，檔名包含執行編號、廣告尺寸與序號，平行處理時也不會互相覆蓋：
+    <SCREENSHOT_FOLDER>/<日期>/<網域>/ad_<執行編號>_<寬>x<高>_<序號>.<副檔名>
+
+每張截圖寫入完成後，在 <SCREENSHOT_FOLDER>/manifest.jsonl 附加一筆記錄
+（路徑、文章網址、廣告尺寸、替換圖片、擷取與編碼時間、檔案大小；啟用重複截圖偵測時另有廣告在截圖中的區域），
+結果列表與統計直接讀取清單，不需要掃描截圖資料夾
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import threading
+import itertools
+from datetime import datetime
+from urllib.parse import urlparse
+
+MANIFEST_FILENAME = 'manifest.jsonl'
+RUN_ID_ENV = 'AD_REPLACER_RUN_ID'  # 批次排程器指定的執行編號，工作者行程繼承同一個編號
+
+
+def make_run_id():
+    """執行編號：時間加上隨機碼，多個行程同時執行也不會重複；環境變數有指定時沿用"""
+    return os.environ.get(RUN_ID_ENV) or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def is_same_run(record_run_id, run_id):
+    """記錄是否屬於指定的執行（包含該執行的各工作者 <執行編號>_w<編號>）"""
+    return record_run_id == run_id or (record_run_id or '').startswith(f"{run_id}_w")
+
+
+def get_manifest_path(folder):
+    return os.path.join(folder, MANIFEST_FILENAME)
+
+
+def read_manifest(folder, since=None, run_id=None):
+    """讀取截圖清單，since 指定時只回傳該時間之後的記錄，run_id 指定時只回傳該次執行的記錄"""
+    manifest_path = get_manifest_path(folder)
+    if not os.path.exists(manifest_path):
+        return []
+    records = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 寫入中斷留下的不完整記錄
+            if since is not None and record.get('timestamp', 0) < since:
+                continue
+            if run_id is not None and not is_same_run(record.get('run_id'), run_id):
+                continue
+            records.append(record)
+    return records
+
+
+class ScreenshotManifest:
+    """產生截圖路徑，並在截圖寫入完成後附加清單記錄"""
+
+    def __init__(self, folder, run_id=None, worker_id=None):
+        self.folder = folder
+        self.run_id = run_id or make_run_id()
+        if worker_id is not None:
+            self.run_id = f"{self.run_id}_w{worker_id}"
+        self.sequence = itertools.count(1)
+        self.lock = threading.Lock()
+        self.pending = {}  # 截圖路徑 -> 等待寫入完成的記錄
+
+    def build_path(self, url, width, height, extension):
+        """建立截圖路徑（包含日期與網站子資料夾）"""
+        domain = re.sub(r'[^\w.-]', '_', urlparse(url or '').netloc) or 'unknown'
+        shard_dir = os.path.join(self.folder, datetime.now().strftime('%Y-%m-%d'), domain)
+        os.makedirs(shard_dir, exist_ok=True)
+        size = f"{width}x{height}" if width and height else 'screen'
+        with self.lock:
+            sequence = next(self.sequence)
+        return os.path.join(shard_dir, f"ad_{self.run_id}_{size}_{sequence:04d}.{extension}")
+
+    def register(self, path, url, width, height, creative):
+        """擷取前記錄截圖資訊，等寫入完成後再加入清單"""
+        record = {
+            'path': path,
+            'run_id': self.run_id,
+            'url': url,
+            'domain': urlparse(url or '').netloc,
+            'width': width,
+            'height': height,
+            'creative': creative,
+            'captured_at': datetime.now().isoformat(timespec='seconds'),
+            'timestamp': time.time(),
+        }
+        with self.lock:
+            self.pending[path] = record
+
+    def get(self, path):
+        """回傳等待寫入的記錄副本，沒有時回傳 None"""
+        with self.lock:
+            record = self.pending.get(path)
+            return dict(record) if record else None
+
+    def annotate(self, path, **fields):
+        """為等待寫入的記錄加上欄位（例如重複截圖標記）"""
+        with self.lock:
+            if path in self.pending:
+                self.pending[path].update(fields)
+
+    def discard(self, path):
+        """擷取失敗，不加入清單"""
+        with self.lock:
+            self.pending.pop(path, None)
+
+    def complete(self, path, size, encode_seconds):
+        """截圖寫入完成（ScreenshotWriter 的回呼），附加清單記錄"""
+        with self.lock:
+            record = self.pending.pop(path, None)
+        if record is None:
+            return
+        record.update({
+            'bytes': size,
+            'encode_seconds': round(encode_seconds, 3),
+            'total_seconds': round(time.time() - record['timestamp'], 3),  # 擷取開始到寫入完成
+        })
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        # O_APPEND 單次寫入一整行，多個工作者行程同時附加也不會交錯
+        fd = os.open(get_manifest_path(self.folder), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背景截圖寫入
+截圖擷取完成後，圖片編碼與寫入磁碟交給背景執行緒處理，瀏覽器操作（復原廣告、處理下一個位置）
+可以立即繼續；Pillow 編碼與檔案寫入期間會釋放 GIL，因此使用執行緒即可平行處理
+
+    • 等待寫入的截圖數量有上限 (SCREENSHOT_WRITE_QUEUE)，超過時擷取端等待，避免記憶體堆積
+    • 結束時 (close) 等待所有截圖寫入完成
+    • 呼叫端在記錄成果前以 wait_written 等待指定的截圖，只有確實寫入磁碟的截圖才算完成
+    • 背景執行緒數量為 0 時直接在呼叫端寫入
+
+輸出格式 (SCREENSHOT_FORMAT)：
+    • png: 無損，壓縮等級 PNG_COMPRESS_LEVEL (0-9，越高檔案越小、編碼越慢)
+    • jpeg: 有損，品質 IMAGE_QUALITY
+    • webp: 有損，品質 IMAGE_QUALITY，同品質下通常比 JPEG 小
+    • webp-lossless: 無損，IMAGE_QUALITY 表示壓縮力度
+"""
+
+import io
+import os
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+FORMAT_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp', 'webp-lossless': 'webp'}
+
+
+class ScreenshotWriter:
+    """有上限的背景截圖寫入佇列"""
+
+    def __init__(self, workers=2, max_pending=8, image_format='png', quality=85, png_compress_level=6):
+        if image_format not in FORMAT_EXTENSIONS:
+            print(f"⚠️ 不支援的截圖格式 {image_format}，改用 png")
+            image_format = 'png'
+        self.format = image_format
+        self.quality = quality
+        self.png_compress_level = png_compress_level
+        self.executor = None
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='screenshot-writer')
+        self.slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.lock = threading.Lock()
+        self.pending = {}           # 截圖路徑 -> 寫入中的 future
+        self.written = 0
+        self.failed = []
+        self.wait_seconds = 0.0     # 等待佇列空位的時間
+        self.encode_seconds = 0.0   # 編碼與寫入的累計時間
+        self.bytes_written = 0
+        self.on_written = None      # 寫入完成的回呼 (路徑, 檔案大小, 編碼秒數)
+        self.duplicate_filter = None  # 排入寫入前的檢查 (路徑, 載入圖片的函式)，回傳 False 時捨棄截圖
+        self.dropped = set()
+
+    @property
+    def extension(self):
+        return FORMAT_EXTENSIONS[self.format]
+
+    def get_save_options(self):
+        """回傳 Pillow 的 (格式, 參數)"""
+        if self.format == 'jpeg':
+            return 'JPEG', {'quality': self.quality, 'optimize': True}
+        if self.format == 'webp':
+            return 'WEBP', {'quality': self.quality, 'method': 4}
+        if self.format == 'webp-lossless':
+            return 'WEBP', {'lossless': True, 'quality': self.quality}
+        return 'PNG', {'compress_level': self.png_compress_level}
+
+    def encode_image(self, image, path):
+        pil_format, options = self.get_save_options()
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(path, pil_format, **options)
+
+    def run(self, filepath, write):
+        start_time = time.time()
+        try:
+            write(filepath)
+            size = os.path.getsize(filepath)
+        except Exception as e:
+            print(f"❌ 截圖寫入失敗 {filepath}: {e}")
+            with self.lock:
+                self.failed.append(filepath)
+            return
+        elapsed = time.time() - start_time
+        with self.lock:
+            self.written += 1
+            self.encode_seconds += elapsed
+            self.bytes_written += size
+        if self.on_written:
+            try:
+                self.on_written(filepath, size, elapsed)
+            except Exception as e:
+                print(f"⚠️ 記錄截圖清單失敗 {filepath}: {e}")
+
+    def submit(self, filepath, write):
+        """排入寫入工作，佇列已滿時等待空位"""
+        if self.executor is None:
+            self.run(filepath, write)
+            return filepath
+
+        start_time = time.time()
+        self.slots.acquire()
+        self.wait_seconds += time.time() - start_time
+        future = self.executor.submit(self.run, filepath, write)
+        with self.lock:
+            self.pending[filepath] = future
+        future.add_done_callback(lambda _: self.on_done(filepath))
+        return filepath
+
+    def accept(self, filepath, load_image):
+        """排入寫入前檢查截圖（重複截圖偵測），捨棄時回傳 False"""
+        if self.duplicate_filter is None or self.duplicate_filter(filepath, load_image):
+            return True
+        self.dropped.add(filepath)
+        return False
+
+    def is_dropped(self, filepath):
+        return filepath in self.dropped
+
+    def on_done(self, filepath):
+        with self.lock:
+            self.pending.pop(filepath, None)
+        self.slots.release()
+
+    def save_image(self, filepath, image):
+        """以設定的格式編碼並寫入 Pillow 圖片"""
+        if not self.accept(filepath, lambda: image):
+            return None
+        return self.submit(filepath, lambda path: self.encode_image(image, path))
+
+    def write_bytes(self, filepath, data):
+        def write(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return self.submit(filepath, write)
+
+    def write_base64(self, filepath, data, source_format='png'):
+        """寫入 base64 編碼的圖片（瀏覽器截圖）；與輸出格式相同時直接寫入，否則重新編碼"""
+        if not self.accept(filepath, lambda: self.decode_image(data)):
+            return None
+        if source_format == self.format:
+            return self.submit(filepath, lambda path: self.write_decoded(path, data))
+
+        def write(path):
+            self.encode_image(self.decode_image(data), path)
+        return self.submit(filepath, write)
+
+    def convert_file(self, filepath, source_path):
+        """將外部工具產生的 PNG 轉為輸出格式，完成後刪除原始檔"""
+        if not self.accept(filepath, lambda: self.open_image(source_path)):
+            os.remove(source_path)
+            return None
+        if source_path == filepath:
+            # 已是輸出格式，仍經由佇列記錄檔案大小與清單
+            return self.submit(filepath, lambda path: None)
+
+        def write(path):
+            from PIL import Image
+            with Image.open(source_path) as image:
+                self.encode_image(image, path)
+            os.remove(source_path)
+        return self.submit(filepath, write)
+
+    @staticmethod
+    def decode_image(data):
+        from PIL import Image
+        return Image.open(io.BytesIO(base64.b64decode(data)))
+
+    @staticmethod
+    def open_image(path):
+        from PIL import Image
+        with Image.open(path) as image:
+            image.load()
+            return image
+
+    @staticmethod
+    def write_decoded(path, data):
+        with open(path, 'wb') as f:
+            f.write(base64.b64decode(data))
+
+    def wait_written(self, paths):
+        """等待指定的截圖寫入結束，回傳確實寫入成功的路徑"""
+        with self.lock:
+            futures = [self.pending[path] for path in paths if path in self.pending]
+        if futures:
+            wait(futures)
+        # 寫入失敗會在 future 結束前記錄到 failed
+        with self.lock:
+            failed = set(self.failed)
+        return [path for path in paths if path not in failed]
+
+    def flush(self):
+        """等待目前所有寫入工作完成"""
+        with self.lock:
+            pending = list(self.pending.values())
+        if pending:
+            print(f"等待 {len(pending)} 張截圖寫入完成...")
+            wait(pending)
+
+    def get_summary(self):
+        """截圖格式、平均編碼時間與檔案大小"""
+        if not self.written and not self.failed:
+            return None
+        average_ms = self.encode_seconds / max(1, self.written) * 1000
+        average_kb = self.bytes_written / max(1, self.written) / 1024
+        return (f"截圖寫入 ({self.format}): {self.written} 張完成，{len(self.failed)} 張失敗，"
+                f"平均編碼 {average_ms:.0f}ms、{average_kb:.0f}KB/張，"
+                f"共 {self.bytes_written / 1024 / 1024:.1f}MB，等待佇列空位 {self.wait_seconds:.1f} 秒")
+
+    def close(self):
+        self.flush()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
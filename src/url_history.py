@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨執行的文章網址紀錄
+記錄每篇處理過的文章（正規化網址）的最後造訪時間與截圖產出，
+選擇文章時優先處理沒看過或紀錄已過期的頁面，避免每天重複截圖相同的文章
+
+以 SQLite 儲存，主鍵為網址的 64 位元雜湊值，數十萬筆紀錄仍可快速批次查詢；
+超過 URL_HISTORY_TTL_DAYS 的紀錄會被清除，該文章重新視為沒看過
+"""
+
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+
+from crawl_frontier import normalize_url, url_hash
+
+HISTORY_DB = 'data/url_history.db'
+QUERY_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS visits (
+    url_hash INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    last_visited REAL NOT NULL,
+    visits INTEGER NOT NULL DEFAULT 1,
+    screenshots INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_visits_last_visited ON visits (last_visited);
+"""
+
+
+def to_signed(value):
+    """SQLite 整數為有號 64 位元"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class UrlHistory:
+    """文章網址的造訪紀錄"""
+
+    def __init__(self, db_path=HISTORY_DB, ttl_days=7):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+        self.evict_expired()
+
+    @contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def evict_expired(self):
+        """清除超過保留期限的紀錄"""
+        with self.connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM visits WHERE last_visited < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        if removed:
+            print(f"清除 {removed} 筆過期的文章紀錄")
+
+    def lookup(self, urls):
+        """批次查詢網址的最後造訪時間，回傳 {網址: 最後造訪時間}，沒有紀錄的網址不會出現"""
+        keys = {to_signed(url_hash(normalize_url(url))): url for url in urls}
+        expires_before = time.time() - self.ttl_seconds
+        visited = {}
+        key_list = list(keys)
+        with self.connect() as conn:
+            for start in range(0, len(key_list), QUERY_CHUNK_SIZE):
+                chunk = key_list[start:start + QUERY_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT url_hash, last_visited FROM visits "
+                    f"WHERE url_hash IN ({placeholders}) AND last_visited >= ?",
+                    chunk + [expires_before]
+                ).fetchall()
+                for key, last_visited in rows:
+                    visited[keys[key]] = last_visited
+        return visited
+
+    def prefer_unseen(self, urls, count):
+        """沒看過的網址優先；不足 count 個時以最久沒造訪的網址補足"""
+        visited = self.lookup(urls)
+        unseen = [url for url in urls if url not in visited]
+        if len(unseen) >= count:
+            candidates = unseen
+        else:
+            seen = sorted((url for url in urls if url in visited), key=visited.get)
+            candidates = unseen + seen[:count - len(unseen)]
+        print(f"文章紀錄: {len(unseen)} 個沒看過、{len(visited)} 個近期已處理")
+        return candidates
+
+    def record(self, url, screenshots):
+        """記錄一次文章造訪與截圖產出"""
+        normalized = normalize_url(url)
+        with self.connect() as conn:
+            conn.execute("""
+                INSERT INTO visits (url_hash, url, last_visited, visits, screenshots) VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (url_hash) DO UPDATE SET
+                    last_visited = excluded.last_visited,
+                    visits = visits + 1,
+                    screenshots = screenshots + excluded.screenshots
+            """, (to_signed(url_hash(normalized)), normalized, time.time(), screenshots))
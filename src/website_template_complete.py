@@ -24,10 +24,23 @@ import random
 import re
 import platform
 import subprocess
+import json
+import sys
+import contextlib
+from urllib.parse import urlparse
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from datetime import datetime
+from profile_manager import ProfileManager
+from run_checkpoint import RunCheckpoint
+from rate_limiter import DomainRateLimiter
+from yield_planner import YieldPlanner
+from link_discovery import discover_article_urls
+from crawl_frontier import crawl_article_urls
+from url_history import UrlHistory
+from screenshot_writer import ScreenshotWriter
+from screenshot_manifest import ScreenshotManifest
+import screenshot_dedup
+import browser_daemon
 
 # 載入設定檔
 try:
@@ -60,6 +73,104 @@ except ImportError:
     DEBUG_MODE = True
     SCREENSHOT_FOLDER = "data/screenshots"
 
+# 效能相關設定預設值（舊版 config.py 可能沒有這些設定）
+_PERFORMANCE_DEFAULTS = {
+    # 頁面載入設定：eager 在 DOMContentLoaded 後即返回，不等待字型、影片等資源
+    "PAGE_LOAD_STRATEGY": "eager",
+    "BLOCK_HEAVY_RESOURCES": True,
+    # 🔧 使用者可修改：封鎖的非廣告重資源 (Network.setBlockedURLs 萬用字元格式)
+    # 規則必須指定網域：Network.setBlockedURLs 無法設定例外，"*.mp4"、"*.woff" 這類只有副檔名的規則
+    # 也會封鎖廣告網域提供的影片素材與字型，改變廣告版位的呈現，因此會被忽略
+    "BLOCKED_URL_PATTERNS": [
+        "*google-analytics.com*",
+        "*connect.facebook.net*",
+        "*platform.twitter.com*",
+        "*youtube.com/embed*",
+        "*hotjar.com*",
+        "*scorecardresearch.com*",
+        "*disqus.com*",
+    ],
+    # 廣告投放網域 - 含有這些網域的封鎖規則會被自動忽略，確保廣告版位正常顯示
+    "AD_SERVING_DOMAINS": [
+        "doubleclick.net",
+        "googlesyndication.com",
+        "googleadservices.com",
+        "googletagservices.com",
+        "adservice.google",
+        "amazon-adsystem.com",
+        "criteo.com",
+        "adnxs.com",
+    ],
+    # 持久化 Chrome 設定檔與 HTTP 快取
+    "PERSISTENT_PROFILE": False,
+    "PROFILE_DIR": "data/chrome_profile",
+    "PROFILE_CACHE_SIZE_MB": 300,   # Chrome 磁碟快取上限
+    "PROFILE_MAX_SIZE_MB": 1024,    # 設定檔超過此大小時清除快取
+    "PROFILE_STALE_HOURS": 24,      # 殘留的實例副本保留時間
+    # 附加到常駐瀏覽器 (python src/browser_daemon.py start)
+    "USE_BROWSER_DAEMON": False,
+    "DEBUGGER_ADDRESS": "",         # 直接指定要附加的 Chrome，例如 "127.0.0.1:9222"
+    "WEBDRIVER_URL": "",            # 直接指定 ChromeDriver 伺服器，例如 "http://127.0.0.1:9515"
+    # 定期重啟瀏覽器以限制記憶體用量 (0 表示停用)
+    "RECYCLE_AFTER_PAGES": 30,
+    "RECYCLE_MEMORY_MB": 0,         # 目前分頁的 JS heap 門檻，預設停用
+    # 在頁面載入前注入全螢幕廣告抑制腳本
+    "OVERLAY_SUPPRESSOR": True,
+    # 平行處理：同時執行的瀏覽器工作者數量 (1 表示依序處理)
+    "WORKER_COUNT": 1,
+    # 伺服器端執行：無頭模式或虛擬螢幕 (Xvfb)，固定視窗大小、不詢問螢幕、以瀏覽器截圖
+    "HEADLESS_MODE": False,
+    "VIRTUAL_DISPLAY": False,
+    "BROWSER_WINDOW_SIZE": {"width": 1920, "height": 1080},
+    # 分頁預載：在背景分頁預先載入接下來的文章數量 (0 表示停用)
+    "PREFETCH_TABS": 0,
+    # 執行引擎："selenium" 或 "cdp"（非同步 CDP 引擎，需要 pip install websockets）
+    "ENGINE": "selenium",
+    "CDP_TABS": 3,                  # CDP 引擎同時處理的分頁數量
+    # 批次工作可為個別網站指定文章連結選擇器（空白時使用 LINK_SELECTORS）
+    "CUSTOM_LINK_SELECTORS": [],
+    # 執行進度檢查點：中斷後以 --resume (RESUME = True) 從中斷處繼續
+    "CHECKPOINT_FILE": "data/checkpoint.json",
+    "RESUME": False,
+    # 網域速率限制（所有工作者共用）：每秒載入頁面數、連續載入上限、同時載入上限 (速率 0 表示停用)
+    "DOMAIN_RATE_LIMIT": 0.5,
+    "DOMAIN_BURST": 2,
+    "DOMAIN_CONCURRENCY": 2,
+    # 依歷史產出排序文章：優先處理截圖較多的網站區塊，保留部分比例隨機探索
+    "YIELD_PLANNER": True,
+    "YIELD_EXPLORATION": 0.2,
+    "YIELD_HISTORY_FILE": "data/yield_history.json",
+    # 處理幾篇文章後不再掃描從未出現過的廣告尺寸 (0 表示停用)
+    "SKIP_UNSEEN_SIZES_AFTER": 3,
+    # 文章連結探索："auto" 先以 HTTP 抓取 sitemap/RSS/首頁 HTML，不足時再用瀏覽器；"http" 或 "browser" 只用其中一種
+    "LINK_DISCOVERY": "auto",
+    # 首頁文章連結不足時，爬取同網域分類頁補足 (頁數 0 表示停用)
+    "CRAWL_MAX_DEPTH": 2,
+    "CRAWL_MAX_PAGES": 20,
+    # 跨執行的文章紀錄：優先處理沒看過的文章，紀錄保留天數後過期
+    "URL_HISTORY": True,
+    "URL_HISTORY_TTL_DAYS": 7,
+    # 截圖範圍："screen" 截取整個螢幕；"element" 以 Page.captureScreenshot 只截取替換的廣告位置加上周圍邊距
+    "SCREENSHOT_MODE": "screen",
+    "SCREENSHOT_MARGIN": 200,       # element 模式下廣告周圍保留的頁面範圍 (px)
+    # 背景截圖寫入：圖片編碼與存檔的執行緒數量 (0 表示同步寫入) 與等待寫入的截圖上限
+    "SCREENSHOT_WRITERS": 2,
+    "SCREENSHOT_WRITE_QUEUE": 8,
+    # 截圖格式："png"、"jpeg"、"webp" (有損) 或 "webp-lossless"；IMAGE_QUALITY 為有損格式的品質
+    "SCREENSHOT_FORMAT": "png",
+    "IMAGE_QUALITY": 85,
+    "PNG_COMPRESS_LEVEL": 6,        # 0-9，越高檔案越小、編碼越慢
+    # 重複截圖偵測："off"、"drop" (捨棄且不計入截圖數量) 或 "flag" (保留並在截圖清單中標記)，需要 Pillow
+    "SCREENSHOT_DEDUP": "off",
+    "SCREENSHOT_DEDUP_DISTANCE": 6,  # 感知雜湊的漢明距離門檻 (0-64)
+    "SCREENSHOT_DEDUP_FILE": "data/screenshot_hashes.tsv",
+    "SCREENSHOT_DEDUP_TTL_DAYS": 14,  # 雜湊紀錄保留天數，過期後不再比對
+    # Linux 螢幕截圖："mss" 以常駐的 X11 連線在行程內擷取；"import" 每次執行 ImageMagick import
+    "LINUX_CAPTURE_BACKEND": "mss",
+}
+for _name, _value in _PERFORMANCE_DEFAULTS.items():
+    globals().setdefault(_name, _value)
+
 class ScreenManager:
     """螢幕管理器，用於偵測和管理多螢幕"""
     
@@ -262,8 +373,12 @@ class ScreenManager:
         return screens
     
     @staticmethod
-    def select_screen():
-        """讓使用者選擇要使用的螢幕"""
+    def select_screen(interactive=True):
+        """讓使用者選擇要使用的螢幕；非互動模式或沒有終端機時直接使用螢幕 1"""
+        if not interactive or not sys.stdin or not sys.stdin.isatty():
+            print("非互動模式，使用螢幕 1")
+            return 1, {'id': 1, 'resolution': 'Unknown', 'primary': True}
+        
         screens = ScreenManager.detect_screens()
         
         print("\n" + "="*50)
@@ -313,14 +428,761 @@ class ScreenManager:
                 return screen
         return None
 
+# 🔧 使用者必須修改：根據目標網站修改這些選擇器
+# 💡 使用瀏覽器開發者工具 (F12) 檢查您網站的連結結構
+# 💡 右鍵點擊文章連結 → 檢查元素 → 複製選擇器
+LINK_SELECTORS = [
+    # 📰 通用文章連結模式
+    "a[href*='/article/']",  # 一般文章連結
+    "a[href*='/news/']",     # 新聞連結
+    "a[href*='/blog/']",     # 部落格連結
+    "a[href*='/post/']",     # 貼文連結
+    
+    # 🏷️ 特定主題連結
+    "a[href*='/tour/']",     # 旅遊連結
+    "a[href*='/travel/']",   # 旅行連結
+    "a[href*='/activity/']", # 活動連結
+    "a[href*='/food/']",     # 美食連結
+    
+    # 🔧 使用者自訂區域 - 請根據您的網站添加更多選擇器
+    # 範例：
+    # "a.article-link",           # 有 article-link 類別的連結
+    # ".news-item a",             # news-item 容器內的連結
+    # "h2 a",                     # 標題內的連結
+    # ".post-title a",            # 文章標題連結
+    # "[data-post-id] a",         # 有 data-post-id 屬性的連結
+    # "a[href*='/product/']",     # 產品頁面連結
+    # "a[href*='/review/']",      # 評論頁面連結
+]
+
+# 單次腳本收集所有選擇器的連結：只保留同網域的連結，去除 #錨點後依選擇器分組回傳
+# arguments: 0=選擇器列表, 1=允許的網域列表
+HARVEST_LINKS_SCRIPT = """
+var selectors = arguments[0];
+var domains = arguments[1];
+var results = {};
+selectors.forEach(function(selector) {
+    var seen = {};
+    var hrefs = [];
+    var anchors;
+    try {
+        anchors = document.querySelectorAll(selector);
+    } catch (e) {
+        results[selector] = {error: String(e), found: 0, hrefs: []};
+        return;
+    }
+    for (var i = 0; i < anchors.length; i++) {
+        var anchor = anchors[i];
+        if (!anchor.href || (anchor.protocol !== 'http:' && anchor.protocol !== 'https:')) continue;
+        var host = anchor.hostname;
+        if (!domains.some(function(domain) { return host.indexOf(domain) !== -1; })) continue;
+        var href = anchor.href.split('#')[0];
+        if (seen[href]) continue;
+        seen[href] = true;
+        hrefs.push(href);
+    }
+    results[selector] = {found: anchors.length, hrefs: hrefs};
+});
+return results;
+"""
+
+# 🔧 使用者可修改：全螢幕廣告選擇器
+# 💡 如果程式無法移除您網站的彈出廣告，請添加對應的選擇器
+# 符合選擇器且佔據大部分畫面的元素才會被移除
+FULLSCREEN_AD_SELECTORS = [
+    # 覆蓋整個螢幕的元素
+    'div[style*="position: fixed"][style*="z-index"]',
+    'div[style*="position: absolute"][style*="width: 100%"][style*="height: 100%"]',
+    
+    # 常見的廣告覆蓋層
+    '.overlay',
+    '.modal-overlay',
+    '.popup-overlay',
+    '.ad-overlay',
+    '.interstitial',
+    
+    # Google 廣告相關
+    'div[id*="google_ads_iframe"]',
+    'ins.adsbygoogle[style*="position: fixed"]',
+    
+    # 其他可能的全螢幕廣告
+    '[class*="fullscreen"]',
+    '[class*="popup"]',
+    '[id*="popup"]',
+    '[class*="modal"][style*="display: block"]',
+    
+    # 🔧 使用者自訂區域 - 請根據您網站的彈出廣告添加選擇器
+    # 範例：
+    # '.your-popup-class',        # 您網站的彈出視窗類別
+    # '#your-modal-id',           # 您網站的模態視窗 ID
+    # '.advertisement-popup',     # 廣告彈出視窗
+    # '[data-popup="true"]',      # 有彈出屬性的元素
+]
+
+# 確定是廣告覆蓋層的選擇器，直接以 CSS 隱藏（不檢查尺寸）
+OVERLAY_CSS_SELECTORS = [
+    '.ad-overlay',
+    '.interstitial',
+    'ins.adsbygoogle[data-vignette-loaded="true"]',
+]
+
+# 全螢幕廣告抑制腳本：在頁面任何腳本執行前注入，
+# 以 MutationObserver 在覆蓋層出現當下移除，並以 window.__adReplacerOverlayRemoved 計數
+OVERLAY_SUPPRESSOR_SCRIPT = """
+(function(selectors, cssSelectors) {
+    if (window.__adReplacerOverlaySuppressor) return;
+    window.__adReplacerOverlaySuppressor = true;
+    window.__adReplacerOverlayRemoved = 0;
+    
+    // 過濾掉無效的選擇器，避免整組選擇器失效
+    var validSelectors = selectors.filter(function(selector) {
+        try { document.createDocumentFragment().querySelector(selector); return true; }
+        catch (e) { return false; }
+    });
+    var combinedSelector = validSelectors.join(',');
+    var styleInstalled = false;
+    
+    function installStyle() {
+        var parent = document.head || document.documentElement;
+        if (styleInstalled || !parent || !cssSelectors.length) return;
+        var style = document.createElement('style');
+        style.id = 'ad_replacer_overlay_suppressor';
+        style.textContent = cssSelectors.join(',') + ' { display: none !important; }';
+        parent.appendChild(style);
+        styleInstalled = true;
+    }
+    
+    function isFullscreen(element) {
+        var rect = element.getBoundingClientRect();
+        if (rect.width >= window.innerWidth * 0.8 && rect.height >= window.innerHeight * 0.8) return true;
+        var style = window.getComputedStyle(element);
+        return style.position === 'fixed' &&
+            (style.top === '0px' || style.top === '0') &&
+            (style.left === '0px' || style.left === '0') &&
+            (rect.width >= window.innerWidth * 0.5 || rect.height >= window.innerHeight * 0.5);
+    }
+    
+    var pending = [];
+    var scheduled = false;
+    
+    function removeIfFullscreen(element) {
+        if (element.isConnected && isFullscreen(element)) {
+            element.remove();
+            window.__adReplacerOverlayRemoved++;
+        }
+    }
+    
+    function restoreScroll() {
+        // 移除可能阻擋內容的遮罩
+        if (document.body && document.body.style.overflow === 'hidden') {
+            document.body.style.overflow = 'auto';
+        }
+    }
+    
+    function flush() {
+        scheduled = false;
+        installStyle();
+        var items = pending;
+        pending = [];
+        for (var i = 0; i < items.length; i++) {
+            var node = items[i].node;
+            if (!node.isConnected) continue;
+            if (node.matches(combinedSelector)) removeIfFullscreen(node);
+            // 只有新加入的節點需要檢查子樹，屬性變更只檢查節點本身
+            if (!items[i].deep) continue;
+            var inner = node.querySelectorAll(combinedSelector);
+            for (var j = 0; j < inner.length; j++) removeIfFullscreen(inner[j]);
+        }
+        restoreScroll();
+    }
+    
+    function sweep() {
+        // 插入當下尚未套用樣式或之後才放大的覆蓋層，在頁面載入完成時再整頁檢查一次
+        installStyle();
+        var elements = document.querySelectorAll(combinedSelector);
+        for (var i = 0; i < elements.length; i++) removeIfFullscreen(elements[i]);
+        restoreScroll();
+    }
+    
+    function schedule(node, deep) {
+        if (node.nodeType !== 1) return;
+        pending.push({node: node, deep: deep});
+        if (!scheduled) {
+            scheduled = true;
+            // 以 setTimeout 批次處理（背景分頁不會觸發 requestAnimationFrame）
+            setTimeout(flush, 50);
+        }
+    }
+    
+    if (!combinedSelector) return;
+    new MutationObserver(function(mutations) {
+        for (var i = 0; i < mutations.length; i++) {
+            var mutation = mutations[i];
+            if (mutation.type === 'attributes') {
+                schedule(mutation.target, false);
+            } else {
+                for (var j = 0; j < mutation.addedNodes.length; j++) schedule(mutation.addedNodes[j], true);
+            }
+        }
+    }).observe(document, {childList: true, subtree: true, attributes: true, attributeFilter: ['style', 'class']});
+    window.addEventListener('load', function() {
+        sweep();
+        setTimeout(sweep, 1000);
+    });
+})(%s, %s);
+"""
+
+# 預先定義的按鈕樣式
+# 統一的資訊按鈕樣式 - 使用 Google 標準設計
+_UNIFIED_INFO_BUTTON = {
+    "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M7.5 1.5a6 6 0 100 12 6 6 0 100-12m0 1a5 5 0 110 10 5 5 0 110-10zM6.625 11h1.75V6.5h-1.75zM7.5 3.75a1 1 0 100 2 1 1 0 100-2z" fill="#00aecd"/></svg>',
+    "style": 'position:absolute;top:0px;right:17px;width:15px;height:15px;z-index:100;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
+}
+
+BUTTON_STYLES = {
+    "dots": {
+        "close_button": {
+            "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><circle cx="7.5" cy="3.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="7.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="11.5" r="1.5" fill="#00aecd"/></svg>',
+            "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
+        },
+        "info_button": _UNIFIED_INFO_BUTTON
+    },
+    "cross": {
+        "close_button": {
+            "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M4 4L11 11M11 4L4 11" stroke="#00aecd" stroke-width="1.5" stroke-linecap="round"/></svg>',
+            "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
+        },
+        "info_button": _UNIFIED_INFO_BUTTON
+    },
+    "adchoices": {
+        "close_button": {
+            "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M4 4L11 11M11 4L4 11" stroke="#00aecd" stroke-width="1.5" stroke-linecap="round"/></svg>',
+            "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
+        },
+        "info_button": {
+            "html": '<img src="https://tpc.googlesyndication.com/pagead/images/adchoices/adchoices_blue_wb.png" width="15" height="15" style="display:block;width:15px;height:15px;">',
+            "style": 'position:absolute;top:0px;right:17px;width:15px;height:15px;z-index:100;display:block;cursor:pointer;'
+        }
+    },
+    "adchoices_dots": {
+        "close_button": {
+            "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><circle cx="7.5" cy="3.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="7.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="11.5" r="1.5" fill="#00aecd"/></svg>',
+            "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
+        },
+        "info_button": {
+            "html": '<img src="https://tpc.googlesyndication.com/pagead/images/adchoices/adchoices_blue_wb.png" width="15" height="15" style="display:block;width:15px;height:15px;">',
+            "style": 'position:absolute;top:0px;right:17px;width:15px;height:15px;z-index:100;display:block;cursor:pointer;'
+        }
+    },
+    "none": {
+        "close_button": {
+            "html": '',
+            "style": 'display:none;'
+        },
+        "info_button": {
+            "html": '',
+            "style": 'display:none;'
+        }
+    }
+}
+
+# 廣告替換腳本：只替換圖片，保留廣告按鈕
+# 參數: 容器元素, 圖片 base64, 目標寬, 目標高, 關閉按鈕 HTML, 關閉按鈕樣式, 資訊按鈕 HTML, 資訊按鈕樣式, 是否為無按鈕模式
+REPLACE_AD_SCRIPT = """
+    // 添加 Google 廣告標準樣式
+    if (!document.getElementById('google_ad_styles')) {
+        var style = document.createElement('style');
+        style.id = 'google_ad_styles';
+        style.textContent = `
+            div {
+                margin: 0;
+                padding: 0;
+            }
+            .abgb {
+                position: absolute;
+                right: 16px;
+                top: 0px;
+            }
+            .abgb {
+                display: inline-block;
+                height: 15px;
+            }
+            .abgc {
+                cursor: pointer;
+            }
+            .abgc {
+                display: block;
+                height: 15px;
+                position: absolute;
+                right: 1px;
+                top: 1px;
+                text-rendering: geometricPrecision;
+                z-index: 2147483646;
+            }
+            .abgc .il-wrap {
+                background-color: #ffffff;
+                height: 15px;
+                white-space: nowrap;
+            }
+            .abgc .il-icon {
+                height: 15px;
+                width: 15px;
+            }
+            .abgc .il-icon svg {
+                fill: #00aecd;
+            }
+            .abgs svg, .abgb svg {
+                display: inline-block;
+                height: 15px;
+                width: 15px;
+                vertical-align: top;
+            }
+            #close_button { 
+                text-decoration: none; 
+                margin: 0; 
+                padding: 0; 
+                border: none;
+                cursor: pointer;
+                position: absolute; 
+                z-index: 100; 
+                top: 0px;
+                bottom: auto;
+                vertical-align: top;
+                margin-top: 1px;
+                right: 0px;
+                left: auto;
+                text-align: right;
+                margin-right: 1px;
+                display: block; 
+                width: 15px; 
+                height: 15px;
+            }
+            #close_button #close_button_svg { 
+                width: 15px; 
+                height: 15px; 
+                line-height: 0;
+            }
+            #abgb #info_button_svg { 
+                width: 15px; 
+                height: 15px; 
+                line-height: 0;
+            }
+        `;
+        document.head.appendChild(style);
+    }
+    
+    var container = arguments[0];
+    var imageBase64 = arguments[1];
+    var targetWidth = arguments[2];
+    var targetHeight = arguments[3];
+    var closeButtonHtml = arguments[4];
+    var closeButtonStyle = arguments[5];
+    var infoButtonHtml = arguments[6];
+    var infoButtonStyle = arguments[7];
+    var isNoneMode = arguments[8];
+    
+    if (!container) return false;
+    
+    // 確保 container 是 relative
+    if (window.getComputedStyle(container).position === 'static') {
+      container.style.position = 'relative';
+    }
+    // 先移除舊的（避免重複）
+    ['close_button', 'abgb'].forEach(function(id){
+      var old = container.querySelector('#'+id);
+      if(old) old.remove();
+    });
+    
+    var replacedCount = 0;
+    var newImageSrc = 'data:image/png;base64,' + imageBase64;
+    
+    // 方法1: 只替換img標籤的src，不移除元素
+    var imgs = container.querySelectorAll('img');
+    for (var i = 0; i < imgs.length; i++) {
+        var img = imgs[i];
+        // 排除Google廣告控制按鈕
+        var imgRect = img.getBoundingClientRect();
+        var isControlButton = imgRect.width < 50 || imgRect.height < 50 || 
+                             img.className.includes('abg') || 
+                             img.id.includes('abg') ||
+                             img.src.includes('googleads') ||
+                             img.src.includes('googlesyndication') ||
+                             img.src.includes('adchoices') ||
+                             img.src.includes('zh_tw.png') ||
+                             img.closest('#abgcp') ||
+                             img.closest('.abgcp') ||
+                             img.closest('#abgc') ||
+                             img.closest('.abgc') ||
+                             img.closest('#abgb') ||
+                             img.closest('.abgb') ||
+                             img.closest('#abgs') ||
+                             img.closest('.abgs') ||
+                             img.closest('#cbb') ||
+                             img.closest('.cbb') ||
+                             img.closest('label.cbb') ||
+                             img.closest('[data-vars-label*="feedback"]') ||
+                             img.alt.includes('關閉') ||
+                             img.alt.includes('close');
+        
+        if (!isControlButton && img.src && !img.src.startsWith('data:')) {
+            // 保存原始src以便復原
+            if (!img.getAttribute('data-original-src')) {
+                img.setAttribute('data-original-src', img.src);
+            }
+            
+            // 嘗試替換圖片
+            var oldSrc = img.src;
+            img.src = newImageSrc;
+            
+            // 等待圖片載入並驗證
+            var imageLoaded = false;
+            try {
+                // 檢查圖片是否成功載入
+                if (img.complete && img.naturalWidth > 0) {
+                    imageLoaded = true;
+                } else {
+                    // 如果圖片未載入，恢復原始圖片
+                    img.src = oldSrc;
+                }
+            } catch (e) {
+                // 載入失敗，恢復原始圖片
+                img.src = oldSrc;
+            }
+            
+            // 只有在圖片成功載入時才繼續
+            if (imageLoaded || newImageSrc.startsWith('data:')) {
+                // 設定圖片樣式
+                img.style.objectFit = 'contain';
+                img.style.width = '100%';
+                img.style.height = 'auto';
+                img.style.maxWidth = 'none';
+                img.style.maxHeight = 'none';
+                img.style.minWidth = 'auto';
+                img.style.minHeight = 'auto';
+                img.style.display = 'block';
+                img.style.margin = '0';
+                img.style.padding = '0';
+                img.style.border = 'none';
+                img.style.outline = 'none';
+                
+                // 確保img的父層是relative
+                var imgParent = img.parentElement || container;
+                if (window.getComputedStyle(imgParent).position === 'static') {
+                    imgParent.style.position = 'relative';
+                }
+                
+                // 先移除舊的按鈕
+                ['close_button', 'abgb'].forEach(function(id){
+                    var old = imgParent.querySelector('#'+id);
+                    if(old) old.remove();
+                });
+                
+                // 只有在非 none 模式下才創建按鈕
+                if (!isNoneMode && closeButtonHtml && infoButtonHtml) {
+                    // 叉叉 - 貼著替換圖片的右上角
+                    var closeButton = document.createElement('div');
+                    closeButton.id = 'close_button';
+                    closeButton.innerHTML = closeButtonHtml;
+                    closeButton.style.cssText = closeButtonStyle;
+                    
+                    // 驚嘆號 - 貼著替換圖片的右上角，與叉叉對齊
+                    var abgb = document.createElement('div');
+                    abgb.id = 'abgb';
+                    abgb.className = 'abgb';
+                    abgb.innerHTML = infoButtonHtml;
+                    abgb.style.cssText = infoButtonStyle;
+                    
+                    // 將按鈕添加到img的父層（驚嘆號在左，叉叉在右）
+                    imgParent.appendChild(abgb);
+                    imgParent.appendChild(closeButton);
+                }
+                
+                // 只有成功替換才計數
+                replacedCount++;
+            }
+        }
+    }
+    
+    // 方法2: 處理iframe
+    var iframes = container.querySelectorAll('iframe');
+    for (var i = 0; i < iframes.length; i++) {
+        var iframe = iframes[i];
+        var iframeRect = iframe.getBoundingClientRect();
+        
+        // 隱藏iframe
+        iframe.style.visibility = 'hidden';
+        
+        // 確保容器是relative
+        if (window.getComputedStyle(container).position === 'static') {
+            container.style.position = 'relative';
+        }
+        
+        // 在iframe位置創建新的圖片元素
+        var newImg = document.createElement('img');
+        newImg.src = newImageSrc;
+        newImg.style.position = 'absolute';
+        newImg.style.top = (iframeRect.top - container.getBoundingClientRect().top) + 'px';
+        newImg.style.left = (iframeRect.left - container.getBoundingClientRect().left) + 'px';
+        newImg.style.width = Math.round(iframeRect.width) + 'px';
+        newImg.style.height = Math.round(iframeRect.height) + 'px';
+        newImg.style.objectFit = 'contain';
+        newImg.style.zIndex = '1';
+        
+        container.appendChild(newImg);
+        
+        // 先移除舊的按鈕
+        ['close_button', 'abgb'].forEach(function(id){
+            var old = container.querySelector('#'+id);
+            if(old) old.remove();
+        });
+        
+        // 只有在非 none 模式下才創建按鈕
+        if (!isNoneMode && closeButtonHtml && infoButtonHtml) {
+            // 叉叉 - 貼著替換圖片的右上角
+            var closeButton = document.createElement('div');
+            closeButton.id = 'close_button';
+            closeButton.innerHTML = closeButtonHtml;
+            closeButton.style.cssText = 'position:absolute;top:' + (iframeRect.top - container.getBoundingClientRect().top) + 'px;right:' + (container.getBoundingClientRect().right - iframeRect.right) + 'px;width:15px;height:15px;z-index:100;display:block;background-color:rgba(255,255,255,1);';
+            
+            // 驚嘆號 - 貼著替換圖片的右上角，與叉叉水平對齊
+            var abgb = document.createElement('div');
+            abgb.id = 'abgb';
+            abgb.className = 'abgb';
+            abgb.innerHTML = infoButtonHtml;
+            abgb.style.cssText = 'position:absolute;top:' + (iframeRect.top - container.getBoundingClientRect().top + 1) + 'px;right:' + (container.getBoundingClientRect().right - iframeRect.right + 17) + 'px;width:15px;height:15px;z-index:100;display:block;background-color:rgba(255,255,255,1);line-height:0;';
+            
+            // 將按鈕添加到container內，與圖片同層
+            container.appendChild(abgb);
+            container.appendChild(closeButton);
+        }
+        replacedCount++;
+    }
+    
+    // 方法3: 處理背景圖片
+    if (replacedCount === 0) {
+        var style = window.getComputedStyle(container);
+        if (style.backgroundImage && style.backgroundImage !== 'none') {
+            container.style.backgroundImage = 'url(' + newImageSrc + ')';
+            container.style.backgroundSize = 'contain';
+            container.style.backgroundRepeat = 'no-repeat';
+            container.style.backgroundPosition = 'center';
+            replacedCount = 1;
+            
+            // 確保容器是relative
+            if (window.getComputedStyle(container).position === 'static') {
+                container.style.position = 'relative';
+            }
+            
+            // 先移除舊的按鈕
+            ['close_button', 'abgb'].forEach(function(id){
+                var old = container.querySelector('#'+id);
+                if(old) old.remove();
+            });
+            
+            // 只有在非 none 模式下才創建按鈕
+            if (!isNoneMode && closeButtonHtml && infoButtonHtml) {
+                // 添加兩個按鈕 - 貼著替換圖片的右上角，水平對齊
+                var closeButton = document.createElement('div');
+                closeButton.id = 'close_button';
+                closeButton.innerHTML = closeButtonHtml;
+                closeButton.style.cssText = closeButtonStyle;
+                
+                var abgb = document.createElement('div');
+                abgb.id = 'abgb';
+                abgb.className = 'abgb';
+                abgb.innerHTML = infoButtonHtml;
+                abgb.style.cssText = infoButtonStyle;
+                
+                // 將按鈕添加到container內，與背景圖片同層
+                container.appendChild(abgb);
+                container.appendChild(closeButton);
+            }
+        }
+    }
+    return replacedCount > 0;
+"""
+
+# 截圖後復原廣告位置的腳本，參數: 容器元素
+RESTORE_AD_SCRIPT = """
+    var container = arguments[0];
+    
+    // 移除我們添加的所有按鈕（在整個容器中搜尋）
+    var closeButtons = container.querySelectorAll('#close_button');
+    var infoButtons = container.querySelectorAll('#abgb');
+    
+    closeButtons.forEach(function(btn) { btn.remove(); });
+    infoButtons.forEach(function(btn) { btn.remove(); });
+    
+    // 復原所有被修改的圖片
+    var modifiedImgs = container.querySelectorAll('img[data-original-src]');
+    modifiedImgs.forEach(function(img) {
+        var originalSrc = img.getAttribute('data-original-src');
+        if (originalSrc) {
+            img.src = originalSrc;
+            img.removeAttribute('data-original-src');
+            // 清除我們添加的樣式
+            img.style.objectFit = '';
+            img.style.width = '';
+            img.style.height = '';
+            img.style.maxWidth = '';
+            img.style.maxHeight = '';
+            img.style.minWidth = '';
+            img.style.minHeight = '';
+            img.style.display = '';
+            img.style.margin = '';
+            img.style.padding = '';
+            img.style.border = '';
+            img.style.outline = '';
+        }
+    });
+    
+    // 復原iframe可見性
+    var hiddenIframes = container.querySelectorAll('iframe[style*="visibility: hidden"]');
+    hiddenIframes.forEach(function(iframe) {
+        iframe.style.visibility = 'visible';
+    });
+"""
+
+# 計算元素加上邊距的截圖範圍（頁面座標，限制在頁面內），參數: 元素, 邊距
+ELEMENT_CLIP_SCRIPT = """
+    var rect = arguments[0].getBoundingClientRect();
+    var margin = arguments[1];
+    var pageWidth = Math.max(document.documentElement.scrollWidth, document.body.scrollWidth);
+    var pageHeight = Math.max(document.documentElement.scrollHeight, document.body.scrollHeight);
+    var left = Math.max(0, rect.left + window.pageXOffset - margin);
+    var top = Math.max(0, rect.top + window.pageYOffset - margin);
+    var right = Math.min(pageWidth, rect.right + window.pageXOffset + margin);
+    var bottom = Math.min(pageHeight, rect.bottom + window.pageYOffset + margin);
+    return {x: left, y: top, width: right - left, height: bottom - top, scale: 1};
+"""
+
+# 廣告版位在視窗中的位置與視窗尺寸，用來計算版位在截圖中的區域（重複截圖偵測只雜湊該區域）
+SLOT_GEOMETRY_SCRIPT = """
+    var rect = arguments[0].getBoundingClientRect();
+    return {
+        left: rect.left, top: rect.top, width: rect.width, height: rect.height,
+        pageX: window.pageXOffset, pageY: window.pageYOffset,
+        innerWidth: window.innerWidth, innerHeight: window.innerHeight,
+        outerWidth: window.outerWidth, outerHeight: window.outerHeight,
+        screenWidth: window.screen.width, screenHeight: window.screen.height
+    };
+"""
+
 class WebsiteAdReplacer:
-    def __init__(self, screen_id=1):
+    def __init__(self, screen_id=1, worker_id=None):
         self.screen_id = screen_id
+        self.worker_id = worker_id            # 多工作者模式下的編號，單機模式為 None
+        self.screenshot_quota = None          # 多工作者共用的截圖額度 (worker_pool / job_queue)
+        # 無桌面模式：無頭 Chrome 或在虛擬螢幕上執行
+        self.headless = HEADLESS_MODE
+        self.virtual_display = None
+        self.start_virtual_display()
+        self.use_browser_screenshot = self.headless or self.virtual_display is not None  # 改用瀏覽器截圖，不依賴視窗位置
+        self.run_stats = {
+            'page_loads': [],  # 每次 driver.get 的耗時 (秒)
+            'recycles': 0,     # 瀏覽器重啟次數
+            'peak_memory_mb': 0,
+            'overlays_removed': 0,
+            'prefetch_hits': 0,  # 使用預載分頁的文章數
+            'throttled_seconds': 0,  # 因網域速率限制等待的時間 (秒)
+        }
+        self.prefetched_tabs = {}  # 預載中的文章網址 -> 分頁 handle
+        self.overlay_suppressor_installed = False
+        self.pages_since_recycle = 0
+        self.image_cache = {}  # 替換圖片的 base64 快取，重啟瀏覽器時保留
+        self.screenshots_by_size = {}  # 各尺寸的截圖數量 ("寬x高" -> 張數)，記錄於檢查點
+        self.image_usage = {}          # 各替換圖片的使用次數，記錄於檢查點
+        self.rate_limiter = None
+        if DOMAIN_RATE_LIMIT:
+            self.rate_limiter = DomainRateLimiter(DOMAIN_RATE_LIMIT, DOMAIN_BURST, DOMAIN_CONCURRENCY)
+        self.yield_planner = YieldPlanner(YIELD_HISTORY_FILE, YIELD_EXPLORATION) if YIELD_PLANNER else None
+        self.url_history = UrlHistory(ttl_days=URL_HISTORY_TTL_DAYS) if URL_HISTORY else None
+        self.screenshot_writer = ScreenshotWriter(SCREENSHOT_WRITERS, SCREENSHOT_WRITE_QUEUE,
+                                                  SCREENSHOT_FORMAT, IMAGE_QUALITY, PNG_COMPRESS_LEVEL)
+        self.manifest = ScreenshotManifest(SCREENSHOT_FOLDER, worker_id=worker_id)
+        self.screenshot_writer.on_written = self.manifest.complete
+        self.deduplicator = self.create_deduplicator()
+        if self.deduplicator:
+            self.screenshot_writer.duplicate_filter = self.filter_duplicate
+        self.pages_scanned = {}    # 各網域已掃描廣告的文章數（佇列工作者會以同一個瀏覽器處理多個網站）
+        self.links_from_http = False  # 文章連結來自 HTTP 探索，瀏覽器不需要回到首頁
+        self.seen_sizes = {}       # 各網域出現過的廣告尺寸
+        self.profile_manager = None
+        self.profile_instance_dir = None
+        self.daemon_session = None
+        self.display_capture = None  # Linux 常駐的 mss 擷取連線，無法使用時為 False
         self.setup_driver()
         self.load_replace_images()
         
+    def attach_to_browser(self):
+        """附加到已在執行的 Chrome（常駐服務或指定的偵錯位址），成功時回傳 True"""
+        debugger_address = DEBUGGER_ADDRESS
+        driver_url = WEBDRIVER_URL
+        
+        if not debugger_address and USE_BROWSER_DAEMON:
+            self.daemon_session = browser_daemon.acquire_session()
+            if not self.daemon_session:
+                print("⚠️ 沒有可用的常駐瀏覽器，改為啟動新的 Chrome")
+                return False
+            debugger_address = self.daemon_session['debugger_address']
+            driver_url = driver_url or self.daemon_session['driver_url']
+        
+        if not debugger_address:
+            return False
+        
+        chrome_options = Options()
+        chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
+        chrome_options.debugger_address = debugger_address
+        try:
+            if driver_url:
+                self.driver = webdriver.Remote(command_executor=driver_url, options=chrome_options)
+            else:
+                self.driver = webdriver.Chrome(options=chrome_options)
+        except Exception as e:
+            print(f"附加到常駐瀏覽器 {debugger_address} 失敗: {e}")
+            browser_daemon.release_session(self.daemon_session)
+            self.daemon_session = None
+            return False
+        
+        print(f"✅ 已附加到常駐瀏覽器: {debugger_address}")
+        return True
+    
+    def start_virtual_display(self):
+        """在 Linux 上啟動虛擬螢幕 (Xvfb)，讓有介面的 Chrome 在沒有實體螢幕的伺服器上執行"""
+        if not VIRTUAL_DISPLAY or self.headless:
+            return
+        
+        if platform.system() != "Linux":
+            print("⚠️ 虛擬螢幕只支援 Linux，改用無頭模式")
+            self.headless = True
+            return
+        
+        try:
+            from pyvirtualdisplay import Display
+            self.virtual_display = Display(
+                visible=False,
+                size=(BROWSER_WINDOW_SIZE['width'], BROWSER_WINDOW_SIZE['height'])
+            )
+            self.virtual_display.start()
+            print(f"✅ 已啟動虛擬螢幕 {BROWSER_WINDOW_SIZE['width']}x{BROWSER_WINDOW_SIZE['height']}")
+        except ImportError:
+            print("⚠️ pyvirtualdisplay 未安裝，改用無頭模式")
+            self.headless = True
+        except Exception as e:
+            print(f"啟動虛擬螢幕失敗: {e}，改用無頭模式")
+            self.virtual_display = None
+            self.headless = True
+    
     def setup_driver(self):
+        # 優先附加到常駐瀏覽器，省去啟動 Chrome 與 ChromeDriver 的時間
+        if self.attach_to_browser():
+            self.apply_load_profile()
+            self.install_overlay_suppressor()
+            return
+        
         chrome_options = Options()
+        # 頁面載入策略 (normal / eager / none)
+        chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--disable-logging')
@@ -328,6 +1190,38 @@ class WebsiteAdReplacer:
         chrome_options.add_argument('--log-level=3')
         chrome_options.add_argument('--silent')
         
+        # 分頁預載時避免 Chrome 節流背景分頁，讓背景文章的廣告也能正常載入
+        if PREFETCH_TABS:
+            chrome_options.add_argument('--disable-background-timer-throttling')
+            chrome_options.add_argument('--disable-renderer-backgrounding')
+            chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+        
+        # 持久化設定檔：從暖快取範本複製一份本實例專用的副本
+        if PERSISTENT_PROFILE:
+            self.profile_manager = ProfileManager(
+                PROFILE_DIR,
+                cache_size_mb=PROFILE_CACHE_SIZE_MB,
+                max_size_mb=PROFILE_MAX_SIZE_MB,
+                stale_hours=PROFILE_STALE_HOURS
+            )
+            instance_name = f"{os.getpid()}_{self.worker_id or self.screen_id}_{int(time.time())}"
+            self.profile_instance_dir = self.profile_manager.create_instance(instance_name)
+            for argument in self.profile_manager.get_chrome_arguments(self.profile_instance_dir):
+                chrome_options.add_argument(argument)
+        
+        # 無桌面模式：固定視窗大小，不處理螢幕位置與全螢幕
+        if self.headless or self.virtual_display:
+            if self.headless:
+                chrome_options.add_argument('--headless=new')
+            chrome_options.add_argument(
+                f"--window-size={BROWSER_WINDOW_SIZE['width']},{BROWSER_WINDOW_SIZE['height']}"
+            )
+            chrome_options.add_argument('--window-position=0,0')
+            self.driver = webdriver.Chrome(options=chrome_options)
+            self.apply_load_profile()
+            self.install_overlay_suppressor()
+            return
+        
         # 根據作業系統設定螢幕位置
         system = platform.system()
         
@@ -350,9 +1244,251 @@ class WebsiteAdReplacer:
         
         self.driver = webdriver.Chrome(options=chrome_options)
         
+        # 套用資源封鎖規則
+        self.apply_load_profile()
+        self.install_overlay_suppressor()
+        
         # 確保瀏覽器在正確的螢幕上
         self.move_to_screen()
     
+    def get_blocked_url_patterns(self):
+        """取得實際要封鎖的網址規則，排除任何會影響廣告投放網域的規則"""
+        patterns = []
+        for pattern in BLOCKED_URL_PATTERNS:
+            if any(domain in pattern for domain in AD_SERVING_DOMAINS):
+                print(f"⚠️ 略過會影響廣告投放的封鎖規則: {pattern}")
+                continue
+            # 沒有指定網域的規則 (例如 *.mp4) 也會套用到廣告網域
+            if re.fullmatch(r'\*?\.?[\w*]+\*?', pattern):
+                print(f"⚠️ 略過未指定網域的封鎖規則 (會封鎖廣告素材): {pattern}")
+                continue
+            patterns.append(pattern)
+        return patterns
+    
+    def apply_load_profile(self):
+        """透過 CDP 封鎖非廣告網域的重資源 (分析與社群外掛)"""
+        if not BLOCK_HEAVY_RESOURCES:
+            return
+        
+        try:
+            patterns = self.get_blocked_url_patterns()
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            print(f"✅ 已套用載入設定: {PAGE_LOAD_STRATEGY} 策略，封鎖 {len(patterns)} 種資源")
+        except Exception as e:
+            print(f"套用資源封鎖規則失敗: {e}")
+    
+    def should_skip_size(self, domain, size_key):
+        """同一網域掃描超過 SKIP_UNSEEN_SIZES_AFTER 篇文章仍未出現的尺寸不再掃描"""
+        if not SKIP_UNSEEN_SIZES_AFTER or size_key in self.seen_sizes.get(domain, ()):
+            return False
+        # 本篇文章是此網域的第 pages_scanned 篇，前面已掃描 pages_scanned - 1 篇
+        return self.pages_scanned.get(domain, 0) - 1 >= SKIP_UNSEEN_SIZES_AFTER
+    
+    def record_yield(self, url, screenshots):
+        """記錄文章的截圖產出，供之後的執行排序與挑選文章"""
+        if self.yield_planner:
+            self.yield_planner.record(url, screenshots)
+        if self.url_history:
+            self.url_history.record(url, screenshots)
+    
+    def limit_domain(self, url):
+        """依網域速率限制等待並持有載入名額，未啟用時不限制"""
+        if not self.rate_limiter:
+            return contextlib.nullcontext()
+        return self.rate_limiter.limit(url)
+    
+    def load_page(self, url):
+        """載入網頁並記錄載入時間（不含速率限制的等待時間）"""
+        with self.limit_domain(url):
+            start_time = time.time()
+            try:
+                self.driver.get(url)
+            finally:
+                self.run_stats['page_loads'].append(time.time() - start_time)
+                self.pages_since_recycle += 1
+        if self.rate_limiter:
+            self.run_stats['throttled_seconds'] = self.rate_limiter.throttled_seconds
+    
+    def prefetch_urls(self, urls):
+        """在背景分頁預先載入接下來的文章，最多保留 PREFETCH_TABS 個預載分頁"""
+        if not PREFETCH_TABS:
+            return
+        
+        current_handle = self.driver.current_window_handle
+        try:
+            for url in urls:
+                if len(self.prefetched_tabs) >= PREFETCH_TABS:
+                    break
+                if url in self.prefetched_tabs:
+                    continue
+                try:
+                    self.driver.switch_to.new_window('tab')
+                    # CDP 設定只作用於目前分頁，新分頁需要重新套用
+                    self.apply_load_profile()
+                    self.install_overlay_suppressor()
+                    # 以 location 導向不會等待載入完成，前景分頁可以繼續處理
+                    if self.rate_limiter:
+                        self.rate_limiter.acquire(urlparse(url).netloc, hold=False)
+                    self.driver.execute_script("window.location.href = arguments[0];", url)
+                    self.prefetched_tabs[url] = self.driver.current_window_handle
+                    if DEBUG_MODE:
+                        print(f"背景預載: {url}")
+                except Exception as e:
+                    print(f"預載分頁失敗: {e}")
+        finally:
+            self.driver.switch_to.window(current_handle)
+    
+    def close_prefetched_tabs(self):
+        """關閉所有尚未使用的預載分頁"""
+        if not self.prefetched_tabs:
+            return
+        try:
+            current_handle = self.driver.current_window_handle
+            for handle in self.prefetched_tabs.values():
+                if handle == current_handle:
+                    continue
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(current_handle)
+        except Exception as e:
+            print(f"關閉預載分頁失敗: {e}")
+        self.prefetched_tabs = {}
+    
+    def open_page(self, url):
+        """開啟文章：已預載時切換到該分頁並關閉上一個分頁，否則直接載入"""
+        handle = self.prefetched_tabs.pop(url, None)
+        if not handle:
+            self.load_page(url)
+            return
+        
+        start_time = time.time()
+        self.driver.close()
+        self.driver.switch_to.window(handle)
+        
+        # 等待預載分頁達到與頁面載入策略相同的就緒狀態
+        ready_states = ['complete'] if PAGE_LOAD_STRATEGY == 'normal' else ['interactive', 'complete']
+        while time.time() - start_time < PAGE_LOAD_TIMEOUT:
+            try:
+                if self.driver.execute_script("return document.readyState") in ready_states:
+                    break
+            except Exception:
+                pass
+            time.sleep(0.2)
+        
+        self.run_stats['page_loads'].append(time.time() - start_time)
+        self.run_stats['prefetch_hits'] += 1
+        self.pages_since_recycle += 1
+        print(f"✅ 使用預載分頁 (等待 {time.time() - start_time:.2f} 秒)")
+    
+    def get_memory_usage_mb(self):
+        """取得瀏覽器記憶體用量 (MB)：JS heap 透過 CDP，行程 RSS 透過 psutil（若已安裝）"""
+        js_heap_mb = 0
+        try:
+            self.driver.execute_cdp_cmd('Performance.enable', {})
+            metrics = self.driver.execute_cdp_cmd('Performance.getMetrics', {})
+            for metric in metrics.get('metrics', []):
+                if metric['name'] == 'JSHeapTotalSize':
+                    js_heap_mb = metric['value'] / (1024 * 1024)
+        except Exception:
+            pass
+        
+        rss_mb = 0
+        try:
+            import psutil
+            # 只有自行啟動的 Chrome 才能從 ChromeDriver 行程往下找到瀏覽器行程
+            service = getattr(self.driver, 'service', None)
+            if service and service.process:
+                driver_process = psutil.Process(service.process.pid)
+                for child in driver_process.children(recursive=True):
+                    try:
+                        rss_mb += child.memory_info().rss / (1024 * 1024)
+                    except psutil.Error:
+                        continue
+        except ImportError:
+            pass
+        except Exception as e:
+            if DEBUG_MODE:
+                print(f"讀取瀏覽器行程記憶體失敗: {e}")
+        
+        return js_heap_mb, rss_mb
+    
+    def maybe_recycle_browser(self):
+        """處理頁數或記憶體用量超過門檻時重啟瀏覽器，回傳是否已重啟"""
+        if not RECYCLE_AFTER_PAGES and not RECYCLE_MEMORY_MB:
+            return False
+        
+        reason = None
+        if RECYCLE_AFTER_PAGES and self.pages_since_recycle >= RECYCLE_AFTER_PAGES:
+            reason = f"已處理 {self.pages_since_recycle} 個頁面"
+        elif RECYCLE_MEMORY_MB:
+            js_heap_mb, rss_mb = self.get_memory_usage_mb()
+            self.run_stats['peak_memory_mb'] = max(self.run_stats['peak_memory_mb'], js_heap_mb)
+            if DEBUG_MODE:
+                print(f"瀏覽器記憶體: JS heap {js_heap_mb:.0f}MB，行程 RSS 合計 {rss_mb:.0f}MB")
+            # 各行程 RSS 的合計會重複計算共用記憶體，廣告多的頁面（跨站 iframe 各自一個渲染行程）
+            # 幾乎每篇都會超過門檻，因此只以目前分頁的 JS heap 判斷
+            if js_heap_mb >= RECYCLE_MEMORY_MB:
+                reason = f"分頁 JS heap {js_heap_mb:.0f}MB 超過 {RECYCLE_MEMORY_MB}MB"
+        
+        if not reason:
+            return False
+        
+        print(f"♻️ {reason}，重啟瀏覽器")
+        self.recycle_browser()
+        return True
+    
+    def recycle_browser(self):
+        """重啟瀏覽器 session，保留執行統計與替換圖片快取"""
+        self.close_prefetched_tabs()
+        if self.daemon_session:
+            # 常駐瀏覽器不能關閉，改為開新分頁並關閉舊分頁以釋放渲染行程
+            try:
+                old_handle = self.driver.current_window_handle
+                self.driver.switch_to.new_window('tab')
+                new_handle = self.driver.current_window_handle
+                self.driver.switch_to.window(old_handle)
+                self.driver.close()
+                self.driver.switch_to.window(new_handle)
+            except Exception as e:
+                print(f"重開分頁失敗: {e}")
+            # 資源封鎖與抑制腳本只套用在原本的分頁，新分頁需要重新設定
+            self.overlay_suppressor_installed = False
+            self.apply_load_profile()
+            self.install_overlay_suppressor()
+        else:
+            self.shutdown_driver()
+            self.setup_driver()
+        
+        self.pages_since_recycle = 0
+        self.run_stats['recycles'] += 1
+    
+    def print_run_stats(self):
+        """顯示執行統計"""
+        page_loads = self.run_stats['page_loads']
+        print(f"\n{'='*50}")
+        print("📊 執行統計")
+        print(f"頁面載入策略: {PAGE_LOAD_STRATEGY} (資源封鎖: {'開啟' if BLOCK_HEAVY_RESOURCES else '關閉'})")
+        if page_loads:
+            average = sum(page_loads) / len(page_loads)
+            print(f"頁面載入: {len(page_loads)} 次，平均 {average:.2f} 秒，最長 {max(page_loads):.2f} 秒")
+        if self.run_stats['recycles'] or self.run_stats['peak_memory_mb']:
+            print(f"瀏覽器重啟: {self.run_stats['recycles']} 次，JS heap 峰值 {self.run_stats['peak_memory_mb']:.0f}MB")
+        print(f"移除全螢幕廣告: {self.run_stats['overlays_removed']} 個")
+        if PREFETCH_TABS:
+            print(f"分頁預載: {self.run_stats['prefetch_hits']} 篇文章使用預載分頁")
+        if self.rate_limiter:
+            print(f"網域速率限制: 等待 {self.run_stats['throttled_seconds']:.1f} 秒 "
+                  f"(每秒 {DOMAIN_RATE_LIMIT} 頁，同時 {DOMAIN_CONCURRENCY} 頁)")
+        if self.deduplicator:
+            print(f"重複截圖: {self.deduplicator.duplicates} 張 ({'捨棄' if SCREENSHOT_DEDUP == 'drop' else '標記'}，"
+                  f"距離 {SCREENSHOT_DEDUP_DISTANCE} 以內)")
+        self.screenshot_writer.flush()
+        writer_summary = self.screenshot_writer.get_summary()
+        if writer_summary:
+            print(writer_summary)
+        print(f"{'='*50}")
+    
     def move_to_screen(self):
         """將瀏覽器移動到指定螢幕"""
         try:
@@ -435,11 +1571,15 @@ class WebsiteAdReplacer:
             print(f"  {i+1}. {img['filename']} ({img['width']}x{img['height']})")
     
     def load_image_base64(self, image_path):
+        if image_path in self.image_cache:
+            return self.image_cache[image_path]
+        
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"找不到圖片: {image_path}")
             
         with open(image_path, 'rb') as f:
-            return base64.b64encode(f.read()).decode('utf-8')
+            self.image_cache[image_path] = base64.b64encode(f.read()).decode('utf-8')
+        return self.image_cache[image_path]
     
     def debug_page_ads(self):
         """
@@ -585,10 +1725,10 @@ class WebsiteAdReplacer:
         🔧 使用者自訂指南：
         這個方法需要根據目標網站的具體結構進行客製化：
         
-        1. 📝 修改 link_selectors 中的 CSS 選擇器：
+        1. 📝 修改 LINK_SELECTORS 中的 CSS 選擇器：
            - 找到您網站的文章連結模式
            - 使用瀏覽器開發者工具檢查連結的 HTML 結構
-           - 更新下方的選擇器列表
+           - 更新檔案上方的 LINK_SELECTORS 列表
         
         2. 🌐 更新域名檢查邏輯：
            - 確保只抓取同網域的連結
@@ -607,70 +1747,48 @@ class WebsiteAdReplacer:
         - 論壇: a[href*='/thread/'], a[href*='/topic/']
         """
         try:
-            print(f"正在訪問首頁: {base_url}")
-            self.driver.get(base_url)
-            time.sleep(WAIT_TIME)
-            
-            # 🔧 使用者必須修改：根據目標網站修改這些選擇器
-            # 💡 使用瀏覽器開發者工具 (F12) 檢查您網站的連結結構
-            # 💡 右鍵點擊文章連結 → 檢查元素 → 複製選擇器
-            link_selectors = [
-                # 📰 通用文章連結模式
-                "a[href*='/article/']",  # 一般文章連結
-                "a[href*='/news/']",     # 新聞連結
-                "a[href*='/blog/']",     # 部落格連結
-                "a[href*='/post/']",     # 貼文連結
-                
-                # 🏷️ 特定主題連結
-                "a[href*='/tour/']",     # 旅遊連結
-                "a[href*='/travel/']",   # 旅行連結
-                "a[href*='/activity/']", # 活動連結
-                "a[href*='/food/']",     # 美食連結
-                
-                # 🔧 使用者自訂區域 - 請根據您的網站添加更多選擇器
-                # 範例：
-                # "a.article-link",           # 有 article-link 類別的連結
-                # ".news-item a",             # news-item 容器內的連結
-                # "h2 a",                     # 標題內的連結
-                # ".post-title a",            # 文章標題連結
-                # "[data-post-id] a",         # 有 data-post-id 屬性的連結
-                # "a[href*='/product/']",     # 產品頁面連結
-                # "a[href*='/review/']",      # 評論頁面連結
+            # 動態域名檢查 - 從 base_url 提取域名
+            base_domain = urlparse(base_url).netloc
+            domains = [
+                base_domain,  # 主域名
+                base_domain.replace('www.', ''),  # 去掉 www
+                # 🔧 如需支援特定子域名，請在此添加
+                # 例如: 'news.' + base_domain.replace('www.', '')
             ]
+            selectors = CUSTOM_LINK_SELECTORS or LINK_SELECTORS
             
+            # 先以 HTTP 探索 sitemap、feed 與首頁原始 HTML，連結足夠時不必用瀏覽器載入首頁
             news_urls = []
+            self.links_from_http = False
+            if LINK_DISCOVERY != "browser":
+                news_urls = discover_article_urls(base_url, selectors, domains, count, self.rate_limiter)
+                self.links_from_http = LINK_DISCOVERY == "http" or len(news_urls) >= count
             
-            for selector in link_selectors:
-                try:
-                    links = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if DEBUG_MODE:
-                        print(f"使用選擇器 '{selector}' 找到 {len(links)} 個連結")
-                    
-                    for link in links:
-                        href = link.get_attribute('href')
-                        if href and href not in news_urls:
-                            # 動態域名檢查 - 從 base_url 提取域名
-                            from urllib.parse import urlparse
-                            base_domain = urlparse(base_url).netloc
-                            domain_check = any(domain in href for domain in [
-                                base_domain,  # 主域名
-                                base_domain.replace('www.', ''),  # 去掉 www
-                                # 🔧 如需支援特定子域名，請在此添加
-                                # 例如: 'news.' + base_domain.replace('www.', '')
-                            ])
-                            
-                            if domain_check and href != base_url:
-                                news_urls.append(href)
-                                
-                except Exception as e:
-                    if DEBUG_MODE:
-                        print(f"處理選擇器 '{selector}' 時發生錯誤: {e}")
-                    continue
+            if not self.links_from_http:
+                seen_urls = set(news_urls)
+                for href in self.harvest_links_in_browser(base_url, selectors, domains):
+                    if href not in seen_urls:
+                        seen_urls.add(href)
+                        news_urls.append(href)
+            
+            # 首頁連結不足時爬取分類頁，收集兩倍數量的候選連結供排序選擇
+            if len(news_urls) < count and CRAWL_MAX_PAGES:
+                news_urls += crawl_article_urls(base_url, selectors, domains, news_urls, count * 2,
+                                                CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, self.rate_limiter)
             
             print(f"總共找到 {len(news_urls)} 個有效連結")
             
-            # 隨機選擇指定數量的連結
-            if len(news_urls) > count:
+            # 略過近期已處理過的文章
+            if self.url_history:
+                news_urls = self.url_history.prefer_unseen(news_urls, count)
+            
+            # 依歷史產出排序後選擇指定數量的連結，未啟用時隨機選擇
+            if self.yield_planner:
+                selected_urls = self.yield_planner.plan(news_urls, count)
+                if DEBUG_MODE:
+                    for url in selected_urls:
+                        print(f"  預估產出 {self.yield_planner.score(url):.2f}: {url}")
+            elif len(news_urls) > count:
                 selected_urls = random.sample(news_urls, count)
             else:
                 selected_urls = news_urls
@@ -682,46 +1800,69 @@ class WebsiteAdReplacer:
             print(f"獲取新聞連結失敗: {e}")
             return []
     
+    def harvest_links_in_browser(self, base_url, selectors, domains):
+        """以瀏覽器載入首頁，並以單次腳本呼叫收集所有選擇器的連結"""
+        print(f"正在訪問首頁: {base_url}")
+        self.load_page(base_url)
+        time.sleep(WAIT_TIME)
+        
+        # 一次腳本呼叫收集所有選擇器的連結，不必逐一讀取每個連結的 href
+        results = self.driver.execute_script(HARVEST_LINKS_SCRIPT, selectors, domains) or {}
+        
+        news_urls = []
+        seen_urls = {base_url.split('#')[0]}
+        for selector in selectors:
+            result = results.get(selector, {})
+            if DEBUG_MODE:
+                if result.get('error'):
+                    print(f"處理選擇器 '{selector}' 時發生錯誤: {result['error']}")
+                else:
+                    print(f"使用選擇器 '{selector}' 找到 {result.get('found', 0)} 個連結")
+            for href in result.get('hrefs', []):
+                if href not in seen_urls:
+                    seen_urls.add(href)
+                    news_urls.append(href)
+        return news_urls
+    
+    def install_overlay_suppressor(self):
+        """在每個新頁面載入前注入全螢幕廣告抑制腳本 (MutationObserver + CSS)"""
+        self.overlay_suppressor_installed = False
+        if not OVERLAY_SUPPRESSOR:
+            return
+        
+        try:
+            script = OVERLAY_SUPPRESSOR_SCRIPT % (
+                json.dumps(FULLSCREEN_AD_SELECTORS),
+                json.dumps(OVERLAY_CSS_SELECTORS)
+            )
+            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': script})
+            self.overlay_suppressor_installed = True
+            print("✅ 已安裝全螢幕廣告抑制腳本")
+        except Exception as e:
+            print(f"安裝全螢幕廣告抑制腳本失敗: {e}，改用單次移除")
+    
     def remove_fullscreen_ads(self):
         """移除佔據整個畫面的廣告"""
         try:
+            # 已安裝抑制腳本時，覆蓋層在出現當下與頁面載入後的整頁檢查中就會被移除，只需讀取計數；
+            # 計數不存在表示抑制腳本沒有在此頁面執行，改用下方的整頁檢查
+            if self.overlay_suppressor_installed:
+                removed_count = self.driver.execute_script(
+                    "var count = window.__adReplacerOverlayRemoved; "
+                    "if (count !== undefined) window.__adReplacerOverlayRemoved = 0; return count;"
+                )
+                if removed_count is not None:
+                    self.run_stats['overlays_removed'] += removed_count
+                    if removed_count > 0:
+                        print(f"✅ 抑制腳本已移除 {removed_count} 個全螢幕廣告")
+                    return
+            
             print("檢查並移除全螢幕廣告...")
             
             # 移除常見的全螢幕廣告元素
             removed_count = self.driver.execute_script("""
                 var removedCount = 0;
-                
-                // 🔧 使用者可修改：全螢幕廣告選擇器
-                // 💡 如果程式無法移除您網站的彈出廣告，請添加對應的選擇器
-                var fullscreenAdSelectors = [
-                    // 覆蓋整個螢幕的元素
-                    'div[style*="position: fixed"][style*="z-index"]',
-                    'div[style*="position: absolute"][style*="width: 100%"][style*="height: 100%"]',
-                    
-                    // 常見的廣告覆蓋層
-                    '.overlay',
-                    '.modal-overlay',
-                    '.popup-overlay',
-                    '.ad-overlay',
-                    '.interstitial',
-                    
-                    // Google 廣告相關
-                    'div[id*="google_ads_iframe"]',
-                    'ins.adsbygoogle[style*="position: fixed"]',
-                    
-                    // 其他可能的全螢幕廣告
-                    '[class*="fullscreen"]',
-                    '[class*="popup"]',
-                    '[id*="popup"]',
-                    '[class*="modal"][style*="display: block"]',
-                    
-                    // 🔧 使用者自訂區域 - 請根據您網站的彈出廣告添加選擇器
-                    // 範例：
-                    // '.your-popup-class',        # 您網站的彈出視窗類別
-                    // '#your-modal-id',           # 您網站的模態視窗 ID
-                    // '.advertisement-popup',     # 廣告彈出視窗
-                    // '[data-popup="true"]',      # 有彈出屬性的元素
-                ];
+                var fullscreenAdSelectors = arguments[0];
                 
                 fullscreenAdSelectors.forEach(function(selector) {
                     try {
@@ -761,8 +1902,9 @@ class WebsiteAdReplacer:
                 }
                 
                 return removedCount;
-            """)
+            """, FULLSCREEN_AD_SELECTORS)
             
+            self.run_stats['overlays_removed'] += removed_count
             if removed_count > 0:
                 print(f"✅ 成功移除 {removed_count} 個全螢幕廣告")
                 time.sleep(1)  # 等待頁面重新渲染
@@ -903,61 +2045,7 @@ class WebsiteAdReplacer:
         """根據配置返回按鈕樣式"""
         button_style = getattr(self, 'button_style', BUTTON_STYLE)
         
-        # 預先定義的按鈕樣式
-        # 統一的資訊按鈕樣式 - 使用 Google 標準設計
-        unified_info_button = {
-            "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M7.5 1.5a6 6 0 100 12 6 6 0 100-12m0 1a5 5 0 110 10 5 5 0 110-10zM6.625 11h1.75V6.5h-1.75zM7.5 3.75a1 1 0 100 2 1 1 0 100-2z" fill="#00aecd"/></svg>',
-            "style": 'position:absolute;top:0px;right:17px;width:15px;height:15px;z-index:100;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
-        }
-        
-        button_styles = {
-            "dots": {
-                "close_button": {
-                    "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><circle cx="7.5" cy="3.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="7.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="11.5" r="1.5" fill="#00aecd"/></svg>',
-                    "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
-                },
-                "info_button": unified_info_button
-            },
-            "cross": {
-                "close_button": {
-                    "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M4 4L11 11M11 4L4 11" stroke="#00aecd" stroke-width="1.5" stroke-linecap="round"/></svg>',
-                    "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
-                },
-                "info_button": unified_info_button
-            },
-            "adchoices": {
-                "close_button": {
-                    "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M4 4L11 11M11 4L4 11" stroke="#00aecd" stroke-width="1.5" stroke-linecap="round"/></svg>',
-                    "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
-                },
-                "info_button": {
-                    "html": '<img src="https://tpc.googlesyndication.com/pagead/images/adchoices/adchoices_blue_wb.png" width="15" height="15" style="display:block;width:15px;height:15px;">',
-                    "style": 'position:absolute;top:0px;right:17px;width:15px;height:15px;z-index:100;display:block;cursor:pointer;'
-                }
-            },
-            "adchoices_dots": {
-                "close_button": {
-                    "html": '<svg width="15" height="15" viewBox="0 0 15 15" fill="none" xmlns="http://www.w3.org/2000/svg"><circle cx="7.5" cy="3.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="7.5" r="1.5" fill="#00aecd"/><circle cx="7.5" cy="11.5" r="1.5" fill="#00aecd"/></svg>',
-                    "style": 'position:absolute;top:0px;right:0px;width:15px;height:15px;z-index:101;display:block;background-color:rgba(255,255,255,1);border-radius:2px;cursor:pointer;'
-                },
-                "info_button": {
-                    "html": '<img src="https://tpc.googlesyndication.com/pagead/images/adchoices/adchoices_blue_wb.png" width="15" height="15" style="display:block;width:15px;height:15px;">',
-                    "style": 'position:absolute;top:0px;right:17px;width:15px;height:15px;z-index:100;display:block;cursor:pointer;'
-                }
-            },
-            "none": {
-                "close_button": {
-                    "html": '',
-                    "style": 'display:none;'
-                },
-                "info_button": {
-                    "html": '',
-                    "style": 'display:none;'
-                }
-            }
-        }
-        
-        return button_styles.get(button_style, button_styles["dots"])
+        return BUTTON_STYLES.get(button_style, BUTTON_STYLES["dots"])
 
     def replace_ad_content(self, element, image_data, target_width, target_height):
         try:
@@ -985,319 +2073,7 @@ class WebsiteAdReplacer:
             info_button_style = button_style["info_button"]["style"]
             
             # 只替換圖片，保留廣告按鈕
-            success = self.driver.execute_script("""
-                // 添加 Google 廣告標準樣式
-                if (!document.getElementById('google_ad_styles')) {
-                    var style = document.createElement('style');
-                    style.id = 'google_ad_styles';
-                    style.textContent = `
-                        div {
-                            margin: 0;
-                            padding: 0;
-                        }
-                        .abgb {
-                            position: absolute;
-                            right: 16px;
-                            top: 0px;
-                        }
-                        .abgb {
-                            display: inline-block;
-                            height: 15px;
-                        }
-                        .abgc {
-                            cursor: pointer;
-                        }
-                        .abgc {
-                            display: block;
-                            height: 15px;
-                            position: absolute;
-                            right: 1px;
-                            top: 1px;
-                            text-rendering: geometricPrecision;
-                            z-index: 2147483646;
-                        }
-                        .abgc .il-wrap {
-                            background-color: #ffffff;
-                            height: 15px;
-                            white-space: nowrap;
-                        }
-                        .abgc .il-icon {
-                            height: 15px;
-                            width: 15px;
-                        }
-                        .abgc .il-icon svg {
-                            fill: #00aecd;
-                        }
-                        .abgs svg, .abgb svg {
-                            display: inline-block;
-                            height: 15px;
-                            width: 15px;
-                            vertical-align: top;
-                        }
-                        #close_button { 
-                            text-decoration: none; 
-                            margin: 0; 
-                            padding: 0; 
-                            border: none;
-                            cursor: pointer;
-                            position: absolute; 
-                            z-index: 100; 
-                            top: 0px;
-                            bottom: auto;
-                            vertical-align: top;
-                            margin-top: 1px;
-                            right: 0px;
-                            left: auto;
-                            text-align: right;
-                            margin-right: 1px;
-                            display: block; 
-                            width: 15px; 
-                            height: 15px;
-                        }
-                        #close_button #close_button_svg { 
-                            width: 15px; 
-                            height: 15px; 
-                            line-height: 0;
-                        }
-                        #abgb #info_button_svg { 
-                            width: 15px; 
-                            height: 15px; 
-                            line-height: 0;
-                        }
-                    `;
-                    document.head.appendChild(style);
-                }
-                
-                var container = arguments[0];
-                var imageBase64 = arguments[1];
-                var targetWidth = arguments[2];
-                var targetHeight = arguments[3];
-                var closeButtonHtml = arguments[4];
-                var closeButtonStyle = arguments[5];
-                var infoButtonHtml = arguments[6];
-                var infoButtonStyle = arguments[7];
-                var isNoneMode = arguments[8];
-                
-                if (!container) return false;
-                
-                // 確保 container 是 relative
-                if (window.getComputedStyle(container).position === 'static') {
-                  container.style.position = 'relative';
-                }
-                // 先移除舊的（避免重複）
-                ['close_button', 'abgb'].forEach(function(id){
-                  var old = container.querySelector('#'+id);
-                  if(old) old.remove();
-                });
-                
-                var replacedCount = 0;
-                var newImageSrc = 'data:image/png;base64,' + imageBase64;
-                
-                // 方法1: 只替換img標籤的src，不移除元素
-                var imgs = container.querySelectorAll('img');
-                for (var i = 0; i < imgs.length; i++) {
-                    var img = imgs[i];
-                    // 排除Google廣告控制按鈕
-                    var imgRect = img.getBoundingClientRect();
-                    var isControlButton = imgRect.width < 50 || imgRect.height < 50 || 
-                                         img.className.includes('abg') || 
-                                         img.id.includes('abg') ||
-                                         img.src.includes('googleads') ||
-                                         img.src.includes('googlesyndication') ||
-                                         img.src.includes('adchoices') ||
-                                         img.src.includes('zh_tw.png') ||
-                                         img.closest('#abgcp') ||
-                                         img.closest('.abgcp') ||
-                                         img.closest('#abgc') ||
-                                         img.closest('.abgc') ||
-                                         img.closest('#abgb') ||
-                                         img.closest('.abgb') ||
-                                         img.closest('#abgs') ||
-                                         img.closest('.abgs') ||
-                                         img.closest('#cbb') ||
-                                         img.closest('.cbb') ||
-                                         img.closest('label.cbb') ||
-                                         img.closest('[data-vars-label*="feedback"]') ||
-                                         img.alt.includes('關閉') ||
-                                         img.alt.includes('close');
-                    
-                    if (!isControlButton && img.src && !img.src.startsWith('data:')) {
-                        // 保存原始src以便復原
-                        if (!img.getAttribute('data-original-src')) {
-                            img.setAttribute('data-original-src', img.src);
-                        }
-                        
-                        // 嘗試替換圖片
-                        var oldSrc = img.src;
-                        img.src = newImageSrc;
-                        
-                        // 等待圖片載入並驗證
-                        var imageLoaded = false;
-                        try {
-                            // 檢查圖片是否成功載入
-                            if (img.complete && img.naturalWidth > 0) {
-                                imageLoaded = true;
-                            } else {
-                                // 如果圖片未載入，恢復原始圖片
-                                img.src = oldSrc;
-                            }
-                        } catch (e) {
-                            // 載入失敗，恢復原始圖片
-                            img.src = oldSrc;
-                        }
-                        
-                        // 只有在圖片成功載入時才繼續
-                        if (imageLoaded || newImageSrc.startsWith('data:')) {
-                            // 設定圖片樣式
-                            img.style.objectFit = 'contain';
-                            img.style.width = '100%';
-                            img.style.height = 'auto';
-                            img.style.maxWidth = 'none';
-                            img.style.maxHeight = 'none';
-                            img.style.minWidth = 'auto';
-                            img.style.minHeight = 'auto';
-                            img.style.display = 'block';
-                            img.style.margin = '0';
-                            img.style.padding = '0';
-                            img.style.border = 'none';
-                            img.style.outline = 'none';
-                            
-                            // 確保img的父層是relative
-                            var imgParent = img.parentElement || container;
-                            if (window.getComputedStyle(imgParent).position === 'static') {
-                                imgParent.style.position = 'relative';
-                            }
-                            
-                            // 先移除舊的按鈕
-                            ['close_button', 'abgb'].forEach(function(id){
-                                var old = imgParent.querySelector('#'+id);
-                                if(old) old.remove();
-                            });
-                            
-                            // 只有在非 none 模式下才創建按鈕
-                            if (!isNoneMode && closeButtonHtml && infoButtonHtml) {
-                                // 叉叉 - 貼著替換圖片的右上角
-                                var closeButton = document.createElement('div');
-                                closeButton.id = 'close_button';
-                                closeButton.innerHTML = closeButtonHtml;
-                                closeButton.style.cssText = closeButtonStyle;
-                                
-                                // 驚嘆號 - 貼著替換圖片的右上角，與叉叉對齊
-                                var abgb = document.createElement('div');
-                                abgb.id = 'abgb';
-                                abgb.className = 'abgb';
-                                abgb.innerHTML = infoButtonHtml;
-                                abgb.style.cssText = infoButtonStyle;
-                                
-                                // 將按鈕添加到img的父層（驚嘆號在左，叉叉在右）
-                                imgParent.appendChild(abgb);
-                                imgParent.appendChild(closeButton);
-                            }
-                            
-                            // 只有成功替換才計數
-                            replacedCount++;
-                        }
-                    }
-                }
-                
-                // 方法2: 處理iframe
-                var iframes = container.querySelectorAll('iframe');
-                for (var i = 0; i < iframes.length; i++) {
-                    var iframe = iframes[i];
-                    var iframeRect = iframe.getBoundingClientRect();
-                    
-                    // 隱藏iframe
-                    iframe.style.visibility = 'hidden';
-                    
-                    // 確保容器是relative
-                    if (window.getComputedStyle(container).position === 'static') {
-                        container.style.position = 'relative';
-                    }
-                    
-                    // 在iframe位置創建新的圖片元素
-                    var newImg = document.createElement('img');
-                    newImg.src = newImageSrc;
-                    newImg.style.position = 'absolute';
-                    newImg.style.top = (iframeRect.top - container.getBoundingClientRect().top) + 'px';
-                    newImg.style.left = (iframeRect.left - container.getBoundingClientRect().left) + 'px';
-                    newImg.style.width = Math.round(iframeRect.width) + 'px';
-                    newImg.style.height = Math.round(iframeRect.height) + 'px';
-                    newImg.style.objectFit = 'contain';
-                    newImg.style.zIndex = '1';
-                    
-                    container.appendChild(newImg);
-                    
-                    // 先移除舊的按鈕
-                    ['close_button', 'abgb'].forEach(function(id){
-                        var old = container.querySelector('#'+id);
-                        if(old) old.remove();
-                    });
-                    
-                    // 只有在非 none 模式下才創建按鈕
-                    if (!isNoneMode && closeButtonHtml && infoButtonHtml) {
-                        // 叉叉 - 貼著替換圖片的右上角
-                        var closeButton = document.createElement('div');
-                        closeButton.id = 'close_button';
-                        closeButton.innerHTML = closeButtonHtml;
-                        closeButton.style.cssText = 'position:absolute;top:' + (iframeRect.top - container.getBoundingClientRect().top) + 'px;right:' + (container.getBoundingClientRect().right - iframeRect.right) + 'px;width:15px;height:15px;z-index:100;display:block;background-color:rgba(255,255,255,1);';
-                        
-                        // 驚嘆號 - 貼著替換圖片的右上角，與叉叉水平對齊
-                        var abgb = document.createElement('div');
-                        abgb.id = 'abgb';
-                        abgb.className = 'abgb';
-                        abgb.innerHTML = infoButtonHtml;
-                        abgb.style.cssText = 'position:absolute;top:' + (iframeRect.top - container.getBoundingClientRect().top + 1) + 'px;right:' + (container.getBoundingClientRect().right - iframeRect.right + 17) + 'px;width:15px;height:15px;z-index:100;display:block;background-color:rgba(255,255,255,1);line-height:0;';
-                        
-                        // 將按鈕添加到container內，與圖片同層
-                        container.appendChild(abgb);
-                        container.appendChild(closeButton);
-                    }
-                    replacedCount++;
-                }
-                
-                // 方法3: 處理背景圖片
-                if (replacedCount === 0) {
-                    var style = window.getComputedStyle(container);
-                    if (style.backgroundImage && style.backgroundImage !== 'none') {
-                        container.style.backgroundImage = 'url(' + newImageSrc + ')';
-                        container.style.backgroundSize = 'contain';
-                        container.style.backgroundRepeat = 'no-repeat';
-                        container.style.backgroundPosition = 'center';
-                        replacedCount = 1;
-                        
-                        // 確保容器是relative
-                        if (window.getComputedStyle(container).position === 'static') {
-                            container.style.position = 'relative';
-                        }
-                        
-                        // 先移除舊的按鈕
-                        ['close_button', 'abgb'].forEach(function(id){
-                            var old = container.querySelector('#'+id);
-                            if(old) old.remove();
-                        });
-                        
-                        // 只有在非 none 模式下才創建按鈕
-                        if (!isNoneMode && closeButtonHtml && infoButtonHtml) {
-                            // 添加兩個按鈕 - 貼著替換圖片的右上角，水平對齊
-                            var closeButton = document.createElement('div');
-                            closeButton.id = 'close_button';
-                            closeButton.innerHTML = closeButtonHtml;
-                            closeButton.style.cssText = closeButtonStyle;
-                            
-                            var abgb = document.createElement('div');
-                            abgb.id = 'abgb';
-                            abgb.className = 'abgb';
-                            abgb.innerHTML = infoButtonHtml;
-                            abgb.style.cssText = infoButtonStyle;
-                            
-                            // 將按鈕添加到container內，與背景圖片同層
-                            container.appendChild(abgb);
-                            container.appendChild(closeButton);
-                        }
-                    }
-                }
-                return replacedCount > 0;
-            """, element, image_data, target_width, target_height, close_button_html, close_button_style, info_button_html, info_button_style, False)
+            success = self.driver.execute_script(REPLACE_AD_SCRIPT, element, image_data, target_width, target_height, close_button_html, close_button_style, info_button_html, info_button_style, False)
             
             if success:
                 print(f"替換廣告 {original_info['width']}x{original_info['height']}")
@@ -1311,13 +2087,14 @@ class WebsiteAdReplacer:
             return False
     
     def process_website(self, url):
-        """處理單個網站，遍歷所有替換圖片"""
+        """處理單個網站，遍歷所有替換圖片；回傳截圖路徑，頁面載入或瀏覽器失敗時拋出例外"""
+        captured = []  # (截圖路徑, 額度預留, 尺寸, 替換圖片)，寫入完成後才計入成果
         try:
             print(f"\n開始處理網站: {url}")
             
             # 載入網頁
             self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
-            self.driver.get(url)
+            self.open_page(url)
             
             # 等待頁面基本載入
             time.sleep(WAIT_TIME)
@@ -1350,11 +2127,19 @@ class WebsiteAdReplacer:
             
             # 遍歷所有替換圖片
             total_replacements = 0
-            screenshot_paths = []  # 儲存所有截圖路徑
+            quota_reached = False  # 多工作者模式下共用的截圖額度已用完
             
+            domain = urlparse(url).netloc
+            self.pages_scanned[domain] = self.pages_scanned.get(domain, 0) + 1
             for image_info in self.replace_images:
                 print(f"\n檢查圖片: {image_info['filename']} ({image_info['width']}x{image_info['height']})")
                 
+                # 已掃描多篇文章都沒出現過的尺寸，此網站大概沒有這個版位
+                size_key = f"{image_info['width']}x{image_info['height']}"
+                if self.should_skip_size(domain, size_key):
+                    print(f"略過此網站未出現過的尺寸: {size_key}")
+                    continue
+                
                 # 載入當前圖片
                 try:
                     image_data = self.load_image_base64(image_info['path'])
@@ -1368,6 +2153,7 @@ class WebsiteAdReplacer:
                 if not matching_elements:
                     print(f"未找到符合 {image_info['width']}x{image_info['height']} 尺寸的廣告位置")
                     continue
+                self.seen_sizes.setdefault(domain, set()).add(size_key)
                 
                 # 嘗試替換找到的廣告
                 replaced = False
@@ -1417,67 +2203,47 @@ class WebsiteAdReplacer:
                             # 每次替換後立即截圖
                             print("準備截圖...")
                             time.sleep(2)  # 等待頁面穩定
-                            screenshot_path = self.take_screenshot()
-                            if screenshot_path:
-                                screenshot_paths.append(screenshot_path)
-                                print(f"✅ 截圖保存: {screenshot_path}")
+                            reservation = self.screenshot_quota.reserve() if self.screenshot_quota else True
+                            if not reservation:
+                                print("已達到目標截圖數量，略過截圖")
+                                quota_reached = True
                             else:
-                                print("❌ 截圖失敗")
+                                screenshot_path = self.take_screenshot(
+                                    ad_info['element'], url, image_info['width'], image_info['height'],
+                                    image_info['filename'])
+                                if screenshot_path:
+                                    # 背景寫入中，文章處理完成時確認寫入成功後才計入
+                                    captured.append((screenshot_path, reservation, size_key, image_info['filename']))
+                                    print(f"✅ 截圖擷取完成: {screenshot_path}")
+                                else:
+                                    print("❌ 截圖失敗")
+                                    if self.screenshot_quota:
+                                        self.screenshot_quota.release(reservation)
                             
                             # 截圖後復原該位置的廣告
                             try:
-                                self.driver.execute_script("""
-                                    var container = arguments[0];
-                                    
-                                    // 移除我們添加的所有按鈕（在整個容器中搜尋）
-                                    var closeButtons = container.querySelectorAll('#close_button');
-                                    var infoButtons = container.querySelectorAll('#abgb');
-                                    
-                                    closeButtons.forEach(function(btn) { btn.remove(); });
-                                    infoButtons.forEach(function(btn) { btn.remove(); });
-                                    
-                                    // 復原所有被修改的圖片
-                                    var modifiedImgs = container.querySelectorAll('img[data-original-src]');
-                                    modifiedImgs.forEach(function(img) {
-                                        var originalSrc = img.getAttribute('data-original-src');
-                                        if (originalSrc) {
-                                            img.src = originalSrc;
-                                            img.removeAttribute('data-original-src');
-                                            // 清除我們添加的樣式
-                                            img.style.objectFit = '';
-                                            img.style.width = '';
-                                            img.style.height = '';
-                                            img.style.maxWidth = '';
-                                            img.style.maxHeight = '';
-                                            img.style.minWidth = '';
-                                            img.style.minHeight = '';
-                                            img.style.display = '';
-                                            img.style.margin = '';
-                                            img.style.padding = '';
-                                            img.style.border = '';
-                                            img.style.outline = '';
-                                        }
-                                    });
-                                    
-                                    // 復原iframe可見性
-                                    var hiddenIframes = container.querySelectorAll('iframe[style*="visibility: hidden"]');
-                                    hiddenIframes.forEach(function(iframe) {
-                                        iframe.style.visibility = 'visible';
-                                    });
-                                """, ad_info['element'])
+                                self.driver.execute_script(RESTORE_AD_SCRIPT, ad_info['element'])
                                 print("✅ 廣告位置已復原")
                             except Exception as e:
                                 print(f"復原廣告失敗: {e}")
                             
+                            if quota_reached:
+                                break
+                            
                             # 繼續尋找下一個廣告位置，不要break
                             continue
                     except Exception as e:
                         print(f"替換廣告失敗: {e}")
                         continue
                 
+                if quota_reached:
+                    break
+                
                 if not replaced:
                     print(f"所有找到的 {image_info['width']}x{image_info['height']} 廣告位置都無法替換")
             
+            screenshot_paths = self.settle_screenshots(captured)
+            
             # 總結處理結果
             if total_replacements > 0:
                 print(f"\n{'='*50}")
@@ -1489,25 +2255,178 @@ class WebsiteAdReplacer:
                 for i, path in enumerate(screenshot_paths, 1):
                     print(f"  {i}. {path}")
                 print(f"{'='*50}")
+                self.record_yield(url, len(screenshot_paths))
                 return screenshot_paths
             else:
                 print("本網頁沒有找到任何可替換的廣告")
+                self.record_yield(url, 0)
                 return []
                 
+        except Exception:
+            # 已擷取的截圖仍需確認或歸還預留的額度；例外交給呼叫端處理
+            # （失敗預算、工作佇列的重試），不能當成沒有廣告的文章
+            self.settle_screenshots(captured)
+            raise
+    
+    def settle_screenshots(self, captured):
+        """等待本篇文章的截圖寫入磁碟，寫入成功的截圖才確認額度並計入統計，回傳成功的路徑"""
+        written = set(self.screenshot_writer.wait_written([path for path, _, _, _ in captured]))
+        screenshot_paths = []
+        while captured:
+            # 逐筆取出，處理到一半失敗時不會重複確認
+            path, reservation, size_key, filename = captured.pop(0)
+            if path not in written:
+                print(f"❌ 截圖寫入失敗，不計入截圖數量: {path}")
+                if self.screenshot_quota:
+                    self.screenshot_quota.release(reservation)
+                continue
+            if self.screenshot_quota:
+                self.screenshot_quota.confirm(reservation, path)
+            self.screenshots_by_size[size_key] = self.screenshots_by_size.get(size_key, 0) + 1
+            self.image_usage[filename] = self.image_usage.get(filename, 0) + 1
+            screenshot_paths.append(path)
+        return screenshot_paths
+    
+    @staticmethod
+    def create_deduplicator():
+        if SCREENSHOT_DEDUP not in ("drop", "flag"):
+            return None
+        if not screenshot_dedup.is_available():
+            print("⚠️ 重複截圖偵測需要 Pillow (pip install pillow)，略過")
+            return None
+        return screenshot_dedup.ScreenshotDeduplicator(SCREENSHOT_DEDUP_FILE, SCREENSHOT_DEDUP_DISTANCE,
+                                                       SCREENSHOT_DEDUP_TTL_DAYS)
+    
+    @staticmethod
+    def get_slot_region(geometry, frame, clip=None):
+        """計算廣告版位在截圖中的區域，以截圖寬高的比例表示 [x, y, 寬, 高]
+            • clip: 廣告區域截圖，clip 為 Page.captureScreenshot 的擷取範圍（頁面座標）
+            • viewport: 瀏覽器截圖（視窗內容）
+            • screen: 螢幕截圖，瀏覽器視窗位於螢幕左上角，以視窗邊框估計內容區域的位置
+        """
+        if frame == 'clip':
+            x = geometry['left'] + geometry['pageX'] - clip['x']
+            y = geometry['top'] + geometry['pageY'] - clip['y']
+            frame_width, frame_height = clip['width'], clip['height']
+        elif frame == 'viewport':
+            x, y = geometry['left'], geometry['top']
+            frame_width, frame_height = geometry['innerWidth'], geometry['innerHeight']
+        else:
+            border = max(0, (geometry['outerWidth'] - geometry['innerWidth']) / 2)
+            x = border + geometry['left']
+            y = max(0, geometry['outerHeight'] - geometry['innerHeight'] - border) + geometry['top']
+            frame_width, frame_height = geometry['screenWidth'], geometry['screenHeight']
+        if not frame_width or not frame_height:
+            return None
+        return [round(x / frame_width, 4), round(y / frame_height, 4),
+                round(geometry['width'] / frame_width, 4), round(geometry['height'] / frame_height, 4)]
+    
+    def note_slot_region(self, filepath, element, frame, clip=None):
+        """記錄廣告版位在截圖中的區域，重複截圖偵測只比對版位，不受頁面其他內容影響"""
+        if not self.deduplicator or element is None:
+            return
+        try:
+            geometry = self.driver.execute_script(SLOT_GEOMETRY_SCRIPT, element)
+            self.manifest.annotate(filepath, slot_region=self.get_slot_region(geometry, frame, clip))
         except Exception as e:
-            print(f"處理網站失敗: {e}")
-            return []
+            print(f"⚠️ 取得廣告版位區域失敗: {e}")
     
-    def take_screenshot(self):
-        if not os.path.exists(SCREENSHOT_FOLDER):
-            os.makedirs(SCREENSHOT_FOLDER)
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filepath = f"{SCREENSHOT_FOLDER}/ad_{timestamp}.png"
+    def filter_duplicate(self, filepath, load_image):
+        """截圖寫入前與相同網域、尺寸、替換圖片的既有截圖比對，drop 模式下回傳 False 捨棄重複的截圖"""
+        record = self.manifest.get(filepath) or {}
+        key = screenshot_dedup.make_key(record.get('domain'), record.get('width'), record.get('height'),
+                                        record.get('creative'))
+        try:
+            original = self.deduplicator.check(filepath, load_image(), key, record.get('slot_region'))
+        except Exception as e:
+            print(f"⚠️ 重複截圖檢查失敗: {e}")
+            return True
+        if original is None:
+            return True
+        print(f"🔁 與既有截圖相似: {original}")
+        if SCREENSHOT_DEDUP == "flag":
+            self.manifest.annotate(filepath, duplicate_of=original)
+            return True
+        return False
+    
+    def capture_element_screenshot(self, element, filepath):
+        """以 Page.captureScreenshot 只截取元素與周圍邊距，不受視窗位置與螢幕配置影響"""
+        clip = self.driver.execute_script(ELEMENT_CLIP_SCRIPT, element, SCREENSHOT_MARGIN)
+        self.note_slot_region(filepath, element, 'clip', clip)
+        result = self.driver.execute_cdp_cmd('Page.captureScreenshot', {
+            'format': 'png',
+            'clip': clip,
+            'captureBeyondViewport': True,
+        })
+        self.screenshot_writer.write_base64(filepath, result['data'])
+        print(f"截圖保存 (廣告區域 {clip['width']:.0f}x{clip['height']:.0f}): {filepath}")
+        return filepath
+    
+    def grab_linux_display(self):
+        """以常駐的 mss 連線擷取 screen_id 對應的螢幕區域，回傳 PIL 圖片；無法使用時回傳 None"""
+        if self.display_capture is False:
+            return None
+        try:
+            import mss
+            from PIL import Image
+        except ImportError:
+            print("MSS 或 Pillow 未安裝，改用 import 命令截圖 (pip install mss pillow)")
+            self.display_capture = False
+            return None
         
+        try:
+            if self.display_capture is None:
+                self.display_capture = mss.mss()
+                print(f"✅ 使用 MSS 在行程內截圖，偵測到 {len(self.display_capture.monitors) - 1} 個螢幕")
+            # monitors[0] 是所有螢幕的組合，screen_id 直接對應 monitors 索引，只擷取該螢幕的區域
+            monitors = self.display_capture.monitors
+            monitor = monitors[self.screen_id] if self.screen_id < len(monitors) else monitors[1]
+            screenshot_mss = self.display_capture.grab(monitor)
+            return Image.frombytes('RGB', screenshot_mss.size, screenshot_mss.bgra, 'raw', 'BGRX')
+        except Exception as e:
+            print(f"MSS 截圖失敗: {e}，改用 import 命令")
+            if self.display_capture is None:
+                self.display_capture = False  # 無法連線到螢幕，之後不再嘗試
+            return None
+    
+    def take_screenshot(self, element=None, url=None, width=None, height=None, creative=None):
+        """截圖並加入截圖清單，回傳截圖路徑（失敗時回傳 None）"""
+        if url is None:
+            try:
+                url = self.driver.current_url
+            except Exception:
+                url = None
+        # 依日期與網站分資料夾，檔名包含執行編號、廣告尺寸與序號，不會互相覆蓋
+        filepath = self.manifest.build_path(url, width, height, self.screenshot_writer.extension)
+        # 外部截圖工具輸出 PNG，其他格式先寫入暫存檔再轉檔
+        raw_path = filepath if self.screenshot_writer.format == 'png' else f"{filepath}.png"
+        self.manifest.register(filepath, url, width, height, creative)
+        
+        result = self.capture_screenshot(element, filepath, raw_path)
+        if result and self.screenshot_writer.is_dropped(result):
+            print("略過重複的截圖，不計入截圖數量")
+            result = None
+        if not result:
+            self.manifest.discard(filepath)
+        return result
+    
+    def capture_screenshot(self, element, filepath, raw_path):
         try:
             time.sleep(1)  # 等待頁面穩定
             
+            if SCREENSHOT_MODE == "element" and element is not None:
+                try:
+                    return self.capture_element_screenshot(element, filepath)
+                except Exception as e:
+                    print(f"廣告區域截圖失敗: {e}，改用完整截圖")
+            
+            if self.use_browser_screenshot:
+                self.note_slot_region(filepath, element, 'viewport')
+                self.screenshot_writer.write_base64(filepath, self.driver.get_screenshot_as_base64())
+                print(f"截圖保存 (瀏覽器): {filepath}")
+                return filepath
+            
+            self.note_slot_region(filepath, element, 'screen')
             system = platform.system()
             
             if system == "Windows":
@@ -1539,13 +2458,13 @@ class WebsiteAdReplacer:
                             monitor = monitors[self.screen_id - 1]
                             bbox = (monitor['left'], monitor['top'], monitor['right'], monitor['bottom'])
                             screenshot = ImageGrab.grab(bbox)
-                            screenshot.save(filepath)
+                            self.screenshot_writer.save_image(filepath, screenshot)
                             print(f"使用 PIL 截圖 (螢幕 {self.screen_id}): {monitor}")
                             return filepath
                         else:
                             # 螢幕 ID 超出範圍，使用主螢幕
                             screenshot = ImageGrab.grab()
-                            screenshot.save(filepath)
+                            self.screenshot_writer.save_image(filepath, screenshot)
                             print(f"螢幕 ID 超出範圍，使用主螢幕截圖")
                             return filepath
                             
@@ -1578,7 +2497,7 @@ class WebsiteAdReplacer:
                                 screenshot = Image.frombytes('RGB', screenshot_mss.size, screenshot_mss.bgra, 'raw', 'BGRX')
                                 print(f"⚠️ 螢幕 {self.screen_id} 不存在，使用主螢幕: {monitor}")
                         
-                        screenshot.save(filepath)
+                        self.screenshot_writer.save_image(filepath, screenshot)
                         print(f"✅ MSS 截圖保存 (螢幕 {self.screen_id}): {filepath}")
                         return filepath
                         
@@ -1587,12 +2506,12 @@ class WebsiteAdReplacer:
                     try:
                         import pyautogui
                         screenshot = pyautogui.screenshot()
-                        screenshot.save(filepath)
+                        self.screenshot_writer.save_image(filepath, screenshot)
                         print(f"✅ pyautogui 截圖保存: {filepath}")
                         return filepath
                     except:
                         print("pyautogui 也失敗，使用 Selenium 截圖")
-                        self.driver.save_screenshot(filepath)
+                        self.screenshot_writer.write_base64(filepath, self.driver.get_screenshot_as_base64())
                         print(f"截圖保存: {filepath}")
                         return filepath
                 except Exception as e:
@@ -1603,12 +2522,12 @@ class WebsiteAdReplacer:
                     try:
                         import pyautogui
                         screenshot = pyautogui.screenshot()
-                        screenshot.save(filepath)
+                        self.screenshot_writer.save_image(filepath, screenshot)
                         print(f"✅ pyautogui 截圖保存: {filepath}")
                         return filepath
                     except:
                         print("pyautogui 也失敗，使用 Selenium 截圖")
-                        self.driver.save_screenshot(filepath)
+                        self.screenshot_writer.write_base64(filepath, self.driver.get_screenshot_as_base64())
                         print(f"截圖保存: {filepath}")
                         return filepath
                     
@@ -1619,34 +2538,41 @@ class WebsiteAdReplacer:
                     result = subprocess.run([
                         'screencapture', 
                         '-D', str(self.screen_id),  # 指定螢幕編號
-                        filepath
+                        raw_path
                     ], capture_output=True, text=True)
                     
-                    if result.returncode == 0 and os.path.exists(filepath):
+                    if result.returncode == 0 and os.path.exists(raw_path):
                         print(f"截圖保存 (螢幕 {self.screen_id}): {filepath}")
-                        return filepath
+                        return self.screenshot_writer.convert_file(filepath, raw_path)
                     else:
                         print(f"指定螢幕 {self.screen_id} 截圖失敗，嘗試全螢幕截圖")
                         # 回退到全螢幕截圖
                         result = subprocess.run([
                             'screencapture', 
-                            filepath
+                            raw_path
                         ], capture_output=True, text=True)
                         
-                        if result.returncode == 0 and os.path.exists(filepath):
+                        if result.returncode == 0 and os.path.exists(raw_path):
                             print(f"截圖保存 (全螢幕): {filepath}")
-                            return filepath
+                            return self.screenshot_writer.convert_file(filepath, raw_path)
                         else:
                             raise Exception("screencapture 命令失敗")
                             
                 except Exception as e:
                     print(f"系統截圖失敗: {e}，使用 Selenium 截圖")
-                    self.driver.save_screenshot(filepath)
+                    self.screenshot_writer.write_base64(filepath, self.driver.get_screenshot_as_base64())
                     print(f"截圖保存: {filepath}")
                     return filepath
                     
             else:  # Linux
-                # Linux 多螢幕截圖
+                # Linux 多螢幕截圖：優先在行程內擷取，不必每張截圖啟動一次 import
+                if LINUX_CAPTURE_BACKEND == "mss":
+                    screenshot = self.grab_linux_display()
+                    if screenshot is not None:
+                        self.screenshot_writer.save_image(filepath, screenshot)
+                        print(f"截圖保存 (螢幕 {self.screen_id}): {filepath}")
+                        return filepath
+                
                 try:
                     # 使用 import 命令截取指定螢幕
                     display = f":0.{self.screen_id - 1}" if self.screen_id > 1 else ":0"
@@ -1654,18 +2580,18 @@ class WebsiteAdReplacer:
                         'import', 
                         '-window', 'root',
                         '-display', display,
-                        filepath
+                        raw_path
                     ], capture_output=True, text=True)
                     
-                    if result.returncode == 0 and os.path.exists(filepath):
+                    if result.returncode == 0 and os.path.exists(raw_path):
                         print(f"截圖保存 (螢幕 {self.screen_id}): {filepath}")
-                        return filepath
+                        return self.screenshot_writer.convert_file(filepath, raw_path)
                     else:
                         raise Exception("import 命令失敗")
                         
                 except Exception as e:
                     print(f"系統截圖失敗: {e}，使用 Selenium 截圖")
-                    self.driver.save_screenshot(filepath)
+                    self.screenshot_writer.write_base64(filepath, self.driver.get_screenshot_as_base64())
                     print(f"截圖保存: {filepath}")
                     return filepath
                 
@@ -1675,7 +2601,7 @@ class WebsiteAdReplacer:
             traceback.print_exc()
             print("使用 Selenium 截圖")
             try:
-                self.driver.save_screenshot(filepath)
+                self.screenshot_writer.write_base64(filepath, self.driver.get_screenshot_as_base64())
                 print(f"截圖保存: {filepath}")
                 return filepath
             except Exception as e2:
@@ -1684,12 +2610,61 @@ class WebsiteAdReplacer:
                 traceback.print_exc()
                 return None
     
-    def close(self):
+    def shutdown_driver(self):
+        """結束目前的瀏覽器 session"""
+        self.close_prefetched_tabs()
+        if self.daemon_session:
+            # 常駐瀏覽器只結束 WebDriver 連線，不關閉 Chrome，並歸還租約
+            try:
+                self.driver.get('about:blank')
+                self.driver.quit()
+            except Exception as e:
+                print(f"結束常駐瀏覽器連線失敗: {e}")
+            browser_daemon.release_session(self.daemon_session)
+            self.daemon_session = None
+            return
+        
         self.driver.quit()
+        
+        # 將本次的快取寫回範本，下次執行即可暖啟動
+        if self.profile_manager and self.profile_instance_dir:
+            self.profile_manager.release_instance(self.profile_instance_dir)
+            self.profile_instance_dir = None
+    
+    def close(self):
+        # 確保背景寫入的截圖都已存檔
+        self.screenshot_writer.close()
+        if self.display_capture:
+            self.display_capture.close()
+            self.display_capture = None
+        self.shutdown_driver()
+        
+        if self.virtual_display:
+            self.virtual_display.stop()
+            self.virtual_display = None
 
 def main():
-    # 偵測並選擇螢幕
-    screen_id, selected_screen = ScreenManager.select_screen()
+    # 檢查點只記錄單一瀏覽器的處理進度，CDP 引擎與多工作者模式無法從檢查點繼續
+    if RESUME and (ENGINE == "cdp" or WORKER_COUNT > 1):
+        mode = "CDP 引擎" if ENGINE == "cdp" else "多工作者模式"
+        print(f"❌ {mode}不支援 --resume，請移除 --resume 或改用單一瀏覽器的 Selenium 引擎")
+        return
+
+    # 非同步 CDP 引擎：單一事件迴圈同時驅動多個分頁
+    if ENGINE == "cdp":
+        from cdp_engine import run_cdp_engine
+        run_cdp_engine(BASE_URL, CDP_TABS)
+        return
+    
+    # 多工作者模式：每個工作者各自一個 Chrome 行程，共用文章佇列與截圖額度
+    if WORKER_COUNT > 1:
+        from worker_pool import run_worker_pool
+        run_worker_pool(BASE_URL, WORKER_COUNT)
+        return
+    
+    # 偵測並選擇螢幕（無桌面模式不需要選擇）
+    server_mode = HEADLESS_MODE or VIRTUAL_DISPLAY
+    screen_id, selected_screen = ScreenManager.select_screen(interactive=not server_mode)
     
     if screen_id is None:
         print("未選擇螢幕，程式結束")
@@ -1702,25 +2677,52 @@ def main():
     print(f"\n正在啟動 Chrome 瀏覽器到螢幕 {screen_id}...")
     
     bot = WebsiteAdReplacer(screen_id=screen_id)
+    checkpoint = RunCheckpoint(CHECKPOINT_FILE)
     
     try:
-        # 獲取新聞連結
-        news_urls = bot.get_random_news_urls(base_url, NEWS_COUNT)
-        
-        if not news_urls:
-            print("無法獲取部落格連結")
-            return
+        # 從檢查點繼續時沿用上次抽選的文章，不重新抽選
+        state = checkpoint.load(base_url) if RESUME else None
+        if state:
+            news_urls = state['news_urls']
+            bot.screenshots_by_size = dict(state['screenshots_by_size'])
+            bot.image_usage = dict(state['image_usage'])
+            print(f"♻️ 從檢查點繼續: 已處理 {len(state['processed_urls'])}/{len(news_urls)} 篇文章，"
+                  f"已產生 {len(state['screenshot_paths'])} 張截圖")
+        else:
+            # 獲取新聞連結
+            news_urls = bot.get_random_news_urls(base_url, NEWS_COUNT)
+            
+            if not news_urls:
+                print("無法獲取部落格連結")
+                return
+            
+            checkpoint.start(base_url, news_urls)
         
         print(f"獲取到 {len(news_urls)} 個部落格連結")
         print(f"目標截圖數量: {SCREENSHOT_COUNT}")
         
-        total_screenshots = 0
+        total_screenshots = len(checkpoint.state['screenshot_paths'])
         
         # 記錄已處理的URL，避免重複
-        processed_urls = set()
+        processed_urls = set(checkpoint.state['processed_urls'])
+        
+        # 失敗預算：連續多篇文章沒有截圖，或嘗試的文章數達到上限時提早結束此網站
+        consecutive_failures = 0
+        attempts = 0
+        stop_reason = "所有文章都已處理"
         
         # 處理每個網站
         for i, url in enumerate(news_urls, 1):
+            if total_screenshots >= SCREENSHOT_COUNT:
+                stop_reason = f"已達到目標截圖數量 {SCREENSHOT_COUNT}"
+                break
+            if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                stop_reason = f"連續 {consecutive_failures} 篇文章沒有產生截圖，此網站可能沒有符合尺寸的版位"
+                break
+            if attempts >= MAX_ATTEMPTS:
+                stop_reason = f"已嘗試 {attempts} 篇文章，達到 MAX_ATTEMPTS 上限"
+                break
+            
             # 檢查是否已經處理過這個URL
             if url in processed_urls:
                 print(f"跳過已處理的URL: {url}")
@@ -1731,12 +2733,19 @@ def main():
             print(f"網站URL: {url}")
             print(f"{'='*50}")
             
+            attempts += 1
             try:
+                # 在背景分頁預載接下來的文章，與目前文章的掃描、截圖同時進行
+                upcoming_urls = [u for u in news_urls[i:] if u not in processed_urls]
+                bot.prefetch_urls(upcoming_urls[:PREFETCH_TABS])
+                
                 # 處理網站並嘗試替換廣告
                 screenshot_paths = bot.process_website(url)
+                consecutive_failures = 0 if screenshot_paths else consecutive_failures + 1
                 
-                # 記錄已處理的URL
+                # 記錄已處理的URL，並更新檢查點
                 processed_urls.add(url)
+                checkpoint.record_article(url, screenshot_paths, bot.screenshots_by_size, bot.image_usage)
                 
                 if screenshot_paths:
                     print(f"✅ 成功處理網站！共產生 {len(screenshot_paths)} 張截圖")
@@ -1745,23 +2754,33 @@ def main():
                     # 檢查是否達到目標截圖數量
                     if total_screenshots >= SCREENSHOT_COUNT:
                         print(f"✅ 已達到目標截圖數量: {SCREENSHOT_COUNT}")
+                        stop_reason = f"已達到目標截圖數量 {SCREENSHOT_COUNT}"
                         break
                 else:
                     print("❌ 網站處理完成，但沒有找到可替換的廣告")
                 
             except Exception as e:
                 print(f"❌ 處理網站失敗: {e}")
+                consecutive_failures += 1
                 continue
             
+            # 長時間執行時定期重啟瀏覽器，避免記憶體洩漏拖慢或讓分頁崩潰
+            bot.maybe_recycle_browser()
+            
             # 在處理下一個網站前稍作休息並回到首頁
-            if i < len(news_urls) and total_screenshots < SCREENSHOT_COUNT:
+            if (i < len(news_urls) and total_screenshots < SCREENSHOT_COUNT
+                    and consecutive_failures < MAX_CONSECUTIVE_FAILURES):
                 print("等待 3 秒後處理下一個網站...")
                 time.sleep(3)
                 
+                # 分頁預載時下一篇文章已在背景分頁載入；連結來自 HTTP 探索時首頁也不需要重新載入
+                if PREFETCH_TABS or bot.links_from_http:
+                    continue
+                
                 # 回到首頁，確保下次獲取文章時的一致性
                 try:
                     print("回到首頁...")
-                    bot.driver.get(base_url)
+                    bot.load_page(base_url)
                     time.sleep(2)
                     bot.remove_fullscreen_ads()
                 except Exception as e:
@@ -1769,8 +2788,15 @@ def main():
         
         print(f"\n{'='*50}")
         print(f"所有網站處理完成！總共產生 {total_screenshots} 張截圖")
+        print(f"停止原因: {stop_reason}")
+        for size_key, count in sorted(bot.screenshots_by_size.items()):
+            print(f"  {size_key}: {count} 張")
         print(f"{'='*50}")
         
+        # 正常結束後移除檢查點，下次執行重新抽選文章
+        checkpoint.clear()
+        bot.print_run_stats()
+        
     finally:
         bot.close()
 
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+平行文章處理 - 瀏覽器工作者池
+每個工作者是獨立的行程並擁有自己的 Chrome，從共用佇列取得文章網址，
+共用截圖計數，達到 SCREENSHOT_COUNT 後所有工作者一起停止
+"""
+
+import time
+import queue
+import multiprocessing
+
+QUEUE_POLL_TIMEOUT = 5
+
+
+class SharedScreenshotQuota:
+    """跨行程共用的截圖額度"""
+
+    def __init__(self, counter, lock, target):
+        self.counter = counter
+        self.lock = lock
+        self.target = target
+
+    def is_reached(self):
+        return self.counter.value >= self.target
+
+    def reserve(self):
+        """預留一張截圖的額度，已達目標時回傳 False"""
+        with self.lock:
+            if self.counter.value >= self.target:
+                return False
+            self.counter.value += 1
+            return True
+
+    def release(self, reservation):
+        """截圖失敗或寫入失敗時歸還額度"""
+        with self.lock:
+            self.counter.value -= 1
+
+    def confirm(self, reservation, screenshot_path):
+        """截圖已寫入磁碟，額度在預留時已計入"""
+
+
+class SharedFailureBudget:
+    """跨行程共用的網站失敗預算：連續沒有截圖的文章數與已嘗試的文章數以整個網站計算"""
+
+    def __init__(self, failures, attempts, lock, max_failures, max_attempts):
+        self.failures = failures
+        self.attempts = attempts
+        self.lock = lock
+        self.max_failures = max_failures
+        self.max_attempts = max_attempts
+
+    def start_attempt(self):
+        """開始處理一篇文章，已達嘗試上限時回傳停止原因"""
+        with self.lock:
+            if self.attempts.value >= self.max_attempts:
+                return f"已嘗試 {self.attempts.value} 篇文章，達到 MAX_ATTEMPTS 上限"
+            self.attempts.value += 1
+            return None
+
+    def record(self, succeeded):
+        """記錄文章結果，失敗預算用完時回傳停止原因"""
+        with self.lock:
+            self.failures.value = 0 if succeeded else self.failures.value + 1
+            if self.failures.value >= self.max_failures:
+                return f"連續 {self.failures.value} 篇文章沒有產生截圖，此網站可能沒有符合尺寸的版位"
+            return None
+
+
+def worker_main(worker_id, base_url, url_queue, harvest_done,
+                counter, lock, target, stop_event, result_queue, failures, attempts):
+    """工作者行程：第 0 號工作者負責收集文章連結，其他工作者在其完成前等待佇列"""
+    from website_template_complete import (WebsiteAdReplacer, NEWS_COUNT,
+                                           MAX_CONSECUTIVE_FAILURES, MAX_ATTEMPTS)
+
+    screenshot_paths = []
+    bot = None
+    stop_reason = None
+    budget = SharedFailureBudget(failures, attempts, lock, MAX_CONSECUTIVE_FAILURES, MAX_ATTEMPTS)
+    try:
+        bot = WebsiteAdReplacer(screen_id=1, worker_id=worker_id)
+        bot.use_browser_screenshot = True
+        quota = SharedScreenshotQuota(counter, lock, target)
+        bot.screenshot_quota = quota
+
+        if worker_id == 0:
+            try:
+                news_urls = bot.get_random_news_urls(base_url, NEWS_COUNT)
+                print(f"[工作者 {worker_id}] 取得 {len(news_urls)} 個文章連結")
+                for url in news_urls:
+                    url_queue.put(url)
+            finally:
+                harvest_done.set()
+
+        while not stop_event.is_set() and not quota.is_reached():
+            try:
+                url = url_queue.get(timeout=QUEUE_POLL_TIMEOUT)
+            except queue.Empty:
+                if harvest_done.is_set():
+                    break
+                continue
+
+            stop_reason = budget.start_attempt()
+            if stop_reason:
+                stop_event.set()
+                break
+
+            print(f"[工作者 {worker_id}] 處理: {url}")
+            paths = []
+            try:
+                paths = bot.process_website(url)
+                screenshot_paths.extend(paths)
+            except Exception as e:
+                print(f"[工作者 {worker_id}] ❌ 處理網站失敗: {e}")
+
+            # 失敗預算以整個網站計算，用完時通知所有工作者停止
+            stop_reason = budget.record(bool(paths))
+            if stop_reason:
+                print(f"[工作者 {worker_id}] ⛔ {stop_reason}，停止此網站")
+                stop_event.set()
+                break
+            bot.maybe_recycle_browser()
+
+    except Exception as e:
+        print(f"[工作者 {worker_id}] ❌ 工作者失敗: {e}")
+    finally:
+        if worker_id == 0:
+            harvest_done.set()
+        result_queue.put({
+            'worker_id': worker_id,
+            'screenshots': screenshot_paths,
+            'stop_reason': stop_reason,
+            'run_stats': bot.run_stats if bot else {}
+        })
+        if bot:
+            bot.close()
+
+
+def run_worker_pool(base_url, worker_count):
+    """啟動工作者池並等待所有工作者結束，回傳所有截圖路徑"""
+    from website_template_complete import SCREENSHOT_COUNT
+
+    print(f"目標網站: {base_url}")
+    print(f"👷 啟動 {worker_count} 個瀏覽器工作者，目標截圖數量: {SCREENSHOT_COUNT}")
+
+    url_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    harvest_done = multiprocessing.Event()
+    stop_event = multiprocessing.Event()
+    counter = multiprocessing.Value('i', 0)
+    failures = multiprocessing.Value('i', 0)
+    attempts = multiprocessing.Value('i', 0)
+    lock = multiprocessing.Lock()
+
+    start_time = time.time()
+    workers = []
+    for worker_id in range(worker_count):
+        process = multiprocessing.Process(
+            target=worker_main,
+            args=(worker_id, base_url, url_queue, harvest_done,
+                  counter, lock, SCREENSHOT_COUNT, stop_event, result_queue, failures, attempts),
+            name=f"ad-worker-{worker_id}"
+        )
+        process.start()
+        workers.append(process)
+
+    # 先取出結果再 join，避免佇列緩衝區未清空造成行程無法結束
+    results = []
+    try:
+        while len(results) < worker_count:
+            try:
+                results.append(result_queue.get(timeout=QUEUE_POLL_TIMEOUT))
+            except queue.Empty:
+                if not any(process.is_alive() for process in workers):
+                    break
+    except KeyboardInterrupt:
+        print("\n⚠️ 使用者中斷，停止所有工作者")
+        stop_event.set()
+
+    for process in workers:
+        process.join()
+
+    all_screenshots = []
+    page_loads = []
+    throttled_seconds = 0
+    stop_reason = None
+    for result in sorted(results, key=lambda r: r['worker_id']):
+        all_screenshots.extend(result['screenshots'])
+        page_loads.extend(result['run_stats'].get('page_loads', []))
+        throttled_seconds += result['run_stats'].get('throttled_seconds', 0)
+        stop_reason = stop_reason or result.get('stop_reason')
+        print(f"工作者 {result['worker_id']}: {len(result['screenshots'])} 張截圖")
+
+    print(f"\n{'='*50}")
+    print(f"所有工作者處理完成！總共產生 {len(all_screenshots)} 張截圖，耗時 {time.time() - start_time:.0f} 秒")
+    if not stop_reason:
+        stop_reason = (f"已達到目標截圖數量 {SCREENSHOT_COUNT}" if counter.value >= SCREENSHOT_COUNT
+                       else "所有文章都已處理")
+    print(f"停止原因: {stop_reason}")
+    if page_loads:
+        print(f"頁面載入: {len(page_loads)} 次，平均 {sum(page_loads) / len(page_loads):.2f} 秒")
+    if throttled_seconds:
+        print(f"網域速率限制: 所有工作者共等待 {throttled_seconds:.1f} 秒")
+    print(f"{'='*50}")
+    return all_screenshots
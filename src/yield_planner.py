@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章處理順序規劃
+依照歷史產出（每次頁面載入產生的截圖數）為候選文章評分，優先處理產出高的網站區塊，
+以較少的頁面載入達到 SCREENSHOT_COUNT
+
+    • 以網域加上路徑樣式（去掉最後的文章代稱、數字片段以 * 取代）區分網站區塊
+      例如 https://example.com/news/sports/abc-123 → example.com /news/sports
+    • 保留一定比例的隨機探索，讓沒有紀錄或紀錄較舊的區塊也有機會被處理
+    • 舊紀錄每次更新時按比例衰減，讓歷史反映網站最近的版位配置
+"""
+
+import os
+import re
+import json
+import time
+import random
+from urllib.parse import urlparse
+
+HISTORY_DECAY = 0.95
+PRIOR_WEIGHT = 2
+MAX_PATH_SEGMENTS = 2
+LOCK_TIMEOUT = 10
+
+
+def get_section(url):
+    """取得網址所屬的網站區塊樣式"""
+    segments = [segment for segment in urlparse(url).path.split('/') if segment]
+    # 最後一段通常是文章代稱或編號
+    segments = segments[:-1][:MAX_PATH_SEGMENTS]
+    segments = ['*' if re.search(r'\d', segment) else segment for segment in segments]
+    return '/' + '/'.join(segments)
+
+
+class YieldPlanner:
+    """以歷史產出排序候選文章"""
+
+    def __init__(self, history_file, exploration=0.2):
+        self.history_file = history_file
+        self.lock_dir = f"{history_file}.lock"
+        self.exploration = exploration
+        self.history = self.load_history()
+
+    def load_history(self):
+        if not os.path.exists(self.history_file):
+            return {}
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ 讀取產出紀錄失敗: {e}")
+            return {}
+
+    def score(self, url):
+        """估計每次載入的截圖數；沒有紀錄的區塊使用網域平均值"""
+        sections = self.history.get(urlparse(url).netloc, {})
+        total_loads = sum(stats['loads'] for stats in sections.values())
+        total_screenshots = sum(stats['screenshots'] for stats in sections.values())
+        prior = (total_screenshots + 1) / (total_loads + 1)
+        stats = sections.get(get_section(url), {'loads': 0, 'screenshots': 0})
+        return (stats['screenshots'] + prior * PRIOR_WEIGHT) / (stats['loads'] + PRIOR_WEIGHT)
+
+    def plan(self, urls, count):
+        """從候選網址中選出 count 個並排序，約 exploration 比例的位置隨機挑選"""
+        candidates = list(urls)
+        random.shuffle(candidates)  # 同分時隨機排序
+        candidates.sort(key=self.score, reverse=True)
+
+        selected = []
+        while candidates and len(selected) < count:
+            if random.random() < self.exploration:
+                pick = random.choice(candidates)
+            else:
+                pick = candidates[0]
+            candidates.remove(pick)
+            selected.append(pick)
+        return selected
+
+    def acquire_lock(self, timeout=LOCK_TIMEOUT):
+        """以建立資料夾的原子操作取得紀錄檔鎖定，多個工作者同時更新時不會互相覆蓋"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                os.mkdir(self.lock_dir)
+                return True
+            except FileExistsError:
+                # 持有者崩潰留下的鎖定
+                try:
+                    if time.time() - os.path.getmtime(self.lock_dir) > timeout:
+                        os.rmdir(self.lock_dir)
+                        continue
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    return False
+                time.sleep(0.01)
+
+    def release_lock(self):
+        try:
+            os.rmdir(self.lock_dir)
+        except OSError:
+            pass
+
+    def record(self, url, screenshots):
+        """記錄一次頁面載入的產出，在鎖定下重新讀取檔案後合併，讓多個工作者的紀錄都能保留"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.history_file)), exist_ok=True)
+        if not self.acquire_lock():
+            print(f"⚠️ 無法取得產出紀錄鎖定，略過此次紀錄: {url}")
+            return
+        try:
+            self.history = self.load_history()
+            sections = self.history.setdefault(urlparse(url).netloc, {})
+            stats = sections.setdefault(get_section(url), {'loads': 0, 'screenshots': 0})
+            stats['loads'] = stats['loads'] * HISTORY_DECAY + 1
+            stats['screenshots'] = stats['screenshots'] * HISTORY_DECAY + screenshots
+
+            temp_path = f"{self.history_file}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.history, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.history_file)
+            except Exception as e:
+                print(f"⚠️ 寫入產出紀錄失敗: {e}")
+        finally:
+            self.release_lock()